@@ -0,0 +1,229 @@
+"""
+Incrementally maintained alerts panel.
+
+`/api/alerts` used to rebuild the panel from every station and the recent
+forecasts on each request. The engine keeps each district's alert and the
+ranked panel in memory instead, and re-evaluates a district only when one of
+its stations reports a new reading or its forecasts change, so a read returns
+the precomputed panel.
+
+Station risk has hysteresis: a station enters warning at `warning_level` but
+leaves it only once the level falls `ALERT_HYSTERESIS_M` below, and likewise
+for danger, so a river hovering at a threshold does not flap the panel.
+A station whose 1-hour rate of rise would take it to danger within
+`ALERT_RISE_HOURS` is reported as `rising` before it crosses any threshold.
+Forecasts count while issued in the last two hours and due within the next
+24; districts are re-evaluated as forecasts enter or leave that window.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from repository import Repository
+from station_store import store as station_store
+from trends import trend_tracker
+
+# How far below a threshold a level must fall before the station leaves it
+ALERT_HYSTERESIS_M = float(os.environ.get("ALERT_HYSTERESIS_M", "0.25"))
+
+# Stations projected to reach danger within this many hours are rising; they
+# stop rising once the projection grows past RISE_CLEAR_FACTOR times that
+ALERT_RISE_HOURS = float(os.environ.get("ALERT_RISE_HOURS", "6"))
+RISE_CLEAR_FACTOR = 1.5
+RISE_PRIORITY = 2
+
+MAX_ALERTS = 5
+
+STATION_RISKS = ("normal", "warning", "danger")
+
+FORECAST_PRIORITY = {"critical": 4, "high": 3, "medium": 2}
+
+# Forecasts count from FORECAST_LEAD before they are due until
+# FORECAST_MAX_AGE after they were issued
+FORECAST_LEAD = timedelta(hours=24)
+FORECAST_MAX_AGE = timedelta(hours=2)
+
+
+def station_risk(
+    level, previous, warning_level, danger_level, margin=ALERT_HYSTERESIS_M
+):
+    """Threshold class of a level, holding a higher previous class within margin"""
+    if level is None:
+        return "normal"
+    thresholds = (None, warning_level, danger_level)
+    rank = int(level >= warning_level) + int(level >= danger_level)
+    for held in range(STATION_RISKS.index(previous), rank, -1):
+        if level >= thresholds[held] - margin:
+            return STATION_RISKS[held]
+    return STATION_RISKS[rank]
+
+
+class AlertEngine:
+    """Per-district alerts and the ranked panel built from them"""
+
+    def __init__(self):
+        # Bumped whenever the panel changes
+        self.version = 0
+        self._reset()
+        self.warmed = False
+
+    def _reset(self):
+        self._station_risks = {}
+        self._rising = set()
+        self._seen = {}
+        self._district_stations = {}
+        self._forecasts = {}
+        self._next_boundary = None
+        self._alerts = {}
+        self._panel = []
+        self.forecast_version = None
+        self.version += 1
+
+    def _evaluate(self, districts, now):
+        changed = False
+        for district in districts:
+            combined = {}
+            for station_id in self._district_stations.get(district, ()):
+                risk = self._station_risks[station_id]
+                if risk != "normal":
+                    combined[risk] = 1
+                if station_id in self._rising:
+                    combined["rising"] = RISE_PRIORITY
+            for risk, created_at, forecast_time in self._forecasts.get(district, ()):
+                if (
+                    forecast_time - FORECAST_LEAD
+                    <= now
+                    <= created_at + FORECAST_MAX_AGE
+                ):
+                    combined[risk] = max(
+                        combined.get(risk, 0), FORECAST_PRIORITY.get(risk, 1)
+                    )
+
+            alert = None
+            if combined:
+                priority = max(combined.values())
+                alert = {
+                    "district": district,
+                    "type": "high" if priority >= 3 else "medium",
+                    "risks": ", ".join(sorted(combined)),
+                    "priority": priority,
+                }
+            if alert != self._alerts.get(district):
+                changed = True
+                if alert is None:
+                    del self._alerts[district]
+                else:
+                    self._alerts[district] = alert
+
+        if changed:
+            ranked = sorted(
+                self._alerts.values(),
+                key=lambda alert: (-alert["priority"], alert["district"]),
+            )
+            self._panel = ranked[:MAX_ALERTS]
+            self.version += 1
+        return changed
+
+    def observe(self, stations, now=None) -> bool:
+        """Apply the latest readings of stations; True if the panel changed"""
+        dirty, updated = set(), []
+        for station in stations:
+            if station is None:
+                continue
+            if station.id in self._seen and self._seen[station.id] == (
+                station.timestamp,
+                station.district,
+            ):
+                continue
+            self._seen[station.id] = (station.timestamp, station.district)
+            updated.append(station)
+            self._district_stations.setdefault(station.district, set()).add(station.id)
+
+            previous = self._station_risks.get(station.id, "normal")
+            risk = station_risk(
+                station.level,
+                previous,
+                station.warning_level,
+                station.danger_level,
+            )
+            if risk != previous or station.id not in self._station_risks:
+                self._station_risks[station.id] = risk
+                dirty.add(station.district)
+
+        if updated:
+            hours = trend_tracker.hours_to_danger(updated).tolist()
+            for station, eta in zip(updated, hours):
+                was_rising = station.id in self._rising
+                limit = ALERT_RISE_HOURS * (RISE_CLEAR_FACTOR if was_rising else 1)
+                if (0 < eta <= limit) != was_rising:
+                    self._rising ^= {station.id}
+                    dirty.add(station.district)
+        return self._evaluate(dirty, now or datetime.utcnow())
+
+    def _set_next_boundary(self, now):
+        boundaries = [
+            edge
+            for forecasts in self._forecasts.values()
+            for _, created_at, forecast_time in forecasts
+            for edge in (
+                forecast_time - FORECAST_LEAD,
+                created_at + FORECAST_MAX_AGE + timedelta(microseconds=1),
+            )
+            if edge > now
+        ]
+        self._next_boundary = min(boundaries, default=None)
+
+    def set_forecasts(self, rows, now=None) -> bool:
+        """Replace the forecasts from (district, risk, created_at, forecast_time)"""
+        now = now or datetime.utcnow()
+        forecasts = {}
+        for district, risk, created_at, forecast_time in rows:
+            forecasts.setdefault(district, []).append((risk, created_at, forecast_time))
+        for entries in forecasts.values():
+            entries.sort()
+
+        dirty = {
+            district
+            for district in forecasts.keys() | self._forecasts.keys()
+            if forecasts.get(district) != self._forecasts.get(district)
+        }
+        self._forecasts = forecasts
+        self._set_next_boundary(now)
+        return self._evaluate(dirty, now)
+
+    def expire(self, now=None) -> bool:
+        """Re-evaluate districts once a forecast enters or leaves its window"""
+        now = now or datetime.utcnow()
+        if self._next_boundary is None or now < self._next_boundary:
+            return False
+        self._set_next_boundary(now)
+        return self._evaluate(list(self._forecasts), now)
+
+    def panel(self, now=None) -> list:
+        """Top districts by combined station and forecast risk"""
+        self.expire(now)
+        return self._panel
+
+    async def refresh_forecasts(self, repo: Repository, force: bool = False) -> bool:
+        """Reload forecasts if flood_forecasts was written since the last load"""
+        versions = await repo.table_versions()
+        version = versions.get("flood_forecasts", (None, None))[0]
+        if not force and version == self.forecast_version:
+            return False
+        now = datetime.utcnow()
+        rows = await repo.forecast_risks(now - FORECAST_MAX_AGE)
+        self.forecast_version = version
+        return self.set_forecasts(rows, now)
+
+    async def load(self, repo: Repository):
+        """(Re)build every district from the station store and flood_forecasts"""
+        if not station_store.warmed:
+            await station_store.load(repo)
+        self._reset()
+        self.observe(station_store.all())
+        await self.refresh_forecasts(repo, force=True)
+        self.warmed = True
+
+
+# Process-wide engine used by the API routes and the stream
+alert_engine = AlertEngine()
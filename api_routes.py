@@ -1,129 +1,159 @@
-import json
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+import conditional
+import dashboard
+import downsample
+import ingest
+import queries
+from district_cache import DEFAULT_DETAIL, district_cache, resolve_detail
+from fast_json import FastJSONResponse
+from metrics import metrics
+from repository import Repository, get_repository
+from result_cache import result_cache
+from stream import broadcaster
+from tiles import TILE_LAYERS, tile_cache, validate_tile
+
+# Read routes return FastJSONResponse directly: it splices the raw GeoJSON of
+# forecasts and districts into the body and skips FastAPI's generic encoder.
+# They first check If-None-Match against an ETag from data versions
+# (conditional.py) and answer 304 without building the payload. The busiest
+# ones serve their encoded body from the result cache (result_cache.py).
+router = APIRouter()
 
-from database import get_db
 
-# Import mock data for development
-try:
-    import mock_data  # noqa: F401
+async def _cached_json(endpoint: str, validator, tables: tuple, build) -> Response:
+    """A JSON body from the result cache, tagged as of when its data was read"""
+    body, issued = await result_cache.get(
+        endpoint, validator.digest, tables, build, shared=validator.shared
+    )
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"ETag": validator.etag(issued)},
+    )
 
-    USE_MOCK_DATA = True
-except ImportError:
-    USE_MOCK_DATA = False
 
-router = APIRouter()
+def _parse_bbox(bbox: str | None):
+    """Validate a `bbox` query parameter"""
+    try:
+        return queries.parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stations")
-async def get_monitoring_stations(db: Session = Depends(get_db)):
-    """Get all active monitoring stations with their current water levels"""
+async def get_monitoring_stations(
+    request: Request,
+    bbox: str | None = None,
+    repo: Repository = Depends(get_repository),
+):
+    """Get active monitoring stations with their current water levels"""
+    viewport = _parse_bbox(bbox)
     try:
-        # Query stations with latest water level data
-        query = text(
-            """
-            SELECT
-                ms.id, ms.name, ms.river_name, ms.district,
-                ST_X(ms.location) as longitude, ST_Y(ms.location) as latitude,
-                ms.normal_level, ms.warning_level, ms.danger_level,
-                COALESCE(wl.level, ms.normal_level) as current_level,
-                COALESCE(wl.status, 'normal') as current_status,
-                COALESCE(wl.timestamp, NOW()) as last_updated
-            FROM monitoring_stations ms
-            LEFT JOIN LATERAL (
-                SELECT level, status, timestamp
-                FROM water_levels
-                WHERE station_id = ms.id
-                ORDER BY timestamp DESC
-                LIMIT 1
-            ) wl ON true
-            WHERE ms.is_active = true
-            ORDER BY ms.name
-        """
+        validator = await conditional.stations(repo, viewport)
+        cached, _ = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        # Served from the in-memory latest-state store; the repository is only
+        # touched if the store could not be warmed at startup
+        return await _cached_json(
+            "stations",
+            validator,
+            ("water_levels",),
+            lambda: queries.get_stations(repo, bbox=viewport),
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching stations: {str(e)}"
         )
 
-        result = db.execute(query)
-        stations = []
-
-        for row in result:
-            stations.append(
-                {
-                    "id": row.id,
-                    "name": row.name,
-                    "river": row.river_name,
-                    "district": row.district,
-                    "coordinates": [row.longitude, row.latitude],
-                    "levels": {
-                        "normal": row.normal_level,
-                        "warning": row.warning_level,
-                        "danger": row.danger_level,
-                        "current": row.current_level,
-                    },
-                    "status": row.current_status,
-                    "lastUpdated": (
-                        row.last_updated.isoformat() if row.last_updated else None
-                    ),
-                }
-            )
 
-        return {"stations": stations}
+# Largest point budget a history request may ask for
+MAX_HISTORY_POINTS = 5000
+
+
+@router.get("/stations/{station_id}/history")
+async def get_station_history(
+    request: Request,
+    station_id: int,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    points: int = 500,
+    method: str = "lttb",
+    repo: Repository = Depends(get_repository),
+):
+    """Get a station's water levels downsampled to at most N points"""
+    # Only a fixed range can be revalidated; a default one ends now
+    fixed_range = end is not None
+    end = ingest.to_naive_utc(end) or datetime.utcnow()
+    start = ingest.to_naive_utc(start) or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if not 2 <= points <= MAX_HISTORY_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"points must be between 2 and {MAX_HISTORY_POINTS}",
+        )
+    if method not in downsample.METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"method must be one of {', '.join(downsample.METHODS)}",
+        )
 
+    headers = {}
+    try:
+        if fixed_range:
+            validator = await conditional.history(
+                repo, station_id, start, end, points, method
+            )
+            cached, headers["ETag"] = await conditional.check(request, repo, validator)
+            if cached is not None:
+                return cached
+        history = await queries.get_station_history(
+            repo, station_id, start, end, points, method
+        )
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Error fetching stations: {str(e)}"
+            status_code=500, detail=f"Error fetching station history: {str(e)}"
         )
 
+    if history is None:
+        raise HTTPException(status_code=404, detail="Station not found")
+    return FastJSONResponse(history, headers=headers)
+
+
+def _check_hours(hours: int):
+    """Validate an `hours` query parameter; windows past the store's are summed"""
+    if hours < 1:
+        raise HTTPException(status_code=400, detail="hours must be at least 1")
+
 
 @router.get("/rainfall")
-async def get_rainfall_data(hours: int = 24, db: Session = Depends(get_db)):
+async def get_rainfall_data(
+    request: Request,
+    hours: int = 24,
+    bbox: str | None = None,
+    repo: Repository = Depends(get_repository),
+):
     """Get rainfall data for the last N hours"""
+    _check_hours(hours)
+    viewport = _parse_bbox(bbox)
     try:
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-
-        query = text(
-            """
-            SELECT
-                district,
-                ST_X(location) as longitude,
-                ST_Y(location) as latitude,
-                SUM(rainfall_mm) as total_rainfall,
-                MAX(timestamp) as latest_timestamp
-            FROM rainfall_data
-            WHERE timestamp >= :cutoff_time
-            GROUP BY district, ST_X(location), ST_Y(location)
-            ORDER BY total_rainfall DESC
-        """
+        validator = await conditional.rainfall(repo, hours, viewport)
+        cached, _ = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        return await _cached_json(
+            "rainfall",
+            validator,
+            ("rainfall_data",),
+            lambda: queries.get_rainfall(repo, hours, bbox=viewport),
         )
 
-        result = db.execute(query, {"cutoff_time": cutoff_time})
-        rainfall_data = []
-
-        for row in result:
-            intensity = "low"
-            if row.total_rainfall > 50:
-                intensity = "high"
-            elif row.total_rainfall > 25:
-                intensity = "medium"
-
-            rainfall_data.append(
-                {
-                    "district": row.district,
-                    "coordinates": [row.longitude, row.latitude],
-                    "rainfall": row.total_rainfall,
-                    "intensity": intensity,
-                    "lastUpdated": (
-                        row.latest_timestamp.isoformat()
-                        if row.latest_timestamp
-                        else None
-                    ),
-                }
-            )
-
-        return {"rainfall": rainfall_data}
-
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error fetching rainfall data: {str(e)}"
@@ -131,46 +161,31 @@ async def get_rainfall_data(hours: int = 24, db: Session = Depends(get_db)):
 
 
 @router.get("/forecast")
-async def get_flood_forecast(db: Session = Depends(get_db)):
+async def get_flood_forecast(
+    request: Request,
+    bbox: str | None = None,
+    zoom: str | None = None,
+    repo: Repository = Depends(get_repository),
+):
     """Get current 24-hour flood forecasts"""
+    viewport = _parse_bbox(bbox)
     try:
-        # Get forecasts for next 24 hours
-        forecast_time = datetime.utcnow() + timedelta(hours=24)
-
-        query = text(
-            """
-            SELECT
-                district,
-                risk_level,
-                ST_AsGeoJSON(forecast_area) as area_geojson,
-                forecast_time,
-                confidence,
-                affected_population,
-                created_at
-            FROM flood_forecasts
-            WHERE forecast_time <= :forecast_time
-            AND created_at >= NOW() - INTERVAL '24 hours'
-            ORDER BY risk_level DESC, created_at DESC
-        """
-        )
-
-        result = db.execute(query, {"forecast_time": forecast_time})
-        forecasts = []
-
-        for row in result:
-            forecasts.append(
-                {
-                    "district": row.district,
-                    "riskLevel": row.risk_level,
-                    "area": json.loads(row.area_geojson),
-                    "forecastTime": row.forecast_time.isoformat(),
-                    "confidence": row.confidence,
-                    "affectedPopulation": row.affected_population,
-                    "createdAt": row.created_at.isoformat(),
-                }
-            )
+        if zoom is not None:
+            resolve_detail(zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        return {"forecasts": forecasts}
+    try:
+        validator = await conditional.forecasts(repo, viewport, zoom)
+        cached, _ = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        return await _cached_json(
+            "forecast",
+            validator,
+            ("flood_forecasts",),
+            lambda: queries.get_forecasts(repo, bbox=viewport, zoom=zoom),
+        )
 
     except Exception as e:
         raise HTTPException(
@@ -179,114 +194,202 @@ async def get_flood_forecast(db: Session = Depends(get_db)):
 
 
 @router.get("/alerts")
-async def get_current_alerts(db: Session = Depends(get_db)):
+async def get_current_alerts(
+    request: Request, repo: Repository = Depends(get_repository)
+):
     """Get top 5 high-risk areas for alerts panel"""
     try:
-        # Combine current water levels and flood forecasts to determine highest risk areas
-        query = text(
-            """
-            WITH station_risks AS (
-                SELECT
-                    ms.district,
-                    CASE
-                        WHEN wl.level >= ms.danger_level THEN 'danger'
-                        WHEN wl.level >= ms.warning_level THEN 'warning'
-                        ELSE 'normal'
-                    END as risk_level,
-                    wl.level,
-                    ms.danger_level,
-                    1 as priority_score
-                FROM monitoring_stations ms
-                LEFT JOIN LATERAL (
-                    SELECT level, status, timestamp
-                    FROM water_levels
-                    WHERE station_id = ms.id
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                ) wl ON true
-                WHERE ms.is_active = true
-            ),
-            forecast_risks AS (
-                SELECT
-                    district,
-                    risk_level,
-                    CASE risk_level
-                        WHEN 'critical' THEN 4
-                        WHEN 'high' THEN 3
-                        WHEN 'medium' THEN 2
-                        ELSE 1
-                    END as priority_score
-                FROM flood_forecasts
-                WHERE forecast_time <= NOW() + INTERVAL '24 hours'
-                AND created_at >= NOW() - INTERVAL '2 hours'
-            )
-            SELECT
-                district,
-                MAX(priority_score) as max_priority,
-                STRING_AGG(DISTINCT risk_level, ', ') as combined_risk
-            FROM (
-                SELECT district, risk_level, priority_score FROM station_risks WHERE risk_level != 'normal'
-                UNION ALL
-                SELECT district, risk_level, priority_score FROM forecast_risks
-            ) combined
-            GROUP BY district
-            ORDER BY max_priority DESC, district
-            LIMIT 5
-        """
+        validator = await conditional.alerts(repo)
+        cached, _ = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        return await _cached_json(
+            "alerts",
+            validator,
+            ("water_levels", "flood_forecasts"),
+            lambda: queries.get_alerts(repo),
         )
 
-        result = db.execute(query)
-        alerts = []
-
-        for row in result:
-            alert_type = "high" if row.max_priority >= 3 else "medium"
-            alerts.append(
-                {
-                    "district": row.district,
-                    "type": alert_type,
-                    "risks": row.combined_risk,
-                    "priority": row.max_priority,
-                }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching alerts: {str(e)}")
+
+
+@router.get("/districts")
+async def get_districts(
+    request: Request,
+    zoom: str = DEFAULT_DETAIL,
+    bbox: str | None = None,
+    repo: Repository = Depends(get_repository),
+):
+    """Get Punjab district boundaries at low, mid or high detail"""
+    viewport = _parse_bbox(bbox)
+    gzip = viewport is None and "gzip" in request.headers.get("accept-encoding", "")
+    try:
+        validator = await conditional.districts(repo, zoom, viewport, gzip)
+        cached, etag = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        if viewport is not None:
+            return FastJSONResponse(
+                await queries.get_districts(repo, zoom, bbox=viewport),
+                headers={"ETag": etag},
             )
+        payload = await district_cache.get(repo, zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching districts: {str(e)}"
+        )
 
-        return {"alerts": alerts}
+    # Bodies are encoded once per cache build; pick the compressed copy when
+    # the client accepts it
+    headers = {"Vary": "Accept-Encoding", "ETag": etag}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(
+            payload.gzip_body, media_type="application/json", headers=headers
+        )
+    return Response(payload.body, media_type="application/json", headers=headers)
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+async def get_tile(
+    request: Request,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    repo: Repository = Depends(get_repository),
+):
+    """Get a Mapbox Vector Tile of the districts or forecasts layer"""
+    try:
+        validate_tile(layer, z, x, y)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        await tile_cache.refresh_versions(repo)
+        validator = conditional.tile(
+            layer, tile_cache.version(layer), z, x, y, TILE_LAYERS[layer]["ttl"]
+        )
+        cached, etag = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        tile = tile_cache.get(layer, z, x, y)
+        if tile is None:
+            tile = await repo.render_tile(layer, z, x, y)
+            tile_cache.put(layer, z, x, y, tile)
+
+    except NotImplementedError as e:
+        # The memory backend has no PostGIS to render with
+        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching alerts: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error rendering tile: {str(e)}")
+
+    return Response(
+        tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": "public, max-age=60", "ETag": etag},
+    )
+
+
+@router.get("/dashboard")
+async def get_dashboard(
+    request: Request,
+    include: str | None = None,
+    since: str | None = None,
+    hours: int = 24,
+    zoom: str = DEFAULT_DETAIL,
+    repo: Repository = Depends(get_repository),
+):
+    """Get stations, rainfall, forecasts, alerts and districts in one payload"""
+    _check_hours(hours)
+    try:
+        sections = dashboard.parse_include(include)
+        resolve_detail(zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        validator = await conditional.dashboard(repo, sections, since, hours, zoom)
+        cached, etag = await conditional.check(request, repo, validator)
+        if cached is not None:
+            return cached
+        snapshot = await dashboard.build_dashboard(
+            repo, sections, since=since, hours=hours, zoom=zoom
+        )
+        return FastJSONResponse(snapshot, headers={"ETag": etag})
 
-@router.get("/districts")
-async def get_districts(db: Session = Depends(get_db)):
-    """Get Punjab district boundaries"""
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error building dashboard: {str(e)}"
+        )
+
+
+@router.get("/stream")
+async def stream_updates(request: Request):
+    """Push station, forecast and alert changes as Server-Sent Events"""
+    last_event_id = request.headers.get("last-event-id", "")
     try:
-        query = text(
-            """
-            SELECT
-                name,
-                ST_AsGeoJSON(boundary) as boundary_geojson,
-                population,
-                area_sq_km
-            FROM districts
-            ORDER BY name
-        """
+        subscriber = broadcaster.subscribe(
+            int(last_event_id) if last_event_id.isdigit() else None
         )
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-        result = db.execute(query)
-        districts = []
-
-        for row in result:
-            districts.append(
-                {
-                    "name": row.name,
-                    "boundary": json.loads(row.boundary_geojson),
-                    "population": row.population,
-                    "area": row.area_sq_km,
-                }
-            )
+    return StreamingResponse(
+        broadcaster.frames(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Request, repository, SQL and pool metrics in Prometheus text format"""
+    return Response(
+        metrics.expose(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
-        return {"districts": districts}
+
+async def _read_batch(request: Request) -> list:
+    """Decode an ingestion request body into a list of raw records"""
+    try:
+        return ingest.parse_batch(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/ingest/water-levels")
+async def ingest_water_levels(
+    request: Request, repo: Repository = Depends(get_repository)
+):
+    """Bulk ingest water level readings sent as a JSON array or NDJSON"""
+    records = await _read_batch(request)
+    try:
+        return await ingest.ingest_water_levels(repo, records)
 
     except Exception as e:
+        await repo.rollback()
         raise HTTPException(
-            status_code=500, detail=f"Error fetching districts: {str(e)}"
+            status_code=500, detail=f"Error ingesting water levels: {str(e)}"
+        )
+
+
+@router.post("/ingest/rainfall")
+async def ingest_rainfall(request: Request, repo: Repository = Depends(get_repository)):
+    """Bulk ingest rainfall readings sent as a JSON array or NDJSON"""
+    records = await _read_batch(request)
+    try:
+        return await ingest.ingest_rainfall(repo, records)
+
+    except Exception as e:
+        await repo.rollback()
+        raise HTTPException(
+            status_code=500, detail=f"Error ingesting rainfall data: {str(e)}"
         )
@@ -0,0 +1,127 @@
+"""
+Read endpoint latency under concurrent load.
+
+Drives the read endpoints of a running FloodGuard backend from many parallel
+clients and reports p50/p99 latency per endpoint. Save a run taken before a
+change and compare a later run against it:
+
+    python benchmarks/bench_concurrency.py --clients 200 --save before.json
+    # ...deploy the change...
+    python benchmarks/bench_concurrency.py --clients 200 --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+ENDPOINTS = ["/stations", "/rainfall", "/forecast", "/alerts", "/districts"]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def client_loop(client, endpoints, requests_per_client, latencies, failures):
+    for i in range(requests_per_client):
+        path = endpoints[i % len(endpoints)]
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            failures[path] += 1
+            continue
+        latencies[path].append((time.perf_counter() - started) * 1000)
+
+
+async def run(args):
+    endpoints = args.endpoints or ENDPOINTS
+    latencies = {path: [] for path in endpoints}
+    failures = {path: 0 for path in endpoints}
+    limits = httpx.Limits(max_connections=args.clients)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+        # One warm-up pass so connection setup and cold caches are excluded
+        for path in endpoints:
+            await client.get(path)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                client_loop(
+                    client,
+                    endpoints[i % len(endpoints) :] + endpoints[: i % len(endpoints)],
+                    args.requests,
+                    latencies,
+                    failures,
+                )
+                for i in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for path in endpoints:
+        samples = latencies[path]
+        results[path] = {
+            "requests": len(samples),
+            "failures": failures[path],
+            "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+            "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+            "mean_ms": round(statistics.fmean(samples), 2) if samples else None,
+        }
+    total = sum(result["requests"] for result in results.values())
+    return {
+        "clients": args.clients,
+        "requests_per_sec": round(total / elapsed, 1),
+        "endpoints": results,
+    }
+
+
+def compare(before, after):
+    print(
+        f"{'endpoint':<12} {'p50 before':>11} {'p50 after':>10} "
+        f"{'p99 before':>11} {'p99 after':>10}"
+    )
+    for path, result in after["endpoints"].items():
+        previous = before["endpoints"].get(path, {})
+        print(
+            f"{path:<12} {previous.get('p50_ms')!s:>11} {result['p50_ms']!s:>10} "
+            f"{previous.get('p99_ms')!s:>11} {result['p99_ms']!s:>10}"
+        )
+    print(f"requests/sec: {before['requests_per_sec']} -> {after['requests_per_sec']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:5000/api")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=25, help="per client")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--endpoints", nargs="*")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from --save")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
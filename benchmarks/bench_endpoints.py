@@ -0,0 +1,324 @@
+"""
+Endpoint latency, throughput and allocation suite with regression gating.
+
+Seeds a scratch PostGIS database with a fixed profile of synthetic data
+(seed_data.py), starts the app in process and drives every endpoint in
+api_routes.py through httpx at a fixed concurrency. It reports p50/p95/p99
+latency, requests and rows per second, then allocations per request from a
+separate tracemalloc pass. Results are compared with the baseline stored under
+benchmarks/baselines/, and the run fails when a metric is worse by more than
+--max-regression. `/stream` is covered by bench_stream.py.
+
+    python benchmarks/bench_endpoints.py --database-url postgresql://localhost/bench
+    python benchmarks/bench_endpoints.py --database-url ... --save   # new baseline
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Seeded data sizes: stations and days of 15-minute readings
+PROFILES = {
+    "small": {"stations": 100, "days": 30},
+    "medium": {"stations": 1000, "days": 365},
+    "large": {"stations": 2000, "days": 5 * 365},
+}
+
+# Latency differences below this are noise whatever the ratio
+MIN_DELTA_MS = 1.0
+
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "alloc_kb")
+HIGHER_IS_BETTER = ("requests_per_sec", "rows_per_sec")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def tile_of(longitude, latitude, zoom):
+    """Web Mercator tile containing a point"""
+    scale = 2**zoom
+    x = int((longitude + 180) / 360 * scale)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * scale)
+    return zoom, x, y
+
+
+def endpoints(station_id, station_ids, now):
+    """(name, method, path, body builder) of every endpoint under test"""
+    z, x, y = tile_of(75.5, 31.0, 7)
+
+    def water_levels(i):
+        return [
+            {
+                "station_id": station_ids[(i + k) % len(station_ids)],
+                "level": 240.0 + (k % 50) / 10,
+                "timestamp": (now - timedelta(seconds=i * 500 + k)).isoformat(),
+            }
+            for k in range(500)
+        ]
+
+    def rainfall(i):
+        return [
+            {
+                "district": f"District {k % 22}",
+                "coordinates": [74.0 + (k % 30) / 10, 30.0 + (k % 20) / 10],
+                "rainfall_mm": (k % 40) / 4,
+                "timestamp": (now - timedelta(seconds=i * 100 + k)).isoformat(),
+            }
+            for k in range(100)
+        ]
+
+    history = f"/api/stations/{station_id}/history"
+    return [
+        ("stations", "GET", "/api/stations", None),
+        ("stations_bbox", "GET", "/api/stations?bbox=74.5,30.5,76,31.5", None),
+        ("history_7d", "GET", history, None),
+        (
+            "history_90d",
+            "GET",
+            f"{history}?from={(now - timedelta(days=90)).isoformat()}",
+            None,
+        ),
+        ("rainfall_24h", "GET", "/api/rainfall", None),
+        ("rainfall_168h", "GET", "/api/rainfall?hours=168", None),
+        ("forecast", "GET", "/api/forecast", None),
+        ("alerts", "GET", "/api/alerts", None),
+        ("districts", "GET", "/api/districts", None),
+        ("tile_districts", "GET", f"/api/tiles/districts/{z}/{x}/{y}.mvt", None),
+        ("tile_forecasts", "GET", f"/api/tiles/forecasts/{z}/{x}/{y}.mvt", None),
+        ("dashboard", "GET", "/api/dashboard", None),
+        ("ingest_water_levels", "POST", "/api/ingest/water-levels", water_levels),
+        ("ingest_rainfall", "POST", "/api/ingest/rainfall", rainfall),
+    ]
+
+
+def count_rows(response):
+    """Rows in a response: list lengths of a JSON payload, ingest acceptances"""
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return 0
+    payload = response.json()
+    if "accepted" in payload:
+        return payload["accepted"]
+    return sum(len(value) for value in payload.values() if isinstance(value, list))
+
+
+async def send(client, method, path, body, i):
+    if body is None:
+        return await client.request(method, path)
+    return await client.request(method, path, json=body(i))
+
+
+async def measure(client, endpoint, concurrency, requests):
+    """Latency percentiles and throughput of one endpoint at fixed concurrency"""
+    name, method, path, body = endpoint
+    await send(client, method, path, body, 0)  # warm caches and connections
+    latencies, rows, failures = [], 0, 0
+    queue = iter(range(1, requests + 1))
+
+    async def worker():
+        nonlocal rows, failures
+        for i in queue:
+            started = time.perf_counter()
+            response = await send(client, method, path, body, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                failures += 1
+            else:
+                rows += count_rows(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "rows_per_sec": round(rows / elapsed, 1),
+    }
+
+
+async def allocations(client, endpoint, requests):
+    """Median peak of Python allocations (KiB) while serving one request"""
+    name, method, path, body = endpoint
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(requests):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await send(client, method, path, body, requests + i)
+            peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(peaks), 1)
+
+
+def seed(database_url, profile, seed_value):
+    """Seed the profile into an empty database; reuse one already seeded"""
+    import numpy as np
+    from sqlalchemy import create_engine, text
+
+    import seed_data
+    from schema import init_schema
+
+    engine = create_engine(database_url)
+    init_schema(engine)
+    with engine.connect() as connection:
+        stations = connection.execute(
+            text("SELECT COUNT(*) FROM monitoring_stations")
+        ).scalar()
+    if stations:
+        if stations != PROFILES[profile]["stations"]:
+            print(f"warning: database has {stations} stations, not the profile's")
+        return
+
+    rng = np.random.default_rng(seed_value)
+    size = PROFILES[profile]
+    interval = timedelta(minutes=15)
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=size["days"])
+    districts = seed_data.make_districts(len(seed_data.DISTRICTS), rng)
+    stations = seed_data.make_stations(size["stations"], districts, rng)
+    storms = seed_data.make_storms(
+        max(1, round(12 * size["days"] / 365.25)), start, size["days"] * 24, rng
+    )
+    generator = seed_data.HydrographGenerator(
+        stations, districts, start, end, interval, storms, seed_value
+    )
+    seed_data.seed_database(engine, generator, 1_000_000)
+
+
+async def run(args):
+    import httpx
+
+    from main import create_app
+
+    app = create_app()
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=120
+        ) as client:
+            stations = (await client.get("/api/stations")).json()["stations"]
+            station_ids = [station["id"] for station in stations]
+            now = datetime.utcnow()
+            for endpoint in endpoints(station_ids[0], station_ids, now):
+                name = endpoint[0]
+                if args.endpoints and name not in args.endpoints:
+                    continue
+                result = await measure(
+                    client, endpoint, args.concurrency, args.requests
+                )
+                result["alloc_kb"] = await allocations(
+                    client, endpoint, args.alloc_requests
+                )
+                results[name] = result
+                print(json.dumps({"endpoint": name, **result}), flush=True)
+    return {
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "endpoints": results,
+    }
+
+
+def regressions(baseline, results, max_regression, min_delta_ms=MIN_DELTA_MS):
+    """Metrics worse than the baseline by more than max_regression (a fraction)"""
+    failures = []
+    for name, result in results["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        if result["failures"] > before.get("failures", 0):
+            failures.append(f"{name}: {result['failures']} failed requests")
+        for metric in LOWER_IS_BETTER:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if metric.endswith("_ms") and new - old < min_delta_ms:
+                continue
+            if new > old * (1 + max_regression):
+                failures.append(f"{name}: {metric} {old} -> {new}")
+        for metric in HIGHER_IS_BETTER:
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None and new < old / (1 + max_regression):
+                failures.append(f"{name}: {metric} {old} -> {new}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--database-url",
+        default=os.environ.get("DATABASE_URL"),
+        help="scratch PostGIS database (seeded if empty)",
+    )
+    parser.add_argument("--profile", choices=PROFILES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="per endpoint")
+    parser.add_argument("--alloc-requests", type=int, default=20)
+    parser.add_argument("--endpoints", nargs="*", help="only these endpoints")
+    parser.add_argument("--baseline", help="baseline JSON (default per profile)")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=float(os.environ.get("PERF_MAX_REGRESSION", "0.2")),
+        help="allowed slowdown as a fraction of the baseline",
+    )
+    parser.add_argument("--save", action="store_true", help="write the baseline")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    # The app reads these at import; background jobs would skew the timings
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("STORAGE_MAINTENANCE_HOURS", "0")
+    os.environ.setdefault("FORECAST_INTERVAL_MINUTES", "0")
+
+    seed(args.database_url, args.profile, args.seed)
+    results = asyncio.run(run(args))
+
+    baseline_path = args.baseline or os.path.join(
+        BASELINE_DIR, f"endpoints-{args.profile}.json"
+    )
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save to record one")
+        return
+
+    with open(baseline_path) as f:
+        failures = regressions(json.load(f), results, args.max_regression)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"No regressions beyond {args.max_regression:.0%} of {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Ensemble forecast wall time against the number of worker processes.
+
+Runs the same ensemble on the synthetic network of bench_forecast.py once per
+worker count and reports the speedup over a single process. Expect close to
+linear scaling up to the physical core count; pool start-up (spawned
+interpreters importing NumPy) is included in every timing.
+
+    python benchmarks/bench_ensemble.py --stations 10000 --members 50 --workers 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_forecast import synthetic_network  # noqa: E402
+
+from ensemble import run_ensemble  # noqa: E402
+from forecast_engine import HISTORY_HOURS, extend_rainfall  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=10000)
+    parser.add_argument("--fan-in", type=int, default=50)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument(
+        "--workers",
+        default=",".join(str(2**i) for i in range((os.cpu_count() or 1).bit_length())),
+        help="comma-separated worker counts to time",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    network = synthetic_network(args.stations, args.fan_in, rng)
+    rain = extend_rainfall(rng.gamma(0.3, 4.0, (args.stations, HISTORY_HOURS)))
+    observed = network.normal_level + rng.uniform(-1, 5, args.stations)
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        started = time.perf_counter()
+        run_ensemble(network, rain, observed, args.members, workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(
+            json.dumps(
+                {
+                    "stations": args.stations,
+                    "members": args.members,
+                    "workers": workers,
+                    "cores": os.cpu_count(),
+                    "wall_s": round(elapsed, 2),
+                    "members_per_s": round(args.members / elapsed, 1),
+                    "speedup": round(baseline / elapsed, 2),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
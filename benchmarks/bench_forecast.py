@@ -0,0 +1,96 @@
+"""
+Throughput of the forecast engine on a synthetic river network.
+
+Builds N stations spread over four rivers. Each station drains into one of the
+`--fan-in` stations numbered before it on the same river, which gives
+branching trees about a hundred levels deep at 10k stations. It then times
+one full simulation: runoff, reservoir, Muskingum routing, rating and
+classification over 48 hours of history plus the 24-hour horizon.
+
+    python benchmarks/bench_forecast.py --stations 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from forecast_engine import (  # noqa: E402
+    HISTORY_HOURS,
+    RiverNetwork,
+    extend_rainfall,
+    simulate,
+)
+
+RIVERS = 4
+
+
+def synthetic_network(stations, fan_in, rng):
+    downstream = np.full(stations, -1, dtype=np.intp)
+    river = np.arange(stations) % RIVERS
+    position = np.arange(stations) // RIVERS
+    # Station k on a river drains into one of the fan_in stations before it
+    step = rng.integers(1, fan_in + 1, stations)
+    target = position - step
+    routed = target >= 0
+    downstream[routed] = target[routed] * RIVERS + river[routed]
+    normal = rng.uniform(200, 300, stations)
+    return RiverNetwork(
+        downstream=downstream,
+        area_km2=rng.uniform(100, 1000, stations),
+        curve_number=rng.uniform(60, 90, stations),
+        reservoir_k=rng.uniform(0.6, 0.9, stations),
+        muskingum_k=rng.uniform(1.0, 6.0, stations),
+        muskingum_x=rng.uniform(0.0, 0.1, stations),
+        normal_level=normal,
+        warning_level=normal + 4,
+        danger_level=normal + 7,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=10000)
+    parser.add_argument("--fan-in", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    network = synthetic_network(args.stations, args.fan_in, rng)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    history = rng.gamma(0.3, 4.0, (args.stations, HISTORY_HOURS))
+    rain = extend_rainfall(history)
+    observed = network.normal_level + rng.uniform(-1, 5, args.stations)
+
+    timings = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        forecast = simulate(network, rain, observed)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    risks, counts = np.unique(forecast.risk, return_counts=True)
+    print(
+        json.dumps(
+            {
+                "stations": args.stations,
+                "timesteps": rain.shape[1],
+                "routing_levels": len(network.levels),
+                "network_build_ms": round(build_ms, 1),
+                "simulate_p50_ms": round(timings[len(timings) // 2], 1),
+                "simulate_min_ms": round(timings[0], 1),
+                "risk_counts": dict(zip(risks.tolist(), counts.tolist())),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency of station history downsampling.
+
+By default times the in-process path (downsampling plus JSON encoding) on a
+synthetic year of 15-minute readings. With --url it times
+`GET /stations/{id}/history` against a running backend instead, which adds
+the database scan and array transfer.
+
+    python benchmarks/bench_history.py --points 1000
+    python benchmarks/bench_history.py --url http://localhost:5000/api \\
+        --station 1 --days 365
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p99_ms": round(timings[min(len(timings) - 1, int(0.99 * len(timings)))], 3),
+    }
+
+
+def run_in_process(args):
+    from downsample import history_payload
+    from fast_json import dumps
+
+    size = args.days * 96
+    x = 1.7e9 + np.arange(size) * 900.0
+    rng = np.random.default_rng(0)
+    y = (
+        240
+        + 3 * np.sin(np.linspace(0, 2 * np.pi * args.days / 365, size))
+        + np.cumsum(rng.normal(0, 0.01, size))
+    )
+
+    for method in ("lttb", "minmax"):
+        timings = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            dumps(history_payload(x, y, args.points, 242.5, 243.5, method))
+            timings.append((time.perf_counter() - started) * 1000)
+        print(
+            json.dumps(
+                {
+                    "mode": "in-process",
+                    "method": method,
+                    "readings": size,
+                    "points": args.points,
+                    **summarize(timings),
+                }
+            )
+        )
+
+
+def run_remote(args):
+    import httpx
+
+    end = datetime.utcnow()
+    params = {
+        "from": (end - timedelta(days=args.days)).isoformat(),
+        "to": end.isoformat(),
+        "points": args.points,
+    }
+    timings = []
+    with httpx.Client(base_url=args.url, timeout=30) as client:
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            response = client.get(f"/stations/{args.station}/history", params=params)
+            response.raise_for_status()
+            timings.append((time.perf_counter() - started) * 1000)
+    body = response.json()
+    print(
+        json.dumps(
+            {
+                "mode": "remote",
+                "readings": body["totalReadings"],
+                "points": len(body["points"]),
+                **summarize(timings),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="time a running backend instead")
+    parser.add_argument("--station", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.url:
+        run_remote(args)
+    else:
+        run_in_process(args)
+
+
+if __name__ == "__main__":
+    main()
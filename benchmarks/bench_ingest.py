@@ -0,0 +1,133 @@
+"""
+Sustained ingestion throughput benchmark.
+
+Posts NDJSON batches of synthetic readings to a running FloodGuard backend and
+reports accepted rows per second for each ingestion endpoint.
+
+    python benchmarks/bench_ingest.py --url http://localhost:5000/api \\
+        --batch-size 5000 --batches 40 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+DISTRICTS = [
+    ("Amritsar", 74.8723, 31.6340),
+    ("Ludhiana", 75.8573, 30.9010),
+    ("Jalandhar", 75.5762, 31.3260),
+    ("Patiala", 76.3869, 30.3398),
+    ("Firozpur", 74.6122, 30.9328),
+]
+
+
+def water_level_batch(station_ids, size, start):
+    lines = []
+    for i in range(size):
+        lines.append(
+            json.dumps(
+                {
+                    "station_id": random.choice(station_ids),
+                    "level": round(random.uniform(200.0, 300.0), 2),
+                    "timestamp": (start + timedelta(seconds=i)).isoformat(),
+                }
+            )
+        )
+    return "\n".join(lines).encode()
+
+
+def rainfall_batch(size, start):
+    lines = []
+    for i in range(size):
+        district, lon, lat = random.choice(DISTRICTS)
+        lines.append(
+            json.dumps(
+                {
+                    "district": district,
+                    "coordinates": [lon, lat],
+                    "rainfall_mm": round(random.uniform(0.0, 15.0), 2),
+                    "duration_hours": 1,
+                    "timestamp": (start + timedelta(seconds=i)).isoformat(),
+                }
+            )
+        )
+    return "\n".join(lines).encode()
+
+
+async def run_endpoint(client, path, bodies, concurrency):
+    """Post every body with bounded concurrency and return accepted rows/sec"""
+    semaphore = asyncio.Semaphore(concurrency)
+    accepted = 0
+    rejected = 0
+
+    async def post(body):
+        nonlocal accepted, rejected
+        async with semaphore:
+            response = await client.post(
+                path,
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            response.raise_for_status()
+            summary = response.json()
+            accepted += summary["accepted"]
+            rejected += summary["rejected"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(post(body) for body in bodies))
+    elapsed = time.perf_counter() - started
+    return {
+        "endpoint": path,
+        "accepted": accepted,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(accepted / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def main(args):
+    random.seed(args.seed)
+    start = datetime.utcnow() - timedelta(days=1)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+        response = await client.get("/stations")
+        response.raise_for_status()
+        station_ids = [station["id"] for station in response.json()["stations"]]
+        if not station_ids:
+            raise SystemExit("No active stations; run seed_data.py first")
+
+        # Build payloads up front so client-side JSON encoding is not measured
+        level_bodies = [
+            water_level_batch(station_ids, args.batch_size, start)
+            for _ in range(args.batches)
+        ]
+        rain_bodies = [
+            rainfall_batch(args.batch_size, start) for _ in range(args.batches)
+        ]
+
+        results = [
+            await run_endpoint(
+                client, "/ingest/water-levels", level_bodies, args.concurrency
+            ),
+            await run_endpoint(
+                client, "/ingest/rainfall", rain_bodies, args.concurrency
+            ),
+        ]
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:5000/api")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Encoding cost of polygon-heavy responses: decode/re-encode vs raw pass-through.
+
+Builds a forecast payload whose polygons serialize to a few megabytes of
+GeoJSON text, as PostGIS returns them, then times the previous path
+(json.loads per polygon, FastAPI's jsonable_encoder and JSONResponse) against
+RawJSON fragments spliced in by fast_json.dumps.
+
+    python benchmarks/bench_json.py --polygons 4 --vertices 50000
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from fast_json import FastJSONResponse, RawJSON  # noqa: E402
+
+
+def polygon_geojson(vertices, seed):
+    # Irregular ring around a Punjab-ish centre, 6 decimal places like ST_AsGeoJSON
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = 0.2 + 0.02 * math.sin(37 * angle + seed)
+        ring.append(
+            [
+                round(75.5 + radius * math.cos(angle), 6),
+                round(31.0 + radius * math.sin(angle), 6),
+            ]
+        )
+    ring.append(ring[0])
+    return json.dumps({"type": "Polygon", "coordinates": [ring]}, separators=(",", ":"))
+
+
+def forecast_rows(polygons, vertices):
+    return [
+        {
+            "district": f"District {i}",
+            "riskLevel": "high",
+            "area_geojson": polygon_geojson(vertices, i),
+            "forecastTime": "2025-08-01T12:00:00",
+            "confidence": 0.8,
+            "affectedPopulation": 120000,
+            "createdAt": "2025-08-01T06:00:00",
+        }
+        for i in range(polygons)
+    ]
+
+
+def build(rows, area):
+    forecasts = []
+    for row in rows:
+        forecast = {k: v for k, v in row.items() if k != "area_geojson"}
+        forecast["area"] = area(row["area_geojson"])
+        forecasts.append(forecast)
+    return {"forecasts": forecasts}
+
+
+def decode_path(rows):
+    return JSONResponse(jsonable_encoder(build(rows, json.loads))).body
+
+
+def raw_path(rows):
+    return FastJSONResponse(build(rows, RawJSON)).body
+
+
+def measure(fn, rows, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        body = fn(rows)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return body, {
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "min_ms": round(timings[0], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--polygons", type=int, default=4)
+    parser.add_argument("--vertices", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = forecast_rows(args.polygons, args.vertices)
+    geojson_bytes = sum(len(row["area_geojson"]) for row in rows)
+
+    decoded_body, decoded = measure(decode_path, rows, args.iterations)
+    raw_body, raw = measure(raw_path, rows, args.iterations)
+    assert json.loads(decoded_body) == json.loads(raw_body)
+
+    for path, stats, body in (
+        ("decode", decoded, decoded_body),
+        ("raw", raw, raw_body),
+    ):
+        print(
+            json.dumps(
+                {
+                    "path": path,
+                    "polygons": args.polygons,
+                    "geojson_bytes": geojson_bytes,
+                    "body_bytes": len(body),
+                    **stats,
+                }
+            )
+        )
+    print(json.dumps({"speedup": round(decoded["p50_ms"] / raw["p50_ms"], 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Per-request overhead of the metrics instrumentation.
+
+Times each hook with and without instrumentation and reports the difference
+in microseconds: a histogram observation, the ASGI middleware around a bare
+app, the repository call wrapper, and the SQLAlchemy cursor events on a
+SQLite `SELECT 1`. The statement figure includes the event dispatch that
+SQLAlchemy switches on once any listener is attached. Also reports how long a /api/metrics scrape takes to
+render with many series.
+
+    python benchmarks/bench_metrics.py --iterations 200000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import (  # noqa: E402
+    Histogram,
+    Metrics,
+    MetricsMiddleware,
+    metrics,
+    timed_calls,
+)
+
+
+def per_call_us(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def per_await_us(make, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await make()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def bare_app(scope, receive, send):
+    scope["route"] = None
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def middleware_overhead(iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/stations"}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    wrapped = MetricsMiddleware(bare_app)
+    bare = await per_await_us(lambda: bare_app(dict(scope), receive, send), iterations)
+    timed = await per_await_us(lambda: wrapped(dict(scope), receive, send), iterations)
+    return timed - bare
+
+
+async def repository_overhead(iterations: int) -> float:
+    class Plain:
+        async def stations(self):
+            return None
+
+    Timed = timed_calls("bench")(type("Timed", (), dict(vars(Plain))))
+    plain, timed = Plain(), Timed()
+    return await per_await_us(timed.stations, iterations) - await per_await_us(
+        plain.stations, iterations
+    )
+
+
+def statement_overhead(iterations: int) -> float:
+    statement = text("SELECT 1")
+
+    def select_one_us(engine):
+        with engine.connect() as connection:
+            return per_call_us(
+                lambda: connection.execute(statement).scalar(), iterations
+            )
+
+    plain = create_engine("sqlite://")
+    timed = create_engine("sqlite://")
+    metrics.instrument_engine(timed, "bench")
+    # Alternate and keep the best round of each, the statement itself is noisy
+    rounds = [(select_one_us(plain), select_one_us(timed)) for _ in range(5)]
+    return min(t for _, t in rounds) - min(p for p, _ in rounds)
+
+
+def scrape_ms(routes: int) -> float:
+    registry = Metrics()
+    for route in range(routes):
+        for status in (200, 404, 500):
+            registry.requests.observe(("GET", f"/api/route{route}", status), 0.01)
+            registry.repository_calls.observe(("postgis", f"call{route}"), 0.01)
+    started = time.perf_counter()
+    registry.expose()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--routes", type=int, default=30)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "Bench", ("route",))
+    labels = ("/api/stations",)
+    print(
+        json.dumps(
+            {
+                "observe_us": round(
+                    per_call_us(
+                        lambda: histogram.observe(labels, 0.003), args.iterations
+                    ),
+                    3,
+                ),
+                "middleware_us": round(
+                    asyncio.run(middleware_overhead(args.iterations)), 3
+                ),
+                "repository_call_us": round(
+                    asyncio.run(repository_overhead(args.iterations)), 3
+                ),
+                "statement_us": round(statement_overhead(args.iterations // 10), 3),
+                "scrape_ms": round(scrape_ms(args.routes), 3),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
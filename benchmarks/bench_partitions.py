@@ -0,0 +1,166 @@
+"""
+Read latency on the partitioned water_levels table as history grows.
+
+Needs a scratch PostgreSQL/PostGIS database: the schema is created there and
+synthetic 15-minute readings are appended month by month, going back in time,
+until each step's row count is reached (1M, 10M and 100M by default). Rows are
+generated server-side, so the rollup trigger sees every insert. After each
+step it times the queries behind the station list (latest reading per
+station), the store catch-up, a 7-day raw history and a 1-year history served
+from the hourly rollups. Latencies should stay flat across steps.
+
+    python benchmarks/bench_partitions.py \\
+        --database-url postgresql://localhost/floodguard_bench
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from partitions import (  # noqa: E402
+    PARTITIONED_TABLES,
+    add_months,
+    ensure_partitions,
+    month_start,
+)
+from schema import init_schema  # noqa: E402
+
+READING_INTERVAL = timedelta(minutes=15)
+
+FILL_MONTH = text(
+    """
+    INSERT INTO water_levels (station_id, level, timestamp, status)
+    SELECT
+        s,
+        240 + 3 * sin(EXTRACT(EPOCH FROM t) / 86400.0 + s) + random(),
+        t,
+        'normal'
+    FROM generate_series(1, :stations) s,
+        generate_series(:start, :end - INTERVAL '1 second', INTERVAL '15 minutes') t
+"""
+)
+
+QUERIES = {
+    "latest_per_station": (
+        """
+        SELECT s, wl.level, wl.timestamp
+        FROM generate_series(1, :stations) s
+        LEFT JOIN LATERAL (
+            SELECT level, timestamp
+            FROM water_levels
+            WHERE station_id = s
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ) wl ON true
+    """
+    ),
+    "catch_up": (
+        """
+        SELECT DISTINCT ON (station_id) station_id, level, timestamp
+        FROM water_levels
+        WHERE id > (SELECT MAX(id) FROM water_levels) - :stations
+        ORDER BY station_id, timestamp DESC
+    """
+    ),
+    "history_7d_raw": (
+        """
+        SELECT array_agg(level ORDER BY timestamp)
+        FROM water_levels
+        WHERE station_id = 1
+        AND timestamp >= :now - INTERVAL '7 days' AND timestamp < :now
+    """
+    ),
+    "history_365d_hourly": (
+        """
+        SELECT array_agg(level_max ORDER BY bucket)
+        FROM water_levels_hourly
+        WHERE station_id = 1
+        AND bucket >= :now - INTERVAL '365 days' AND bucket < :now
+    """
+    ),
+}
+
+
+def time_queries(engine, stations, now, iterations):
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in QUERIES.items():
+            query = text(sql)
+            params = {"stations": stations, "now": now}
+            connection.execute(query, params).all()  # warm the cache
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                connection.execute(query, params).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[f"{name}_p50_ms"] = round(statistics.median(timings), 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", required=True, help="scratch database")
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument(
+        "--steps",
+        type=lambda value: [int(step) for step in value.split(",")],
+        default=[1_000_000, 10_000_000, 100_000_000],
+        help="comma-separated row counts to time at",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    init_schema(engine)
+    with engine.begin() as connection:
+        connection.execute(text("TRUNCATE water_levels, water_levels_hourly"))
+        connection.execute(text("TRUNCATE water_levels_daily"))
+
+    now = datetime.utcnow().replace(microsecond=0)
+    month_rows = args.stations * int(timedelta(days=30) / READING_INTERVAL)
+    month = add_months(month_start(now), 1)
+    rows = 0
+    for target in args.steps:
+        started = time.perf_counter()
+        while rows < target:
+            start = add_months(month, -1)
+            with engine.begin() as connection:
+                for table in PARTITIONED_TABLES:
+                    ensure_partitions(connection, table, start, start)
+                connection.execute(
+                    FILL_MONTH,
+                    {"stations": args.stations, "start": start, "end": min(month, now)},
+                )
+            month = start
+            rows += month_rows
+        fill_seconds = time.perf_counter() - started
+
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            connection.execute(text("VACUUM ANALYZE water_levels"))
+            connection.execute(text("VACUUM ANALYZE water_levels_hourly"))
+
+        print(
+            json.dumps(
+                {
+                    "rows": rows,
+                    "months": (now.year - month.year) * 12 + now.month - month.month,
+                    "fill_s": round(fill_seconds, 1),
+                    **time_queries(engine, args.stations, now, args.iterations),
+                }
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
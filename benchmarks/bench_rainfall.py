@@ -0,0 +1,74 @@
+"""
+Rainfall window lookups from the hourly prefix-sum store.
+
+Fills the store with three days of hourly readings for N gauges, then times
+`totals(hours)` for several windows (the work behind `/api/rainfall`) and the
+cost of adding an ingestion batch.
+
+    python benchmarks/bench_rainfall.py --gauges 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rainfall_store import RAINFALL_WINDOW_HOURS, RainfallStore  # noqa: E402
+
+
+def readings(gauges, when, rng):
+    return [
+        {
+            "district": f"District {g % 36}",
+            "longitude": 70.0 + g * 1e-3,
+            "latitude": 30.0,
+            "rainfall_mm": float(amount),
+            "timestamp": when,
+        }
+        for g, amount in zip(range(gauges), rng.gamma(0.3, 4.0, gauges))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gauges", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = datetime(2024, 7, 1, 12, 30)
+    store = RainfallStore()
+    add_ms = []
+    for hour in range(RAINFALL_WINDOW_HOURS, -1, -1):
+        batch = readings(args.gauges, now - timedelta(hours=hour), rng)
+        started = time.perf_counter()
+        store.add(batch)
+        add_ms.append((time.perf_counter() - started) * 1000)
+
+    for hours in (1, 6, 24, 72):
+        timings = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            store.totals(hours, now)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(
+            json.dumps(
+                {
+                    "gauges": args.gauges,
+                    "hours": hours,
+                    "totals_p50_ms": round(timings[len(timings) // 2], 3),
+                    "add_batch_p50_ms": round(sorted(add_ms)[len(add_ms) // 2], 2),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
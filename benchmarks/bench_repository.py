@@ -0,0 +1,119 @@
+"""
+Read latency of the in-memory repository, without a database.
+
+Fills a MemoryRepository from the synthetic history generator (seed_data.py)
+and times the reads behind the read-heavy endpoints: a station's raw 7-day
+and hourly 1-year history, the latest reading of every station, the store
+catch-up, rainfall totals and forecasts. It also reports the cost of
+appending an ingestion batch and of merging the unsorted tail. Compare with
+bench_partitions.py for the same reads on PostGIS.
+
+    python benchmarks/bench_repository.py --stations 1000 --days 365
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import seed_data  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+async def run(repo, stations, end, iterations):
+    results = {}
+    rng = np.random.default_rng(1)
+    week, year = end - timedelta(days=7), end - timedelta(days=365)
+
+    async def time_call(name, make):
+        await make()  # warm
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await make()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[f"{name}_p50_ms"] = round(statistics.median(timings), 4)
+
+    def station():
+        return int(rng.integers(1, stations + 1))
+
+    await time_call(
+        "history_7d_raw", lambda: repo.level_series(station(), week, end, False)
+    )
+    await time_call(
+        "history_365d_hourly", lambda: repo.level_series(station(), year, end, True)
+    )
+    await time_call("latest_per_station", repo.stations)
+    last_id = await repo.max_reading_id()
+    await time_call("catch_up", lambda: repo.latest_readings(last_id - stations))
+    await time_call(
+        "rainfall_24h", lambda: repo.rainfall_totals(end - timedelta(hours=24))
+    )
+    await time_call(
+        "forecasts",
+        lambda: repo.forecasts(end - timedelta(hours=24), end + timedelta(hours=24)),
+    )
+
+    batch = [
+        {
+            "station_id": i % stations + 1,
+            "level": 240.0,
+            "timestamp": end,
+            "status": "normal",
+        }
+        for i in range(500)
+    ]
+    await time_call("ingest_500", lambda: repo.insert_water_levels(batch))
+    started = time.perf_counter()
+    repo.merge()
+    results["merge_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    end = datetime(2024, 9, 1)
+    start = end - timedelta(days=args.days)
+    districts = seed_data.make_districts(len(seed_data.DISTRICTS), rng)
+    stations = seed_data.make_stations(args.stations, districts, rng)
+    storms = seed_data.make_storms(
+        max(1, round(12 * args.days / 365.25)), start, args.days * 24, rng
+    )
+    generator = seed_data.HydrographGenerator(
+        stations, districts, start, end, timedelta(minutes=15), storms, args.seed
+    )
+
+    repo = MemoryRepository()
+    started = time.perf_counter()
+    rows = seed_data.seed_memory(repo, generator, 1_000_000)
+    fill_seconds = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {
+                "stations": args.stations,
+                "readings": rows,
+                "fill_s": round(fill_seconds, 1),
+                **asyncio.run(run(repo, args.stations, end, args.iterations)),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
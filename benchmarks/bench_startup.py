@@ -0,0 +1,149 @@
+"""
+Import time of the app and time from process start to its first response.
+
+Imports main in fresh interpreters and reports the median import time and the
+modules that cost the most (-X importtime). It then starts serve.py, polls
+/api/health until it answers, and times the first /api/stations request,
+which shows whether the workers were warm when they started accepting. Runs
+against the configured DATA_BACKEND; DATA_BACKEND=memory needs no database.
+
+    DATA_BACKEND=memory python benchmarks/bench_startup.py --workers 2
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+IMPORT_MAIN = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def import_seconds(runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_MAIN],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def slowest_imports(count: int) -> list[tuple[str, float]]:
+    """Modules imported by main, by cumulative import time in milliseconds"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Modules imported by main itself are nested one level (two spaces)
+        if name.startswith("   ") and not name.startswith("    "):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda m: -m[1])[:count]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(workers: int, timeout: float) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "serve.py",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--skip-migrate",
+            "--no-jobs",
+        ],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            while True:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"No response from {url} in {timeout}s")
+                if server.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {server.returncode}")
+                try:
+                    if client.get(f"{url}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            ready = time.perf_counter() - started
+
+            first = time.perf_counter()
+            status = client.get(f"{url}/stations").status_code
+            first_stations = time.perf_counter() - first
+    finally:
+        server.terminate()
+        server.wait(30)
+    return {
+        "ready_s": round(ready, 3),
+        "first_stations_ms": round(first_stations * 1000, 1),
+        "first_stations_status": status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    timings = import_seconds(args.runs)
+    print(
+        json.dumps(
+            {
+                "import_main_p50_ms": round(statistics.median(timings) * 1000, 1),
+                "import_main_max_ms": round(max(timings) * 1000, 1),
+                "slowest_imports_ms": dict(slowest_imports(args.top)),
+            }
+        )
+    )
+    print(
+        json.dumps(
+            {
+                "workers": args.workers,
+                **time_to_first_request(args.workers, args.timeout),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Broadcast latency of the live update stream.
+
+By default runs in-process: subscribes N consumers to a fresh Broadcaster,
+publishes events at a fixed rate and measures the time from publish to each
+consumer receiving the frame. With --url it opens N real SSE connections to a
+running backend instead and measures against the events' `sentAt` field while
+you trigger updates (for example with bench_ingest.py).
+
+    python benchmarks/bench_stream.py --subscribers 10000 --events 50
+    python benchmarks/bench_stream.py --url http://localhost:5000/api \\
+        --subscribers 500 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {"samples": 0}
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 3)
+
+    return {
+        "samples": len(ordered),
+        "p50_ms": pick(50),
+        "p99_ms": pick(99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+async def run_in_process(args):
+    from stream import Broadcaster
+
+    broadcaster = Broadcaster(buffer_size=args.buffer_size)
+    published = {}
+    latencies = []
+    resyncs = 0
+
+    async def consume(subscriber):
+        nonlocal resyncs
+        async for frame in broadcaster.frames(subscriber):
+            received = time.perf_counter()
+            if frame.startswith(b"event: resync"):
+                resyncs += 1
+                continue
+            if not frame.startswith(b"event:"):
+                continue
+            event_id = int(frame.split(b"\n", 2)[1][4:])
+            latencies.append((received - published[event_id]) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    subscribers = [broadcaster.subscribe() for _ in range(args.subscribers)]
+    consumers = [asyncio.create_task(consume(s)) for s in subscribers]
+    await asyncio.sleep(0.1)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    per_subscriber = sum(
+        stat.size_diff for stat in after.compare_to(before, "filename")
+    ) / max(1, args.subscribers)
+
+    publish_costs = []
+    payload = {"stations": [{"id": i, "status": "warning"} for i in range(5)]}
+    for _ in range(args.events):
+        started = time.perf_counter()
+        published[broadcaster._next_id] = started
+        broadcaster.publish("stations", payload)
+        publish_costs.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(args.interval)
+
+    await asyncio.sleep(0.5)
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+    return {
+        "mode": "in-process",
+        "subscribers": args.subscribers,
+        "events": args.events,
+        "latency": summarize(latencies),
+        "publish_ms": summarize(publish_costs),
+        "resyncs": resyncs,
+        "bytes_per_subscriber": round(per_subscriber),
+    }
+
+
+async def run_remote(args):
+    import httpx
+
+    latencies = []
+    deadline = time.monotonic() + args.duration
+
+    async def listen(client):
+        try:
+            async with client.stream("GET", "/stream") as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        data = json.loads(line[5:])
+                        if "sentAt" in data:
+                            sent = datetime.fromisoformat(data["sentAt"])
+                            delay = datetime.utcnow() - sent
+                            latencies.append(delay.total_seconds() * 1000)
+                    if time.monotonic() > deadline:
+                        return
+        except httpx.HTTPError:
+            return
+
+    limits = httpx.Limits(max_connections=args.subscribers)
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=None, limits=limits
+    ) as client:
+        tasks = [asyncio.create_task(listen(client)) for _ in range(args.subscribers)]
+        await asyncio.sleep(args.duration)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "mode": "remote",
+        "subscribers": args.subscribers,
+        "latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="stream from a running backend instead")
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--buffer-size", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    runner = run_remote if args.url else run_in_process
+    print(json.dumps(asyncio.run(runner(args))))
+
+
+if __name__ == "__main__":
+    main()
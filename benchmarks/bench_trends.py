@@ -0,0 +1,59 @@
+"""
+Sustained readings/sec through the rate-of-rise tracker in one process.
+
+Streams simulated 15-minute readings for N stations in ingestion-sized
+batches, with stations repeating inside a batch, and reports throughput per
+batch size. The target is 100k readings/sec.
+
+    python benchmarks/bench_trends.py --stations 10000 --readings 2000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from trends import TrendTracker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=10000)
+    parser.add_argument("--readings", type=int, default=2_000_000)
+    parser.add_argument("--batch-sizes", default="100,1000,10000")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ids = rng.integers(0, args.stations, args.readings)
+    # Readings arrive roughly in time order, every 15 minutes per station
+    per_station = args.readings / args.stations
+    times = np.sort(rng.uniform(0, per_station * 900, args.readings))
+    levels = 200 + np.cumsum(rng.normal(0, 0.01, args.readings))
+
+    for batch in [int(size) for size in args.batch_sizes.split(",")]:
+        tracker = TrendTracker(stations=args.stations)
+        started = time.perf_counter()
+        for start in range(0, args.readings, batch):
+            chunk = slice(start, start + batch)
+            tracker.update(ids[chunk], times[chunk], levels[chunk])
+        elapsed = time.perf_counter() - started
+        print(
+            json.dumps(
+                {
+                    "stations": args.stations,
+                    "readings": args.readings,
+                    "batch_size": batch,
+                    "readings_per_s": round(args.readings / elapsed),
+                    "us_per_batch": round(elapsed / (args.readings / batch) * 1e6, 1),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+ETags for the read endpoints, checked before any payload is built.
+
+An ETag is a digest of what a payload depends on, not of its body. That can
+be a table change counter (table_versions), the version counter of an
+in-memory store, and the request parameters. Payloads with a time window
+that moves with `now`, like forecasts for the next 24 hours, also change when
+rows enter or leave the window. Their ETags carry the time they were issued.
+A revalidation re-checks the window edges since then. The dashboard's
+`since` versions are built from the same per-section validators.
+
+`If-None-Match` is therefore answered with a version read and at most a
+couple of indexed boundary queries. The main query never runs and nothing
+is serialized.
+
+In-memory stores count versions per process, so their ETags include a
+process token. With several workers, a revalidation that lands on another
+worker simply gets a full response, and the result cache keeps those bodies
+in the worker that built them.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import queries
+from alert_engine import alert_engine
+from district_cache import district_cache, resolve_detail
+from rainfall_store import RAINFALL_WINDOW_HOURS
+from rainfall_store import store as rainfall_store
+from repository import DATA_BACKEND, Repository
+from station_store import store as station_store
+
+
+def window_boundaries(section: str, hours: int):
+    """(table, column, offset from now) of every time-window edge of a section"""
+    if section == "rainfall":
+        return [("rainfall_data", "timestamp", timedelta(hours=-hours))]
+    if section == "forecast":
+        return [
+            ("flood_forecasts", "created_at", timedelta(hours=-24)),
+            ("flood_forecasts", "forecast_time", timedelta(hours=24)),
+        ]
+    if section == "alerts":
+        return [
+            ("flood_forecasts", "created_at", timedelta(hours=-2)),
+            ("flood_forecasts", "forecast_time", timedelta(hours=24)),
+        ]
+    return []
+
+
+# Tells apart the store versions of this process from another worker's
+PROCESS_TAG = os.urandom(4).hex()
+
+# Issue times are whole seconds since this naive UTC epoch
+EPOCH = datetime(1970, 1, 1)
+
+# Repository reads are process-local unless they come from PostGIS itself
+REPOSITORY_TAG = "" if DATA_BACKEND == "postgis" else PROCESS_TAG
+
+
+class Validator:
+    """What a payload depends on, and the time windows it moves with"""
+
+    def __init__(self, parts: tuple, windows=()):
+        self.parts = parts
+        self.windows = list(windows)
+        # Whether every worker computes the same digest for the same data
+        self.shared = PROCESS_TAG not in parts
+        self.digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+    def __add__(self, other: "Validator") -> "Validator":
+        return Validator(self.parts + other.parts, self.windows + other.windows)
+
+    def etag(self, issued: datetime) -> str:
+        if not self.windows:
+            return f'W/"{self.digest}"'
+        return f'W/"{self.digest}-{int((issued - EPOCH).total_seconds())}"'
+
+
+def _client_tags(request: Request) -> list:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _issued(tag: str, digest: str) -> datetime | None:
+    """Issue time of one of our windowed tags for this digest, else None"""
+    body = tag.removeprefix("W/").strip('"')
+    prefix = f"{digest}-"
+    if not body.startswith(prefix) or not body[len(prefix) :].isdigit():
+        return None
+    return EPOCH + timedelta(seconds=int(body[len(prefix) :]))
+
+
+async def check(
+    request: Request, repo: Repository, validator: Validator
+) -> tuple[Response | None, str]:
+    """A 304 response if the client's copy is current, and the ETag to send"""
+    # Taken before the payload is read, so a tag never claims newer data
+    now = datetime.utcnow()
+    for tag in _client_tags(request):
+        if tag == "*":
+            return not_modified(validator.etag(now)), validator.etag(now)
+        if not validator.windows:
+            if tag == validator.etag(now):
+                return not_modified(tag), tag
+            continue
+        issued = _issued(tag, validator.digest)
+        if issued is None:
+            continue
+        if not await crossed_windows(repo, validator, issued):
+            return not_modified(tag), tag
+    return None, validator.etag(now)
+
+
+async def crossed_windows(repo: Repository, validator: Validator, issued) -> bool:
+    """Whether rows entered or left one of the validator's windows since `issued`"""
+    for table, column, offset in validator.windows:
+        if await queries.rows_crossed_boundary(repo, table, column, offset, issued):
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def _table_version(repo: Repository, table: str):
+    versions = await repo.table_versions()
+    return versions.get(table, (None, None))[0]
+
+
+async def stations(repo: Repository, bbox=None) -> Validator:
+    await queries.ensure_station_store(repo)
+    return Validator(("stations", PROCESS_TAG, station_store.version, bbox))
+
+
+async def history(
+    repo: Repository, station_id: int, start, end, points: int, method: str
+) -> Validator:
+    # The payload also embeds the station's latest state from the store
+    await queries.ensure_station_store(repo)
+    return Validator(
+        (
+            "history",
+            REPOSITORY_TAG,
+            await _table_version(repo, "water_levels"),
+            PROCESS_TAG,
+            station_store.version,
+            station_id,
+            start,
+            end,
+            points,
+            method,
+        )
+    )
+
+
+async def rainfall(repo: Repository, hours: int, bbox=None) -> Validator:
+    if not 1 <= hours <= RAINFALL_WINDOW_HOURS:
+        # Read from the table over a window ending now
+        return Validator(
+            (
+                "rainfall",
+                REPOSITORY_TAG,
+                await _table_version(repo, "rainfall_data"),
+                hours,
+                bbox,
+            ),
+            window_boundaries("rainfall", hours),
+        )
+    if not rainfall_store.warmed:
+        await rainfall_store.load(repo)
+    # Store windows are aligned to the hour and move when it turns
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return Validator(
+        ("rainfall", PROCESS_TAG, rainfall_store.version, hour, hours, bbox)
+    )
+
+
+async def forecasts(repo: Repository, bbox=None, zoom: str | None = None) -> Validator:
+    return Validator(
+        (
+            "forecast",
+            REPOSITORY_TAG,
+            await _table_version(repo, "flood_forecasts"),
+            bbox,
+            zoom,
+        ),
+        window_boundaries("forecast", 24),
+    )
+
+
+async def alerts(repo: Repository) -> Validator:
+    if not alert_engine.warmed:
+        await alert_engine.load(repo)
+    # A forecast run in another process moves the flood_forecasts version
+    await alert_engine.refresh_forecasts(repo)
+    # Forecasts expire from the panel with time, not only with writes
+    alert_engine.expire()
+    return Validator(("alerts", PROCESS_TAG, alert_engine.version))
+
+
+async def districts(
+    repo: Repository, detail: str, bbox=None, gzip: bool = False
+) -> Validator:
+    await district_cache.get(repo, detail)
+    return Validator(
+        (
+            "districts",
+            PROCESS_TAG,
+            district_cache.version,
+            resolve_detail(detail),
+            bbox,
+            gzip,
+        )
+    )
+
+
+async def section(repo: Repository, name: str, hours: int, detail: str):
+    """The validator of one dashboard section"""
+    if name == "stations":
+        return await stations(repo)
+    if name == "rainfall":
+        return await rainfall(repo, hours)
+    if name == "forecast":
+        return await forecasts(repo)
+    if name == "alerts":
+        return await alerts(repo)
+    return await districts(repo, detail)
+
+
+async def dashboard(
+    repo: Repository, sections: list, since, hours: int, detail: str
+) -> Validator:
+    """The validators of every included section, plus the request itself"""
+    validator = Validator(
+        ("dashboard", tuple(sections), since, hours, resolve_detail(detail))
+    )
+    for name in sections:
+        validator = validator + await section(repo, name, hours, detail)
+    return validator
+
+
+def tile(layer: str, version, z: int, x: int, y: int, ttl) -> Validator:
+    """Tiles change with their layer's version, and expire with their TTL"""
+    expiry = None
+    if ttl:
+        expiry = int((datetime.utcnow() - EPOCH).total_seconds() // ttl)
+    return Validator(("tile", REPOSITORY_TAG, layer, version, z, x, y, expiry))
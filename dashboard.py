@@ -0,0 +1,119 @@
+"""
+Combined dashboard snapshot built from concurrent section queries.
+
+`/api/dashboard` replaces the five requests the dashboard used to make on every
+refresh. Each requested section runs on its own repository session so the
+queries overlap on the database. A client that passes back the previous
+response's `version` as `since` only receives the sections whose data changed
+in between.
+
+A version lists the digest of each section's validator (conditional.py): the
+store versions and table change counters the section is read from, plus the
+time it was issued. Validators are read before the sections are built, so a
+section is only reported unchanged when its data has not moved since the
+client's copy, whatever the clocks or the lag of this worker's stores.
+Sections with a moving time window also check for rows that crossed it since
+the version was issued.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import conditional
+import queries
+from conditional import EPOCH
+from district_cache import DEFAULT_DETAIL
+from repository import Repository, open_repository
+
+SECTIONS = ("stations", "rainfall", "forecast", "alerts", "districts")
+
+
+def parse_include(include: str | None) -> list:
+    """Validate a comma separated section list, defaulting to every section"""
+    if not include:
+        return list(SECTIONS)
+    sections = [name.strip() for name in include.split(",") if name.strip()]
+    unknown = [name for name in sections if name not in SECTIONS]
+    if unknown:
+        raise ValueError(
+            f"Unknown section(s): {', '.join(unknown)}; "
+            f"expected any of {', '.join(SECTIONS)}"
+        )
+    return list(dict.fromkeys(sections))
+
+
+def version(issued: datetime, validators: dict) -> str:
+    """Version token of a snapshot: issue time, then a digest per section"""
+    seconds = int((issued - EPOCH).total_seconds())
+    digests = (f"{name}-{validator.digest}" for name, validator in validators.items())
+    return ".".join([str(seconds), *digests])
+
+
+def parse_version(token: str | None):
+    """(issue time, digest by section) of a version token, or None"""
+    seconds, _, rest = (token or "").partition(".")
+    if not seconds.isdigit():
+        return None
+    digests = dict(part.split("-", 1) for part in rest.split(".") if "-" in part)
+    return EPOCH + timedelta(seconds=int(seconds)), digests
+
+
+async def _is_unchanged(
+    repo: Repository, validator: conditional.Validator, digest: str, issued
+) -> bool:
+    if digest != validator.digest:
+        return False
+    return not await conditional.crossed_windows(repo, validator, issued)
+
+
+async def _build_section(section: str, hours: int, zoom: str) -> dict:
+    async with open_repository() as repo:
+        if section == "stations":
+            return await queries.get_stations(repo)
+        if section == "rainfall":
+            return await queries.get_rainfall(repo, hours)
+        if section == "forecast":
+            return await queries.get_forecasts(repo)
+        if section == "alerts":
+            return await queries.get_alerts(repo)
+        return await queries.get_districts(repo, zoom)
+
+
+async def build_dashboard(
+    repo: Repository,
+    sections: list,
+    since: str | None = None,
+    hours: int = 24,
+    zoom: str = DEFAULT_DETAIL,
+) -> dict:
+    """Assemble the requested sections, skipping those unchanged since `since`"""
+    # Taken before anything is read, so the version never claims newer data
+    generated_at = datetime.utcnow()
+    validators = {
+        section: await conditional.section(repo, section, hours, zoom)
+        for section in sections
+    }
+
+    unchanged = []
+    previous = parse_version(since)
+    if previous is not None:
+        issued, digests = previous
+        for section in sections:
+            if section in digests and await _is_unchanged(
+                repo, validators[section], digests[section], issued
+            ):
+                unchanged.append(section)
+
+    changed = [section for section in sections if section not in unchanged]
+    results = await asyncio.gather(
+        *(_build_section(section, hours, zoom) for section in changed)
+    )
+
+    payload = {
+        "generatedAt": generated_at.isoformat(),
+        "version": version(generated_at, validators),
+        "unchanged": unchanged,
+    }
+    for result in results:
+        payload.update(result)
+    return payload
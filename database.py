@@ -1,29 +1,114 @@
 """
 Database configuration and dependency injection for FloodGuard application.
+
+Engines and session factories are created on first use, so importing this
+module (and the app) needs neither DATABASE_URL nor a connection. `engine`,
+`SessionLocal`, `async_engine` and `AsyncSessionLocal` are still importable
+by name.
 """
 
 import os
+from functools import lru_cache
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from metrics import metrics
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Database setup
-DATABASE_URL = os.environ.get("DATABASE_URL")
-if not DATABASE_URL:
-    raise Exception("DATABASE_URL environment variable not set")
+# Connection pool settings shared by the sync and async engines
+POOL_OPTIONS = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+# Most connections a pool opens: its size plus the burst overflow
+POOL_CAPACITY = POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"]
+
+# Log every SQL statement (debugging only: it is slow and very verbose)
+DB_ECHO = os.environ.get("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+
+def database_url() -> str:
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        raise Exception("DATABASE_URL environment variable not set")
+    return url
+
+
+def to_async_url(url: str):
+    """Derive an asyncpg URL from a libpq-style DATABASE_URL"""
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    # asyncpg spells libpq's sslmode as ssl and has no channel_binding option
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    query.pop("channel_binding", None)
+    return parsed.set(drivername="postgresql+asyncpg", query=query)
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Synchronous engine for schema creation, seeding and scripts"""
+    engine = create_engine(database_url(), echo=DB_ECHO, **POOL_OPTIONS)
+    metrics.instrument_engine(engine, "sync", POOL_CAPACITY)
+    return engine
+
 
-engine = create_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@lru_cache(maxsize=None)
+def get_async_engine() -> AsyncEngine:
+    """Async engine used by the API routes so queries never block the event loop"""
+    url = os.environ.get("ASYNC_DATABASE_URL") or to_async_url(database_url())
+    engine = create_async_engine(url, echo=DB_ECHO, **POOL_OPTIONS)
+    metrics.instrument_engine(engine, "async", POOL_CAPACITY)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(
+        get_async_engine(), autoflush=False, expire_on_commit=False
+    )
+
+
+_LAZY = {
+    "engine": get_engine,
+    "async_engine": get_async_engine,
+    "SessionLocal": get_sessionmaker,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+
+def __getattr__(name):
+    # Module attributes for the engines, created when first imported
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Database dependency
 def get_db():
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
+
+
+# Async database dependency
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
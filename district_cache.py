@@ -0,0 +1,119 @@
+"""
+Pre-serialized, multi-resolution cache of district boundaries.
+
+District boundaries almost never change, so the `/api/districts` payload is
+built once per detail level and kept as ready-to-send JSON bytes plus a gzip
+copy. The cache is rebuilt when the `districts` row in `table_versions` moves,
+which the background refresh loop checks; requests never touch the database
+once the cache is warm.
+"""
+
+import gzip
+
+from fast_json import RawJSON, dumps
+from repository import Repository
+
+# Simplification tolerance per detail level, in degrees (None keeps full detail)
+DETAIL_TOLERANCES = {"low": 0.01, "mid": 0.002, "high": None}
+
+DEFAULT_DETAIL = "high"
+
+# Lowest web map zoom served by each detail level, finest first
+ZOOM_DETAIL_LEVELS = ((11, "high"), (8, "mid"), (0, "low"))
+
+
+def resolve_detail(zoom: str) -> str:
+    """Detail level for a `zoom` given as a level name or a web map zoom"""
+    if zoom in DETAIL_TOLERANCES:
+        return zoom
+    try:
+        map_zoom = int(zoom)
+    except (TypeError, ValueError):
+        map_zoom = -1
+    for minimum, detail in ZOOM_DETAIL_LEVELS:
+        if map_zoom >= minimum:
+            return detail
+    raise ValueError(
+        f"Unknown zoom '{zoom}'; expected a map zoom level or one of "
+        f"{', '.join(DETAIL_TOLERANCES)}"
+    )
+
+
+class DistrictPayload:
+    """One detail level: district dicts plus the encoded response bodies"""
+
+    __slots__ = ("districts", "bounds", "body", "gzip_body")
+
+    def __init__(self, districts, bounds):
+        self.districts = districts
+        self.bounds = bounds
+        self.body = dumps({"districts": districts})
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+
+    def within(self, bbox):
+        """Districts whose bounding box overlaps a (minLon, minLat, maxLon, maxLat) box"""
+        return [
+            district
+            for district, bounds in zip(self.districts, self.bounds)
+            if bounds[0] <= bbox[2]
+            and bounds[2] >= bbox[0]
+            and bounds[1] <= bbox[3]
+            and bounds[3] >= bbox[1]
+        ]
+
+
+class DistrictCache:
+    """District payloads keyed by detail level"""
+
+    def __init__(self):
+        self._payloads = {}
+        self.version = None
+
+    @property
+    def warmed(self):
+        return bool(self._payloads)
+
+    async def _table_version(self, repo: Repository):
+        versions = await repo.table_versions()
+        return versions.get("districts", (None, None))[0]
+
+    async def _fetch(self, repo: Repository, tolerance):
+        districts, bounds = [], []
+        for row in await repo.districts(tolerance):
+            districts.append(
+                {
+                    "name": row["name"],
+                    "boundary": RawJSON(row["boundary_geojson"]),
+                    "population": row["population"],
+                    "area": row["area_sq_km"],
+                }
+            )
+            bounds.append(
+                (row["min_lon"], row["min_lat"], row["max_lon"], row["max_lat"])
+            )
+        return DistrictPayload(districts, bounds)
+
+    async def build(self, repo: Repository):
+        """Rebuild every detail level from the districts table"""
+        version = await self._table_version(repo)
+        payloads = {}
+        for detail, tolerance in DETAIL_TOLERANCES.items():
+            payloads[detail] = await self._fetch(repo, tolerance)
+        self._payloads = payloads
+        self.version = version
+
+    async def refresh_if_changed(self, repo: Repository):
+        """Rebuild only if the districts table was written since the last build"""
+        if not self.warmed or await self._table_version(repo) != self.version:
+            await self.build(repo)
+
+    async def get(self, repo: Repository, detail: str = DEFAULT_DETAIL):
+        """Payload for a detail level or map zoom, building the cache on first use"""
+        detail = resolve_detail(detail)
+        if not self.warmed:
+            await self.build(repo)
+        return self._payloads[detail]
+
+
+# Process-wide cache used by the API routes
+district_cache = DistrictCache()
@@ -0,0 +1,163 @@
+"""
+Vectorized downsampling of station water level series for hydrograph charts.
+
+A year of 15-minute readings is ~35,000 points, far more than a chart can
+show. `downsample` reduces a series to a point budget with
+Largest-Triangle-Three-Buckets (keeps the visual shape) or per-bucket min/max
+(keeps every extreme), and always keeps the readings on both sides of a
+warning or danger threshold crossing so alerts stay visible on the chart.
+"""
+
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+STATUS_NAMES = ("normal", "warning", "danger")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of n points picked with Largest-Triangle-Three-Buckets"""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:n], dtype=np.intp)
+
+    # Work relative to the first timestamp to keep areas well conditioned
+    x = x - x[0]
+
+    # n - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, size - 1, n - 1).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[: size - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[: size - 1], edges[:-1]) / counts
+    # Each bucket is scored against the average of the bucket after it
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(n, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = size - 1
+    a = 0
+    for bucket in range(n - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[a] - next_x[bucket]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[bucket] - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[bucket + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the minimum and maximum of n // 2 equal buckets"""
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+
+    buckets = max(1, n // 2)
+    edges = np.linspace(0, size, buckets + 1).astype(np.intp)
+    width = int(np.diff(edges).max())
+
+    # Pad buckets to a common width so argmin/argmax run as one 2-D operation
+    index = edges[:-1, None] + np.arange(width)
+    valid = index < edges[1:, None]
+    values = y[np.minimum(index, size - 1)]
+    lows = np.where(valid, values, np.inf).argmin(axis=1)
+    highs = np.where(valid, values, -np.inf).argmax(axis=1)
+    return np.union1d(edges[:-1] + lows, edges[:-1] + highs)
+
+
+def classify(y: np.ndarray, warning_level: float, danger_level: float) -> np.ndarray:
+    """Status band per reading: 0 normal, 1 warning, 2 danger"""
+    return (y >= warning_level).astype(np.int8) + (y >= danger_level)
+
+
+def threshold_crossings(bands: np.ndarray) -> np.ndarray:
+    """Indices of readings right before each change of status band"""
+    return np.flatnonzero(bands[1:] != bands[:-1])
+
+
+def downsample(
+    x: np.ndarray,
+    y: np.ndarray,
+    points: int,
+    warning_level: float,
+    danger_level: float,
+    method: str = "lttb",
+):
+    """Indices of at most `points` readings, always keeping threshold crossings"""
+    if method not in METHODS:
+        raise ValueError(
+            f"Unknown method '{method}'; expected one of {', '.join(METHODS)}"
+        )
+    bands = classify(y, warning_level, danger_level)
+    crossings = threshold_crossings(bands)
+    if len(x) <= points:
+        return np.arange(len(x)), bands, crossings
+
+    # Both readings around a crossing are kept; the rest of the budget goes to
+    # the shape of the series
+    kept = np.union1d(crossings, crossings + 1)
+    budget = points - len(kept)
+    if budget < 2:
+        # More crossings than the budget allows: spread the budget over them
+        picks = np.linspace(0, len(kept) - 1, points).astype(np.intp)
+        return np.unique(kept[picks]), bands, crossings
+
+    if method == "lttb":
+        shape = lttb(x, y, budget)
+    else:
+        shape = minmax(y, budget)
+    return np.union1d(shape, kept), bands, crossings
+
+
+def to_iso(epoch_seconds: np.ndarray) -> np.ndarray:
+    """ISO 8601 strings for UTC epoch seconds, matching datetime.isoformat()"""
+    stamps = (epoch_seconds * 1e6).astype("datetime64[us]")
+    return np.datetime_as_string(stamps, unit="s")
+
+
+def history_payload(
+    x: np.ndarray,
+    y: np.ndarray,
+    points: int,
+    warning_level: float,
+    danger_level: float,
+    method: str = "lttb",
+) -> dict:
+    """Chart points and threshold crossings for one station series"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    indices, bands, crossings = downsample(
+        x, y, points, warning_level, danger_level, method
+    )
+
+    stamps = to_iso(x[indices]).tolist()
+    levels = y[indices].tolist()
+    statuses = bands[indices].tolist()
+
+    after = crossings + 1
+    crossing_stamps = to_iso(x[after]).tolist()
+    return {
+        "totalReadings": int(len(x)),
+        "points": [
+            {"timestamp": stamp, "level": level, "status": STATUS_NAMES[status]}
+            for stamp, level, status in zip(stamps, levels, statuses)
+        ],
+        "crossings": [
+            {
+                "timestamp": stamp,
+                "level": level,
+                "from": STATUS_NAMES[before],
+                "to": STATUS_NAMES[status],
+            }
+            for stamp, level, before, status in zip(
+                crossing_stamps,
+                y[after].tolist(),
+                bands[crossings].tolist(),
+                bands[after].tolist(),
+            )
+        ],
+    }
@@ -0,0 +1,167 @@
+"""
+Ensemble runs of the forecast engine for exceedance probabilities.
+
+Each member reruns `forecast_engine.simulate` with multiplicatively perturbed
+rainfall. Observed history gets a small gauge error and the persistence
+forecast a much larger one. Members are spread over a process pool. The
+network parameters, rainfall, observed levels and the (members x stations)
+output live in shared memory blocks that workers attach to by name, so only
+member indices cross the process boundary. The fraction of members in which
+a district reaches a risk class becomes the confidence of that class.
+"""
+
+import os
+from dataclasses import fields
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from forecast_engine import HISTORY_HOURS, RiverNetwork, simulate
+
+ENSEMBLE_MEMBERS = int(os.environ.get("ENSEMBLE_MEMBERS", "50"))
+
+# Worker processes; 0 uses every core
+ENSEMBLE_WORKERS = int(os.environ.get("ENSEMBLE_WORKERS", "0"))
+
+# Log-normal spread of rainfall: gauge error on history, forecast error ahead
+HISTORY_RAIN_SIGMA = 0.2
+FORECAST_RAIN_SIGMA = 0.6
+
+# Risk classes in increasing order, as ranks 0-3
+RISK_RANKS = ("low", "medium", "high", "critical")
+
+NETWORK_FIELDS = tuple(f.name for f in fields(RiverNetwork) if f.init)
+
+
+def perturb_rainfall(rain, history_hours, rng):
+    """Rainfall scaled by mean-one log-normal noise per station and hour"""
+    sigma = np.full(rain.shape[1], FORECAST_RAIN_SIGMA)
+    sigma[:history_hours] = HISTORY_RAIN_SIGMA
+    noise = rng.standard_normal(rain.shape) * sigma - sigma**2 / 2
+    return rain * np.exp(noise)
+
+
+def _run_members(arrays, network, members, seed, history_hours):
+    for member in members:
+        rng = np.random.default_rng([seed, member])
+        rain = perturb_rainfall(arrays["rain"], history_hours, rng)
+        forecast = simulate(network, rain, arrays["observed"], history_hours)
+        arrays["peaks"][member] = forecast.peak_level
+
+
+class SharedArrays:
+    """Named shared memory blocks holding copies of NumPy arrays"""
+
+    def __init__(self, arrays: dict):
+        self.blocks = {}
+        self.arrays = {}
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+            view[...] = array
+            self.blocks[name] = block
+            self.arrays[name] = view
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(spec, history_hours):
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    _worker.update(
+        blocks=blocks,
+        arrays=arrays,
+        history_hours=history_hours,
+        network=RiverNetwork(**{name: arrays[name] for name in NETWORK_FIELDS}),
+    )
+
+
+def _worker_members(members, seed):
+    _run_members(
+        _worker["arrays"], _worker["network"], members, seed, _worker["history_hours"]
+    )
+    return len(members)
+
+
+def run_ensemble(
+    network: RiverNetwork,
+    rain: np.ndarray,
+    observed: np.ndarray,
+    members: int = ENSEMBLE_MEMBERS,
+    workers: int = ENSEMBLE_WORKERS,
+    seed: int = 0,
+    history_hours: int = HISTORY_HOURS,
+) -> np.ndarray:
+    """Peak level of every station in every member, as (members, stations)"""
+    workers = min(workers or os.cpu_count() or 1, members)
+    if workers <= 1:
+        arrays = {
+            "rain": rain,
+            "observed": observed,
+            "peaks": np.empty((members, network.size)),
+        }
+        _run_members(arrays, network, range(members), seed, history_hours)
+        return arrays["peaks"]
+
+    inputs = {name: getattr(network, name) for name in NETWORK_FIELDS}
+    inputs.update(rain=rain, observed=observed)
+    inputs["peaks"] = np.empty((members, network.size))
+    with SharedArrays(inputs) as shared:
+        # A few chunks per worker keeps cores busy when members run unevenly
+        chunks = np.array_split(np.arange(members), workers * 4)
+        # Spawned workers stay safe when the caller runs threads (the server)
+        context = get_context("spawn")
+        with context.Pool(
+            workers, initializer=_init_worker, initargs=(shared.spec, history_hours)
+        ) as pool:
+            pool.starmap(
+                _worker_members,
+                [(chunk.tolist(), seed) for chunk in chunks if len(chunk)],
+            )
+        return shared.arrays["peaks"].copy()
+
+
+def district_exceedance(peaks, network: RiverNetwork, districts) -> dict:
+    """Per district, the fraction of members reaching each risk class"""
+    districts = np.asarray(districts, dtype=str)
+    names, index = np.unique(districts, return_inverse=True)
+    # Same thresholds as forecast_engine.classify_risk, counted as a rank
+    ranks = (
+        (peaks >= (network.normal_level + network.warning_level) / 2).astype(np.intp)
+        + (peaks >= network.warning_level)
+        + (peaks >= network.danger_level)
+    )
+    # Worst class reached in each district by each member
+    worst = np.zeros((len(peaks), len(names)), dtype=np.intp)
+    np.maximum.at(worst, (slice(None), index), ranks)
+
+    return {
+        name: {
+            risk: float((worst[:, d] >= rank).mean())
+            for rank, risk in enumerate(RISK_RANKS)
+            if rank > 0
+        }
+        for d, name in enumerate(names)
+    }
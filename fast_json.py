@@ -0,0 +1,62 @@
+"""
+Fast JSON encoding with pass-through of pre-encoded fragments.
+
+Geometry comes out of PostGIS as GeoJSON text. Decoding it into Python dicts
+only to encode it again is most of the CPU of a polygon-heavy response, so
+queries wrap the text in `RawJSON` and `dumps` splices those bytes straight into
+the orjson output of the surrounding payload.
+"""
+
+import re
+import secrets
+
+import orjson
+from fastapi.responses import Response
+
+# Stands in for a fragment while orjson encodes the rest of the payload. The
+# per-process token keeps strings in the data from being taken for one.
+_TOKEN = secrets.token_hex(8)
+_PLACEHOLDER = f"\x01{_TOKEN}:"
+_PLACEHOLDER_PATTERN = re.compile(rb'"\\u0001' + _TOKEN.encode() + rb':(\d+)"')
+
+
+class RawJSON:
+    """Already-encoded JSON emitted verbatim by `dumps`"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: bytes | str):
+        self.value = value.encode() if isinstance(value, str) else value
+
+    def decode(self):
+        return orjson.loads(self.value)
+
+
+def dumps(content) -> bytes:
+    """Encode content with orjson, splicing in any RawJSON fragments"""
+    fragments = []
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.value)
+            return f"{_PLACEHOLDER}{len(fragments) - 1}"
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    body = orjson.dumps(content, default=default)
+    if not fragments:
+        return body
+
+    # split() alternates surrounding text with captured fragment indexes
+    parts = _PLACEHOLDER_PATTERN.split(body)
+    for i in range(1, len(parts), 2):
+        parts[i] = fragments[int(parts[i])]
+    return b"".join(parts)
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded by `dumps`, bypassing FastAPI's generic encoder"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
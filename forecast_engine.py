@@ -0,0 +1,525 @@
+"""
+Rainfall-runoff and river routing model behind the 24-hour flood forecasts.
+
+Every station is treated as the outlet of a small local catchment on a river
+network. Hourly rainfall over the last two days plus a decaying persistence
+forecast is turned into runoff with the SCS curve number method, passed
+through a linear reservoir and routed downstream reach by reach with
+Muskingum. Both transforms are linear, so they are applied as impulse-response
+convolutions over all stations at once. The only Python loop is over network
+depth, where each step routes every station at that depth together. The
+simulated discharge is corrected to the latest observed level, converted back
+to a stage with a power-law rating curve and classified against the station
+thresholds.
+
+    python forecast_engine.py            # run and write flood_forecasts
+    python forecast_engine.py --dry-run  # print the forecast only
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import inundation
+from alert_engine import alert_engine
+from repository import PostgisRepository
+from station_store import StationStore
+
+logger = logging.getLogger(__name__)
+
+HISTORY_HOURS = 48
+HORIZON_HOURS = 24
+
+# Default catchment and channel parameters, used for every station until
+# calibrated values exist
+CATCHMENT_AREA_KM2 = 500.0
+CURVE_NUMBER = 75.0
+RESERVOIR_K = 0.8  # Fraction of local quickflow held back each hour
+MUSKINGUM_K_HOURS = 3.0
+MUSKINGUM_X = 0.1
+
+# Rating curve: depth above datum = a * Q ** b, with normal_level reached at
+# the baseflow of the contributing area
+BASEFLOW_CMS_PER_KM2 = 0.01
+NORMAL_DEPTH_M = 2.0
+RATING_EXPONENT = 0.6
+
+# Observed-minus-simulated discharge fades out with this time constant
+CORRECTION_DECAY_HOURS = 12.0
+
+# Rainfall persistence for the forecast horizon: mean of the last hours,
+# halving every RAIN_HALF_LIFE_HOURS
+RAIN_PERSISTENCE_HOURS = 6
+RAIN_HALF_LIFE_HOURS = 6.0
+
+# mm of rain per hour over one km2, in m3/s
+MM_KM2_PER_HOUR_TO_CMS = 1000.0 / 3600.0
+
+# Risk classes that get a flood_forecasts row
+PUBLISHED_RISKS = ("medium", "high", "critical")
+
+# Buffer around a station used as its forecast area when no DEM is configured
+# or the DEM keeps its forecast stage in the channel
+FLOOD_RADIUS_M = 2000.0
+
+# How often the server runs the engine itself; 0 leaves it to the CLI
+FORECAST_INTERVAL_MINUTES = float(os.environ.get("FORECAST_INTERVAL_MINUTES", "0"))
+
+# Advisory lock key so only one worker runs a forecast at a time
+FORECAST_LOCK_KEY = 7_310_011
+
+
+@dataclass
+class RiverNetwork:
+    """Station graph plus per-station catchment, channel and rating parameters"""
+
+    downstream: np.ndarray  # Index of the next station downstream, -1 at outlets
+    area_km2: np.ndarray
+    curve_number: np.ndarray
+    reservoir_k: np.ndarray
+    muskingum_k: np.ndarray
+    muskingum_x: np.ndarray
+    normal_level: np.ndarray
+    warning_level: np.ndarray
+    danger_level: np.ndarray
+    # (stations, their downstream stations) per depth, headwaters first
+    levels: list = field(init=False)
+    contributing_area: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.levels = routing_levels(self.downstream)
+        area = self.area_km2.astype(np.float64)
+        for nodes, receivers in self.levels:
+            np.add.at(area, receivers, area[nodes])
+        self.contributing_area = area
+
+    @property
+    def size(self):
+        return len(self.downstream)
+
+
+@dataclass
+class Forecast:
+    """Forecast levels and their classification for every station"""
+
+    levels: np.ndarray  # (stations, HORIZON_HOURS)
+    peak_level: np.ndarray
+    peak_hour: np.ndarray  # Hours after the run, 1-based
+    risk: np.ndarray
+    confidence: np.ndarray
+
+
+def routing_levels(downstream: np.ndarray) -> list:
+    """Group stations by depth from the headwaters for level-by-level routing"""
+    size = len(downstream)
+    routed = downstream >= 0
+    depth = np.zeros(size, dtype=np.intp)
+    for _ in range(size + 1):
+        # A station sits one level below its deepest upstream neighbour
+        reach = np.zeros(size, dtype=np.intp)
+        np.maximum.at(reach, downstream[routed], depth[routed] + 1)
+        updated = np.maximum(depth, reach)
+        if np.array_equal(updated, depth):
+            break
+        depth = updated
+    else:
+        raise ValueError("River network contains a cycle")
+
+    levels = []
+    for level in range(int(depth.max(initial=0)) + 1):
+        nodes = np.flatnonzero((depth == level) & routed)
+        if len(nodes):
+            levels.append((nodes, downstream[nodes]))
+    return levels
+
+
+def kernel_spectra(kernels: np.ndarray, steps: int) -> np.ndarray:
+    """Kernel transforms for causal_convolve, computed once per network"""
+    return np.fft.rfft(kernels, 2 * steps)
+
+
+def causal_convolve(spectra: np.ndarray, signals: np.ndarray) -> np.ndarray:
+    """Row-wise causal convolution truncated to the signal length, via FFT"""
+    steps = signals.shape[-1]
+    size = 2 * steps
+    return np.fft.irfft(spectra * np.fft.rfft(signals, size), size)[..., :steps]
+
+
+def reservoir_kernel(k: np.ndarray, steps: int) -> np.ndarray:
+    """Unit response of a linear reservoir releasing (1 - k) of storage per step"""
+    return (1 - k)[:, None] * k[:, None] ** np.arange(steps)
+
+
+def muskingum_kernel(k: np.ndarray, x: np.ndarray, steps: int, dt=1.0) -> np.ndarray:
+    """Unit response of a Muskingum reach: C0, then C0*C2 + C1 decaying by C2"""
+    denominator = k * (1 - x) + 0.5 * dt
+    c0 = (0.5 * dt - k * x) / denominator
+    c1 = (0.5 * dt + k * x) / denominator
+    c2 = (k * (1 - x) - 0.5 * dt) / denominator
+
+    kernel = np.empty((len(k), steps))
+    kernel[:, 0] = c0
+    kernel[:, 1:] = (c0 * c2 + c1)[:, None] * c2[:, None] ** np.arange(steps - 1)
+    return kernel
+
+
+def scs_runoff(rain: np.ndarray, curve_number: np.ndarray) -> np.ndarray:
+    """Hourly runoff depth in mm from hourly rain with the SCS curve number"""
+    retention = 25400.0 / curve_number - 254.0
+    initial_abstraction = 0.2 * retention
+    cumulative = np.cumsum(rain, axis=1)
+    excess = np.maximum(cumulative - initial_abstraction[:, None], 0.0)
+    runoff = excess**2 / (excess + retention[:, None])
+    return np.diff(runoff, axis=1, prepend=0.0)
+
+
+def route(network: RiverNetwork, local: np.ndarray) -> np.ndarray:
+    """Total discharge per station: local inflow plus routed upstream flow"""
+    steps = local.shape[1]
+    kernels = muskingum_kernel(network.muskingum_k, network.muskingum_x, steps)
+    spectra = kernel_spectra(kernels, steps)
+    total = local.copy()
+    for nodes, receivers in network.levels:
+        np.add.at(total, receivers, causal_convolve(spectra[nodes], total[nodes]))
+    return total
+
+
+def classify_risk(peak, normal, warning, danger) -> np.ndarray:
+    """Forecast risk class from the peak level and the station thresholds"""
+    return np.select(
+        [peak >= danger, peak >= warning, peak >= (normal + warning) / 2],
+        ["critical", "high", "medium"],
+        "low",
+    )
+
+
+def extend_rainfall(history: np.ndarray, horizon: int = HORIZON_HOURS) -> np.ndarray:
+    """Append a decaying persistence forecast to hourly rainfall history"""
+    recent = history[:, -RAIN_PERSISTENCE_HOURS:].mean(axis=1)
+    decay = 0.5 ** (np.arange(1, horizon + 1) / RAIN_HALF_LIFE_HOURS)
+    return np.concatenate([history, recent[:, None] * decay], axis=1)
+
+
+def simulate(
+    network: RiverNetwork,
+    rain: np.ndarray,
+    observed_level: np.ndarray,
+    history_hours: int = HISTORY_HOURS,
+) -> Forecast:
+    """Forecast levels from hourly rain covering history plus horizon"""
+    steps = rain.shape[1]
+    runoff = scs_runoff(rain, network.curve_number)
+    local = runoff * (network.area_km2 * MM_KM2_PER_HOUR_TO_CMS)[:, None]
+    reservoir = kernel_spectra(reservoir_kernel(network.reservoir_k, steps), steps)
+    local = causal_convolve(reservoir, local)
+    baseflow = network.contributing_area * BASEFLOW_CMS_PER_KM2
+    discharge = baseflow[:, None] + route(network, local)
+
+    # Rating curve through (baseflow, normal level)
+    datum = network.normal_level - NORMAL_DEPTH_M
+    scale = NORMAL_DEPTH_M / baseflow**RATING_EXPONENT
+    depth = np.maximum(observed_level - datum, 0.01)
+    observed = (depth / scale) ** (1 / RATING_EXPONENT)
+
+    # Nudge the simulation onto the latest observation, fading with lead time
+    now = history_hours - 1
+    correction = observed - discharge[:, now]
+    lead = np.arange(1, steps - now)
+    fade = np.exp(-lead / CORRECTION_DECAY_HOURS)
+    future = np.maximum(discharge[:, now + 1 :] + correction[:, None] * fade, 0.0)
+    levels = datum[:, None] + scale[:, None] * future**RATING_EXPONENT
+
+    peak_index = levels.argmax(axis=1)
+    peak = levels[np.arange(network.size), peak_index]
+    # How far the model had drifted from the observation, as a 0.3-0.95 score
+    agreement = 1 - np.abs(correction) / np.maximum(
+        np.maximum(observed, discharge[:, now]), 1e-9
+    )
+    return Forecast(
+        levels=levels,
+        peak_level=peak,
+        peak_hour=peak_index + 1,
+        risk=classify_risk(
+            peak,
+            network.normal_level,
+            network.warning_level,
+            network.danger_level,
+        ),
+        confidence=np.clip(agreement, 0.3, 0.95),
+    )
+
+
+def network_from_stations(stations) -> RiverNetwork:
+    """Chain each river's stations from the highest gauge datum downwards"""
+    # Normal level tracks bed elevation, which falls downstream
+    size = len(stations)
+    river = np.array([s.river for s in stations])
+    normal = np.array([s.normal_level for s in stations], dtype=np.float64)
+    order = np.lexsort((-normal, river))
+    downstream = np.full(size, -1, dtype=np.intp)
+    same_river = river[order[:-1]] == river[order[1:]]
+    downstream[order[:-1][same_river]] = order[1:][same_river]
+
+    return RiverNetwork(
+        downstream=downstream,
+        area_km2=np.full(size, CATCHMENT_AREA_KM2),
+        curve_number=np.full(size, CURVE_NUMBER),
+        reservoir_k=np.full(size, RESERVOIR_K),
+        muskingum_k=np.full(size, MUSKINGUM_K_HOURS),
+        muskingum_x=np.full(size, MUSKINGUM_X),
+        normal_level=normal,
+        warning_level=np.array([s.warning_level for s in stations], dtype=float),
+        danger_level=np.array([s.danger_level for s in stations], dtype=float),
+    )
+
+
+def hourly_rainfall(
+    station_districts, districts, rainfall_mm, duration_hours, end_hour, hours
+):
+    """Spread rainfall records over the hours they cover, per station district"""
+    station_districts = np.asarray(station_districts, dtype=str)
+    districts = np.asarray(districts, dtype=str)
+    names = np.union1d(station_districts, districts)
+    grid = np.zeros((len(names), hours))
+
+    duration = np.maximum(np.asarray(duration_hours, dtype=np.intp), 1)
+    record = np.repeat(np.arange(len(duration)), duration)
+    # Hours run backwards from the end of each measurement period
+    offset = np.arange(len(record)) - np.repeat(
+        np.cumsum(duration) - duration, duration
+    )
+    hour = np.asarray(end_hour, dtype=np.intp)[record] - 1 - offset
+    rate = (np.asarray(rainfall_mm, dtype=np.float64) / duration)[record]
+    district = np.searchsorted(names, districts)[record]
+    inside = (hour >= 0) & (hour < hours)
+    np.add.at(grid, (district[inside], hour[inside]), rate[inside])
+
+    # Districts without a gauge take the mean of those with one
+    measured = np.zeros(len(names), dtype=bool)
+    measured[np.unique(district)] = True
+    if measured.any():
+        grid[~measured] = grid[measured].mean(axis=0)
+    return grid[np.searchsorted(names, station_districts)]
+
+
+async def _load_rainfall(db: AsyncSession, start: datetime, stations):
+    query = text(
+        """
+        SELECT district, rainfall_mm, duration_hours,
+            EXTRACT(EPOCH FROM (timestamp - :start)) / 3600.0 as hours_in
+        FROM rainfall_data
+        WHERE timestamp > :start
+    """
+    )
+    rows = (await db.execute(query, {"start": start})).all()
+    return hourly_rainfall(
+        [s.district for s in stations],
+        [row.district for row in rows],
+        [row.rainfall_mm for row in rows],
+        [row.duration_hours for row in rows],
+        np.ceil([row.hours_in for row in rows]).astype(np.intp),
+        HISTORY_HOURS,
+    )
+
+
+@lru_cache(maxsize=1)
+def _load_dem(path):
+    return inundation.load_dem(path)
+
+
+def inundation_areas(stations, network, forecast, published):
+    """EWKT flood polygons keyed by station, plus stations inside another's"""
+    if not inundation.INUNDATION_DEM or len(published) == 0:
+        return {}, set()
+
+    dem, transform = _load_dem(inundation.INUNDATION_DEM)
+    extents = inundation.flood_extents(
+        dem,
+        transform,
+        [stations[i].longitude for i in published],
+        [stations[i].latitude for i in published],
+        forecast.peak_level[published],
+    )
+
+    # Relative height over the danger level decides which station reports a
+    # region several stations flood into
+    severity = (forecast.peak_level - network.danger_level) / np.maximum(
+        network.danger_level - network.normal_level, 1e-6
+    )
+    areas, covered = {}, set()
+    for extent in extents:
+        members = published[extent.stations]
+        owner = int(members[severity[members].argmax()])
+        polygon = extent.polygon.simplify(abs(transform.a), preserve_topology=True)
+        areas[owner] = f"SRID=4326;{polygon.wkt}"
+        covered.update(int(i) for i in members)
+    return areas, covered
+
+
+async def _write_forecasts(
+    db, stations, network, forecast, created_at, probabilities=None
+):
+    published = np.flatnonzero(np.isin(forecast.risk, PUBLISHED_RISKS))
+    span = np.maximum(network.danger_level - network.warning_level, 1e-6)
+    exceedance = np.clip((forecast.peak_level - network.warning_level) / span, 0, 3)
+    areas, covered = inundation_areas(stations, network, forecast, published)
+    rows = [
+        {
+            "area": areas.get(i),
+            "lon": stations[i].longitude,
+            "lat": stations[i].latitude,
+            "radius": FLOOD_RADIUS_M * (1 + float(exceedance[i])),
+            "district": stations[i].district,
+            "risk": str(forecast.risk[i]),
+            "forecast_time": created_at + timedelta(hours=int(forecast.peak_hour[i])),
+            "created_at": created_at,
+            "confidence": (
+                probabilities[stations[i].district][str(forecast.risk[i])]
+                if probabilities
+                else float(forecast.confidence[i])
+            ),
+        }
+        for i in published
+        if i in areas or i not in covered
+    ]
+
+    # A new run supersedes every forecast still pointing at the future
+    await db.execute(
+        text("DELETE FROM flood_forecasts WHERE forecast_time > :now"),
+        {"now": created_at},
+    )
+    if rows:
+        await db.execute(
+            text(
+                """
+                INSERT INTO flood_forecasts (
+                    forecast_area, district, risk_level, forecast_time,
+                    created_at, confidence, affected_population
+                )
+                SELECT
+                    area.geom, :district, :risk, :forecast_time,
+                    :created_at, :confidence,
+                    COALESCE((
+                        SELECT (d.population * LEAST(
+                            1.0, ST_Area(area.geom::geography) / 1e6
+                            / NULLIF(d.area_sq_km, 0)
+                        ))::int
+                        FROM districts d WHERE d.name = :district
+                    ), 0)
+                FROM (
+                    SELECT COALESCE(
+                        ST_GeomFromEWKT(CAST(:area AS text)),
+                        ST_Buffer(
+                            ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography,
+                            :radius
+                        )::geometry
+                    ) as geom
+                ) area
+            """
+            ),
+            rows,
+        )
+    return len(rows)
+
+
+async def run_forecast(db: AsyncSession, write: bool = True) -> dict:
+    """Forecast every active station and replace the current flood_forecasts"""
+    started = time.perf_counter()
+    created_at = datetime.utcnow().replace(microsecond=0)
+
+    if write:
+        lock = text("SELECT pg_try_advisory_xact_lock(:key)")
+        if not (await db.execute(lock, {"key": FORECAST_LOCK_KEY})).scalar():
+            return {"skipped": "another forecast run is in progress"}
+
+    # Read the latest levels afresh: the process running the jobs neither
+    # ingests nor catches up a station store of its own
+    latest = StationStore()
+    await latest.load(PostgisRepository(db))
+    stations = latest.all()
+    if not stations:
+        return {"stations": 0, "forecasts": 0}
+
+    network = network_from_stations(stations)
+    history = await _load_rainfall(
+        db, created_at - timedelta(hours=HISTORY_HOURS), stations
+    )
+    observed = np.array(
+        [s.level if s.level is not None else s.normal_level for s in stations]
+    )
+    rain = extend_rainfall(history)
+    forecast = simulate(network, rain, observed)
+
+    # Imported here: ensemble builds on this module
+    import ensemble
+
+    probabilities = None
+    if ensemble.ENSEMBLE_MEMBERS > 0:
+        peaks = await asyncio.to_thread(ensemble.run_ensemble, network, rain, observed)
+        probabilities = ensemble.district_exceedance(
+            peaks, network, [s.district for s in stations]
+        )
+
+    written = 0
+    if write:
+        written = await _write_forecasts(
+            db, stations, network, forecast, created_at, probabilities
+        )
+        await db.commit()
+        await alert_engine.refresh_forecasts(PostgisRepository(db))
+
+    return {
+        "createdAt": created_at.isoformat(),
+        "stations": len(stations),
+        "forecasts": written,
+        "ensembleMembers": ensemble.ENSEMBLE_MEMBERS,
+        "runtimeMs": round((time.perf_counter() - started) * 1000, 1),
+        "peaks": [
+            {
+                "station": s.name,
+                "peakLevel": round(float(forecast.peak_level[i]), 2),
+                "peakHour": int(forecast.peak_hour[i]),
+                "risk": str(forecast.risk[i]),
+            }
+            for i, s in enumerate(stations)
+        ],
+    }
+
+
+async def run_periodically():
+    """Background task running the engine every FORECAST_INTERVAL_MINUTES"""
+    from database import get_async_sessionmaker
+
+    while True:
+        await asyncio.sleep(FORECAST_INTERVAL_MINUTES * 60)
+        try:
+            async with get_async_sessionmaker()() as db:
+                result = await run_forecast(db)
+            logger.info(
+                "Forecast run: %s", {k: v for k, v in result.items() if k != "peaks"}
+            )
+        except Exception as e:
+            logger.warning("Forecast run failed: %s", e)
+
+
+async def _main(args):
+    from database import get_async_sessionmaker
+
+    async with get_async_sessionmaker()() as db:
+        return await run_forecast(db, write=not args.dry_run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the flood forecast engine")
+    parser.add_argument("--dry-run", action="store_true", help="do not write forecasts")
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
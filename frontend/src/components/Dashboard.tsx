@@ -1,8 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import FloodMap from './FloodMap';
 import AlertPanel from './AlertPanel';
 import LayerControls from './LayerControls';
-import { apiClient } from '../utils/api';
+import { apiClient, openUpdateStream } from '../utils/api';
 import type { MonitoringStation, RainfallData, FloodForecast, Alert } from '../utils/api';
 
 const Dashboard: React.FC = () => {
@@ -24,25 +24,27 @@ const Dashboard: React.FC = () => {
   // Error state
   const [error, setError] = useState<string | null>(null);
 
+  // Version of the last snapshot, sent back so unchanged sections are skipped
+  const version = useRef<string | undefined>(undefined);
+
   // Fetch all data
   const fetchData = async () => {
     try {
       setIsLoading(true);
       setError(null);
 
-      const [stationsData, rainfallData, forecastsData, alertsData] = await Promise.all([
-        apiClient.getStations(),
-        apiClient.getRainfallData(24),
-        apiClient.getFloodForecasts(),
-        apiClient.getAlerts(),
-      ]);
+      const snapshot = await apiClient.getDashboard(
+        ['stations', 'rainfall', 'forecast', 'alerts'],
+        version.current,
+      );
 
-      console.log('API Data received:', { stationsData, rainfallData, forecastsData, alertsData });
+      console.log('API Data received:', snapshot);
 
-      setStations(stationsData.stations);
-      setRainfall(rainfallData.rainfall);
-      setForecasts(forecastsData.forecasts);
-      setAlerts(alertsData.alerts);
+      if (snapshot.stations) setStations(snapshot.stations);
+      if (snapshot.rainfall) setRainfall(snapshot.rainfall);
+      if (snapshot.forecasts) setForecasts(snapshot.forecasts);
+      if (snapshot.alerts) setAlerts(snapshot.alerts);
+      version.current = snapshot.version;
       setLastUpdated(new Date());
     } catch (err) {
       console.error('Error fetching data:', err);
@@ -57,9 +59,46 @@ const Dashboard: React.FC = () => {
     fetchData();
   }, []);
 
-  // Auto-refresh every 5 minutes
+  // Live updates pushed by the server; the stream resyncs by refetching
+  const streamOpen = useRef(false);
+  useEffect(() => {
+    const source = openUpdateStream({
+      onStations: (updated) => {
+        setStations((current) =>
+          current.map((station) => updated.find((u) => u.id === station.id) ?? station),
+        );
+        setLastUpdated(new Date());
+      },
+      onForecasts: (incoming) => {
+        const districts = new Set(incoming.map((f) => f.district));
+        setForecasts((current) => [
+          ...incoming,
+          ...current.filter((f) => !districts.has(f.district)),
+        ]);
+        setLastUpdated(new Date());
+      },
+      onAlerts: (updated) => {
+        setAlerts(updated);
+        setLastUpdated(new Date());
+      },
+      onResync: () => fetchData(),
+    });
+    source.onopen = () => {
+      streamOpen.current = true;
+    };
+    source.onerror = () => {
+      streamOpen.current = false;
+    };
+    return () => source.close();
+  }, []);
+
+  // Fall back to polling every 5 minutes while the stream is disconnected
   useEffect(() => {
-    const interval = setInterval(fetchData, 5 * 60 * 1000); // 5 minutes
+    const interval = setInterval(() => {
+      if (!streamOpen.current) {
+        fetchData();
+      }
+    }, 5 * 60 * 1000); // 5 minutes
     return () => clearInterval(interval);
   }, []);
 
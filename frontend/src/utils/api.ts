@@ -60,23 +60,82 @@ export interface District {
   area: number;
 }
 
+export interface StationHistory {
+  station: MonitoringStation;
+  from: string;
+  to: string;
+  totalReadings: number;
+  points: { timestamp: string; level: number; status: 'normal' | 'warning' | 'danger' }[];
+  crossings: { timestamp: string; level: number; from: string; to: string }[];
+}
+
+// Map viewport as [minLon, minLat, maxLon, maxLat]
+export type BBox = [number, number, number, number];
+
+export type DashboardSection = 'stations' | 'rainfall' | 'forecast' | 'alerts' | 'districts';
+
+// Combined snapshot; sections listed in `unchanged` are omitted from the payload
+export interface DashboardSnapshot {
+  generatedAt: string;
+  // Passed back as `since` to leave out the sections that have not changed
+  version: string;
+  unchanged: DashboardSection[];
+  stations?: MonitoringStation[];
+  rainfall?: RainfallData[];
+  forecasts?: FloodForecast[];
+  alerts?: Alert[];
+  districts?: District[];
+}
+
 // API functions
 export const apiClient = {
+  // Get several dashboard sections in one request, skipping unchanged ones
+  getDashboard: async (
+    include: DashboardSection[],
+    since?: string,
+  ): Promise<DashboardSnapshot> => {
+    const params = new URLSearchParams({ include: include.join(',') });
+    if (since) {
+      params.set('since', since);
+    }
+    const response = await api.get(`/dashboard?${params.toString()}`);
+    return response.data;
+  },
+
   // Get monitoring stations with current water levels
-  getStations: async (): Promise<{ stations: MonitoringStation[] }> => {
-    const response = await api.get('/stations');
+  getStations: async (bbox?: BBox): Promise<{ stations: MonitoringStation[] }> => {
+    const response = await api.get('/stations', { params: { bbox: bbox?.join(',') } });
+    return response.data;
+  },
+
+  // Get a station's downsampled water level history for hydrograph charts
+  getStationHistory: async (
+    stationId: number,
+    options: { from?: string; to?: string; points?: number } = {},
+  ): Promise<StationHistory> => {
+    const response = await api.get(`/stations/${stationId}/history`, { params: options });
     return response.data;
   },
 
   // Get rainfall data for the last N hours
-  getRainfallData: async (hours: number = 24): Promise<{ rainfall: RainfallData[] }> => {
-    const response = await api.get(`/rainfall?hours=${hours}`);
+  getRainfallData: async (
+    hours: number = 24,
+    bbox?: BBox,
+  ): Promise<{ rainfall: RainfallData[] }> => {
+    const response = await api.get('/rainfall', {
+      params: { hours, bbox: bbox?.join(',') },
+    });
     return response.data;
   },
 
-  // Get current flood forecasts
-  getFloodForecasts: async (): Promise<{ forecasts: FloodForecast[] }> => {
-    const response = await api.get('/forecast');
+  // Get current flood forecasts, simplified for the map zoom when given
+  getFloodForecasts: async (
+    bbox?: BBox,
+    zoom?: number,
+  ): Promise<{ forecasts: FloodForecast[] }> => {
+    const response = await api.get('/forecast', {
+      params: { bbox: bbox?.join(','), zoom },
+    });
     return response.data;
   },
 
@@ -86,13 +145,41 @@ export const apiClient = {
     return response.data;
   },
 
-  // Get district boundaries
-  getDistricts: async (): Promise<{ districts: District[] }> => {
-    const response = await api.get('/districts');
+  // Get district boundaries; lower detail levels are lighter for mobile
+  getDistricts: async (
+    zoom: 'low' | 'mid' | 'high' | number = 'high',
+    bbox?: BBox,
+  ): Promise<{ districts: District[] }> => {
+    const response = await api.get('/districts', {
+      params: { zoom, bbox: bbox?.join(',') },
+    });
     return response.data;
   },
 };
 
+export interface StreamHandlers {
+  onStations: (stations: MonitoringStation[]) => void;
+  onForecasts: (forecasts: FloodForecast[]) => void;
+  onAlerts: (alerts: Alert[]) => void;
+  onResync: () => void;
+}
+
+// Subscribe to live updates pushed by the backend; returns the EventSource
+export const openUpdateStream = (handlers: StreamHandlers): EventSource => {
+  const source = new EventSource(`${API_BASE_URL}/stream`);
+  source.addEventListener('stations', (event) => {
+    handlers.onStations(JSON.parse((event as MessageEvent).data).stations);
+  });
+  source.addEventListener('forecasts', (event) => {
+    handlers.onForecasts(JSON.parse((event as MessageEvent).data).forecasts);
+  });
+  source.addEventListener('alerts', (event) => {
+    handlers.onAlerts(JSON.parse((event as MessageEvent).data).alerts);
+  });
+  source.addEventListener('resync', handlers.onResync);
+  return source;
+};
+
 // Helper function to get station marker color based on status
 export const getStationColor = (status: string): string => {
   switch (status) {
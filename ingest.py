@@ -0,0 +1,248 @@
+"""
+Bulk telemetry ingestion for water level and rainfall readings.
+
+Batches arrive as a JSON array or as NDJSON (one JSON object per line). Every
+record is validated on its own so a single bad reading does not reject the
+whole batch; the valid rows are then written with one multi-row INSERT inside
+a single transaction.
+"""
+
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from alert_engine import alert_engine
+from rainfall_store import store as rainfall_store
+from repository import Repository
+from result_cache import result_cache
+from station_store import store as station_store
+from stream import live_updates
+from trends import epoch_seconds, trend_tracker
+
+# Largest batch accepted by a single ingestion request
+MAX_BATCH_SIZE = int(os.environ.get("INGEST_MAX_BATCH_SIZE", "50000"))
+
+# Readings stamped further in the future than this are treated as clock errors
+MAX_CLOCK_SKEW = timedelta(minutes=15)
+
+# Only the first few rejections are echoed back to the client
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+VALID_STATUSES = ("normal", "warning", "danger")
+
+
+class WaterLevelReading(BaseModel):
+    """A single gauge reading"""
+
+    station_id: int
+    level: float
+    timestamp: datetime | None = None
+    status: str | None = None
+
+    @field_validator("level")
+    @classmethod
+    def level_must_be_finite(cls, value):
+        if not math.isfinite(value):
+            raise ValueError("level must be a finite number")
+        return value
+
+    @field_validator("status")
+    @classmethod
+    def status_must_be_known(cls, value):
+        if value is not None and value not in VALID_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(VALID_STATUSES)}")
+        return value
+
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_to_naive_utc(cls, value):
+        return to_naive_utc(value)
+
+
+class RainfallReading(BaseModel):
+    """A single rain gauge reading"""
+
+    district: str = Field(min_length=1, max_length=50)
+    coordinates: tuple[float, float]  # [longitude, latitude]
+    rainfall_mm: float = Field(ge=0)
+    duration_hours: int = Field(default=1, ge=1)
+    timestamp: datetime | None = None
+
+    @field_validator("coordinates")
+    @classmethod
+    def coordinates_must_be_valid(cls, value):
+        longitude, latitude = value
+        if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+            raise ValueError("coordinates must be [longitude, latitude] in degrees")
+        return value
+
+    @field_validator("rainfall_mm")
+    @classmethod
+    def rainfall_must_be_finite(cls, value):
+        if not math.isfinite(value):
+            raise ValueError("rainfall_mm must be a finite number")
+        return value
+
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_to_naive_utc(cls, value):
+        return to_naive_utc(value)
+
+
+def to_naive_utc(value):
+    """Normalise an aware datetime to the naive UTC used by the tables"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def classify_level(level, warning_level, danger_level):
+    """Map a water level onto the station status used by the API"""
+    if level >= danger_level:
+        return "danger"
+    if level >= warning_level:
+        return "warning"
+    return "normal"
+
+
+def parse_batch(body: bytes, content_type: str = "") -> list:
+    """Decode a request body holding a JSON array or NDJSON lines"""
+    is_ndjson = content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES
+    try:
+        if is_ndjson:
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            records = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Malformed batch: {e}")
+
+    if not isinstance(records, list):
+        raise ValueError("Batch must be a JSON array or NDJSON")
+    if len(records) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch exceeds {MAX_BATCH_SIZE} records")
+    return records
+
+
+def _validate(records, model):
+    """Validate each record on its own, collecting per-index errors"""
+    valid = []
+    errors = []
+    for index, record in enumerate(records):
+        try:
+            valid.append((index, model.model_validate(record)))
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"]) or "record"
+            errors.append({"index": index, "error": f"{field}: {first['msg']}"})
+    return valid, errors
+
+
+def _summary(accepted, errors):
+    return {
+        "accepted": accepted,
+        "rejected": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+
+
+def _check_timestamp(reading, now):
+    if reading.timestamp is None:
+        reading.timestamp = now
+    elif reading.timestamp > now + MAX_CLOCK_SKEW:
+        return "timestamp: reading is in the future"
+    return None
+
+
+async def ingest_water_levels(repo: Repository, records: list) -> dict:
+    """Validate and bulk insert a batch of water level readings"""
+    valid, errors = _validate(records, WaterLevelReading)
+
+    station_ids = {reading.station_id for _, reading in valid}
+    thresholds = {}
+    if station_store.warmed:
+        for station_id in station_ids:
+            station = station_store.get(station_id)
+            if station is not None:
+                thresholds[station_id] = (station.warning_level, station.danger_level)
+    # Stations added since the store last reloaded are looked up
+    missing = station_ids - thresholds.keys()
+    if missing:
+        thresholds.update(await repo.station_thresholds(missing))
+
+    now = datetime.utcnow()
+    rows = []
+    for index, reading in valid:
+        station = thresholds.get(reading.station_id)
+        if station is None:
+            errors.append(
+                {"index": index, "error": "station_id: unknown or inactive station"}
+            )
+            continue
+        problem = _check_timestamp(reading, now)
+        if problem:
+            errors.append({"index": index, "error": problem})
+            continue
+        rows.append(
+            {
+                "station_id": reading.station_id,
+                "level": reading.level,
+                "timestamp": reading.timestamp,
+                "status": reading.status or classify_level(reading.level, *station),
+            }
+        )
+
+    if rows:
+        await repo.insert_water_levels(rows)
+        # Trends first: a request between the store's version bump and the
+        # end of this batch must not cache new levels with old trends
+        trend_tracker.update(
+            [row["station_id"] for row in rows],
+            epoch_seconds([row["timestamp"] for row in rows]),
+            [row["level"] for row in rows],
+        )
+        changed = station_store.apply_readings(rows)
+        await result_cache.invalidate("water_levels")
+        live_updates.publish_station_changes(changed)
+        touched = {row["station_id"] for row in rows}
+        if alert_engine.observe(station_store.get(i) for i in touched):
+            await live_updates.publish_alerts_if_changed(repo)
+
+    errors.sort(key=lambda error: error["index"])
+    return _summary(len(rows), errors)
+
+
+async def ingest_rainfall(repo: Repository, records: list) -> dict:
+    """Validate and bulk insert a batch of rainfall readings"""
+    valid, errors = _validate(records, RainfallReading)
+
+    now = datetime.utcnow()
+    rows = []
+    for index, reading in valid:
+        problem = _check_timestamp(reading, now)
+        if problem:
+            errors.append({"index": index, "error": problem})
+            continue
+        longitude, latitude = reading.coordinates
+        rows.append(
+            {
+                "district": reading.district,
+                "longitude": longitude,
+                "latitude": latitude,
+                "rainfall_mm": reading.rainfall_mm,
+                "duration_hours": reading.duration_hours,
+                "timestamp": reading.timestamp,
+            }
+        )
+
+    if rows:
+        ids = await repo.insert_rainfall(rows)
+        rainfall_store.add(rows, ids=ids)
+        await result_cache.invalidate("rainfall_data")
+
+    errors.sort(key=lambda error: error["index"])
+    return _summary(len(rows), errors)
@@ -0,0 +1,219 @@
+"""
+Raster inundation mapping from forecast stages at stations.
+
+Each grid cell takes the forecast water surface of its nearest station within
+reach, computed in row chunks so a memory-mapped DEM is streamed instead of
+loaded whole. A cell is a flood candidate when the ground is below that
+surface. With a flat surface per station, the priority-flood fill from a
+station reduces to the 4-connected region of candidate cells around it.
+GDAL's polygonizer (rasterio.features.shapes) traces those regions in C, and
+only the regions holding a station are kept. Small isolated pockets are sieved
+out first so the polygonizer does not trace thousands of puddles.
+
+    python inundation.py dem.tif --stations stages.json --out floods.geojson
+"""
+
+import argparse
+import json
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import rasterio
+from rasterio.features import shapes, sieve
+from rasterio.transform import Affine
+from shapely import contains_xy
+from shapely.geometry import mapping, shape
+
+# Optional DEM used by the forecast engine to map forecast areas
+INUNDATION_DEM = os.environ.get("INUNDATION_DEM")
+
+# Farthest a station's water surface spreads from it
+MAX_REACH_M = float(os.environ.get("INUNDATION_MAX_REACH_M", "25000"))
+
+# Candidate regions smaller than this many cells are dropped as puddles
+MIN_REGION_CELLS = 16
+
+# Cells x stations compared per chunk when assigning nearest stations
+CHUNK_BUDGET = 8_000_000
+
+METRES_PER_DEGREE = 111_320.0
+
+
+@dataclass
+class FloodExtent:
+    """One connected flooded region and the stations whose water reaches it"""
+
+    polygon: object  # shapely Polygon in the DEM's coordinates
+    stations: list
+    cells: int
+
+
+def load_dem(path: str):
+    """DEM array and transform; .npy files are memory-mapped, rasters read"""
+    if path.endswith(".npy"):
+        meta_path = path[: -len(".npy")] + ".json"
+        with open(meta_path) as f:
+            transform = Affine(*json.load(f)["transform"][:6])
+        return np.load(path, mmap_mode="r"), transform
+
+    with rasterio.open(path) as dataset:
+        dem = dataset.read(1, masked=True).astype(np.float32).filled(np.inf)
+        return dem, dataset.transform
+
+
+def to_pixel(transform: Affine, xs: np.ndarray, ys: np.ndarray):
+    """Integer (row, col) of map coordinates under an affine transform"""
+    a, b, c = transform.a, transform.b, transform.c
+    d, e, f = transform.d, transform.e, transform.f
+    determinant = a * e - b * d
+    dx, dy = xs - c, ys - f
+    cols = (e * dx - b * dy) / determinant
+    rows = (a * dy - d * dx) / determinant
+    return np.floor(rows).astype(np.intp), np.floor(cols).astype(np.intp)
+
+
+def pixel_size_m(transform: Affine, latitude: float, geographic=True) -> float:
+    """Ground size of one cell, in metres"""
+    if not geographic:
+        return abs(transform.a)
+    return abs(transform.a) * METRES_PER_DEGREE * math.cos(math.radians(latitude))
+
+
+def candidate_mask(
+    dem: np.ndarray,
+    seed_rows: np.ndarray,
+    seed_cols: np.ndarray,
+    stages: np.ndarray,
+    reach_cells: float,
+) -> np.ndarray:
+    """Cells lower than the water surface of their nearest station in reach"""
+    height, width = dem.shape
+    mask = np.zeros((height, width), dtype=np.uint8)
+    if len(stages) == 0:
+        return mask
+
+    seed_rows = seed_rows.astype(np.float32)
+    seed_cols = seed_cols.astype(np.float32)
+    stages = stages.astype(np.float32)
+    cols = np.arange(width, dtype=np.float32)
+    chunk = max(1, CHUNK_BUDGET // (width * len(stages)))
+    reach = np.float32(reach_cells**2)
+
+    for start in range(0, height, chunk):
+        stop = min(start + chunk, height)
+        # Skip bands no station can reach
+        near = np.abs(seed_rows[:, None] - [start, stop - 1]).min(axis=1)
+        inside = (seed_rows >= start) & (seed_rows < stop)
+        active = np.flatnonzero(inside | (near <= reach_cells))
+        if len(active) == 0:
+            continue
+
+        rows = np.arange(start, stop, dtype=np.float32)
+        distance = (rows[:, None, None] - seed_rows[active]) ** 2 + (
+            cols[None, :, None] - seed_cols[active]
+        ) ** 2
+        nearest = distance.argmin(axis=2)
+        in_reach = np.take_along_axis(distance, nearest[..., None], 2)[..., 0] <= reach
+        surface = stages[active][nearest]
+        mask[start:stop] = (np.asarray(dem[start:stop]) < surface) & in_reach
+    return mask
+
+
+def flood_extents(
+    dem: np.ndarray,
+    transform: Affine,
+    longitudes,
+    latitudes,
+    stages,
+    max_reach_m: float = MAX_REACH_M,
+    geographic: bool = True,
+) -> list:
+    """Connected flooded regions reached by the given station stages"""
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    stages = np.asarray(stages, dtype=np.float64)
+    if len(stages) == 0:
+        return []
+
+    rows, cols = to_pixel(transform, longitudes, latitudes)
+    height, width = dem.shape
+    on_grid = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    if not on_grid.any():
+        return []
+
+    cell_m = pixel_size_m(transform, float(latitudes[on_grid].mean()), geographic)
+    mask = candidate_mask(
+        dem,
+        rows[on_grid],
+        cols[on_grid],
+        stages[on_grid],
+        max_reach_m / cell_m,
+    )
+    if MIN_REGION_CELLS > 1:
+        mask = sieve(mask, size=MIN_REGION_CELLS, connectivity=4)
+
+    seeds = np.flatnonzero(on_grid)
+    flooded_seeds = seeds[mask[rows[seeds], cols[seeds]] == 1]
+    if len(flooded_seeds) == 0:
+        return []
+
+    extents = []
+    for geometry, _ in shapes(
+        mask, mask=mask.astype(bool), connectivity=4, transform=transform
+    ):
+        polygon = shape(geometry)
+        inside = contains_xy(
+            polygon, longitudes[flooded_seeds], latitudes[flooded_seeds]
+        )
+        if inside.any():
+            cells = int(round(polygon.area / abs(transform.a * transform.e)))
+            extents.append(FloodExtent(polygon, flooded_seeds[inside].tolist(), cells))
+    return extents
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="Map flood extents from station stages"
+    )
+    parser.add_argument("dem", help="GeoTIFF, or .npy with a sidecar .json transform")
+    parser.add_argument(
+        "--stations",
+        required=True,
+        help="JSON list of {longitude, latitude, stage}",
+    )
+    parser.add_argument("--out", help="write a GeoJSON FeatureCollection here")
+    parser.add_argument("--reach-m", type=float, default=MAX_REACH_M)
+    args = parser.parse_args()
+
+    with open(args.stations) as f:
+        stations = json.load(f)
+    dem, transform = load_dem(args.dem)
+    extents = flood_extents(
+        dem,
+        transform,
+        [s["longitude"] for s in stations],
+        [s["latitude"] for s in stations],
+        [s["stage"] for s in stations],
+        args.reach_m,
+    )
+    collection = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": mapping(extent.polygon),
+                "properties": {"stations": extent.stations, "cells": extent.cells},
+            }
+            for extent in extents
+        ],
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(collection, f)
+    print(json.dumps({"extents": len(extents), "cells": sum(e.cells for e in extents)}))
+
+
+if __name__ == "__main__":
+    _main()
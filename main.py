@@ -1,4 +1,7 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 
 import uvicorn
 from dotenv import load_dotenv
@@ -7,54 +10,153 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 # Import models and API routes
+from alert_engine import alert_engine
 from api_routes import router
-from database import engine
-from models import Base
+from district_cache import district_cache
+from metrics import MetricsMiddleware
+from profiling import ProfilingMiddleware
+from rainfall_store import store as rainfall_store
+from repository import DATA_BACKEND, open_repository, refresh_replica
+from station_store import store as station_store
+from stream import live_updates
+from trends import trend_tracker
 
 # Load environment variables from .env file
 load_dotenv()
 
-# FastAPI app
-app = FastAPI(
-    title="Punjab Flood Monitoring System",
-    description="A flood monitoring and simulation system for the Punjab region",
-    version="1.0.0",
-)
+logger = logging.getLogger(__name__)
 
-# CORS middleware for frontend connectivity
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify actual frontend domains
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# How often in-memory state picks up writes made by other workers and
+# scripts, and the stream publishes the resulting changes
+STATION_STORE_REFRESH_SECONDS = float(
+    os.environ.get("STATION_STORE_REFRESH_SECONDS", "30")
 )
 
+# Whether this process schedules forecast runs and storage maintenance.
+# serve.py turns it off in its workers and runs the jobs once beside them.
+BACKGROUND_JOBS = os.environ.get("BACKGROUND_JOBS", "true").lower() == "true"
+
+
+def background_jobs() -> list:
+    """Coroutines of the periodic database jobs that are switched on"""
+    # Imported here so workers that do not run them skip rasterio and friends
+    from forecast_engine import FORECAST_INTERVAL_MINUTES, run_periodically
+    from partitions import STORAGE_MAINTENANCE_HOURS
+    from partitions import run_periodically as run_storage_maintenance
+
+    jobs = []
+    if FORECAST_INTERVAL_MINUTES > 0:
+        jobs.append(run_periodically())
+    if STORAGE_MAINTENANCE_HOURS > 0:
+        jobs.append(run_storage_maintenance())
+    return jobs
+
+
+async def _refresh_in_memory_state():
+    while True:
+        await asyncio.sleep(STATION_STORE_REFRESH_SECONDS)
+        try:
+            # A replica catches up first so the stores read what it now holds
+            await refresh_replica()
+            async with open_repository() as repo:
+                changed = await station_store.refresh(repo)
+                live_updates.publish_station_changes(changed)
+                # Stations without a new reading since last time are skipped
+                trend_tracker.observe(station_store.all())
+                if alert_engine.warmed:
+                    alert_engine.observe(station_store.all())
+                    await alert_engine.refresh_forecasts(repo)
+                else:
+                    await alert_engine.load(repo)
+                if rainfall_store.warmed:
+                    await rainfall_store.catch_up(repo)
+                else:
+                    await rainfall_store.load(repo)
+                await district_cache.refresh_if_changed(repo)
+                await live_updates.publish_new_forecasts(repo)
+                await live_updates.publish_alerts_if_changed(repo)
+        except Exception as e:
+            logger.warning("In-memory state refresh failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm in-memory state before serving; routes fall back to the repository
+    # on first use if this fails
+    try:
+        await refresh_replica()
+        async with open_repository() as repo:
+            await station_store.load(repo)
+            await district_cache.build(repo)
+            await rainfall_store.load(repo)
+            await trend_tracker.load(repo)
+            await alert_engine.load(repo)
+            await live_updates.prime(repo)
+    except Exception as e:
+        logger.warning("In-memory state not warmed at startup: %s", e)
+
+    tasks = [asyncio.create_task(_refresh_in_memory_state())]
+    if BACKGROUND_JOBS and DATA_BACKEND != "memory":
+        tasks.extend(asyncio.create_task(job) for job in background_jobs())
+    yield
+    for task in tasks:
+        task.cancel()
+
 
 # Health check endpoint
-@app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
 
-@app.get("/api/info")
 async def api_info():
     return {"message": "Punjab Flood Monitoring System API", "version": "1.0.0"}
 
 
-app.include_router(router, prefix="/api")
+def create_app() -> FastAPI:
+    """Build the API app; nothing touches the database until startup"""
+    app = FastAPI(
+        title="Punjab Flood Monitoring System",
+        description="A flood monitoring and simulation system for the Punjab region",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    # CORS middleware for frontend connectivity
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify actual frontend domains
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(ProfilingMiddleware)
+    # Outermost, so request latency includes the other middleware
+    app.add_middleware(MetricsMiddleware)
 
-# Mount static files for frontend
-frontend_dist_path = "./frontend/dist"
-if os.path.exists(frontend_dist_path):
-    app.mount("/", StaticFiles(directory=frontend_dist_path, html=True), name="static")
-else:
-    # Fallback: serve from static directory (Docker production)
-    if os.path.exists("./static"):
-        app.mount("/", StaticFiles(directory="static", html=True), name="static")
+    app.add_api_route("/api/health", health_check, methods=["GET"])
+    app.add_api_route("/api/info", api_info, methods=["GET"])
+    app.include_router(router, prefix="/api")
 
-# Create tables using the models' Base
-Base.metadata.create_all(bind=engine)
+    # Mount static files for frontend
+    frontend_dist_path = "./frontend/dist"
+    if os.path.exists(frontend_dist_path):
+        app.mount(
+            "/", StaticFiles(directory=frontend_dist_path, html=True), name="static"
+        )
+    else:
+        # Fallback: serve from static directory (Docker production)
+        if os.path.exists("./static"):
+            app.mount("/", StaticFiles(directory="static", html=True), name="static")
+    return app
+
+
+# Module-level app for `uvicorn main:app`; create the schema first with
+# `python schema.py`, or serve with `python serve.py`, which does both
+app = create_app()
 
 if __name__ == "__main__":
+    from database import get_engine
+    from schema import init_schema
+
+    init_schema(get_engine())
     uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=True)
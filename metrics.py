@@ -0,0 +1,338 @@
+"""
+Request, repository and SQL metrics in Prometheus text format.
+
+Everything is recorded in process with plain dicts and lists, so an
+observation costs a dict lookup and a bisect (about a microsecond) and the
+metrics can stay on in production:
+
+- an ASGI middleware times every request by route template, method and status,
+  and keeps Server-Sent Events connections, which stay open for as long as a
+  client watches, in a histogram of their own;
+- repositories time each call, and SQL statements are attributed to the
+  repository call that ran them through a context variable;
+- SQLAlchemy cursor events time each statement and count its rows;
+- statements of a request being profiled are also added to its profile
+  (profiling.py);
+- connection pool gauges are read from the engines when /api/metrics is
+  scraped.
+
+Each process keeps its own numbers: with serve.py workers, a scrape reports
+the worker that answered it.
+"""
+
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from profiling import current_profile
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Upper bounds of the event stream connection buckets, in seconds
+STREAM_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+
+# Repository call whose SQL is running, for the statement metrics
+current_query: ContextVar[str] = ContextVar("current_query", default="other")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Latency histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Label values -> [per-bucket counts (last one is +Inf), sum]
+        self.series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        for values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _labels(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, labels: tuple, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {_number(total)}")
+        return lines
+
+
+class Metrics:
+    """The metrics of this process and the engines they watch"""
+
+    def __init__(self):
+        self.requests = Histogram(
+            "floodguard_http_request_duration_seconds",
+            "Time to serve an HTTP request, by route template",
+            ("method", "route", "status"),
+        )
+        self.streams = Histogram(
+            "floodguard_http_stream_duration_seconds",
+            "How long Server-Sent Events connections stayed open, by route template",
+            ("route",),
+            STREAM_BUCKETS,
+        )
+        self.repository_calls = Histogram(
+            "floodguard_repository_call_duration_seconds",
+            "Time spent in one repository call, by backend and call",
+            ("backend", "call"),
+        )
+        self.statements = Histogram(
+            "floodguard_db_statement_duration_seconds",
+            "Time to execute one SQL statement, by the repository call that ran it",
+            ("engine", "query"),
+        )
+        self.rows = Counter(
+            "floodguard_db_statement_rows_total",
+            "Rows returned or affected by SQL statements",
+            ("engine", "query"),
+        )
+        self.errors = Counter(
+            "floodguard_db_statement_errors_total",
+            "SQL statements that raised",
+            ("engine", "query"),
+        )
+        self.result_cache = Counter(
+            "floodguard_result_cache_lookups_total",
+            "Result cache lookups, by endpoint and whether they ran the query",
+            ("endpoint", "outcome"),
+        )
+        self.engines = {}
+        self.started = time.time()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        self.requests.observe((method, route, status), seconds)
+
+    def observe_stream(self, route: str, seconds: float):
+        self.streams.observe((route,), seconds)
+
+    def instrument_engine(self, engine, name: str, capacity: int | None = None):
+        """Time the statements of an engine and watch its pool"""
+        # Async engines are instrumented through the sync engine they wrap
+        engine = getattr(engine, "sync_engine", engine)
+        if name in self.engines:
+            return
+        self.engines[name] = (engine, capacity)
+        statements, rows = self.statements, self.rows
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            labels = (name, current_query.get())
+            seconds = time.perf_counter() - context._metrics_started
+            statements.observe(labels, seconds)
+            profile = current_profile.get()
+            if profile is not None:
+                profile.add_statement(labels[1], statement, seconds)
+            count = cursor.rowcount
+            if count < 0:
+                # asyncpg reports no rowcount for SELECT but has buffered the rows
+                count = len(getattr(cursor, "_rows", ()))
+            if count:
+                rows.inc(labels, count)
+
+        @event.listens_for(engine, "handle_error")
+        def error(context):
+            self.errors.inc((name, current_query.get()))
+
+    def pool_lines(self) -> list[str]:
+        gauges = (
+            ("floodguard_db_pool_size", "Connections the pool keeps open", "size"),
+            ("floodguard_db_pool_checked_out", "Connections in use", "checkedout"),
+            (
+                "floodguard_db_pool_overflow",
+                "Connections open beyond the pool size (negative while filling)",
+                "overflow",
+            ),
+        )
+        lines = []
+        for metric, help, method in gauges:
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+            for name, (engine, _) in sorted(self.engines.items()):
+                # Only queue pools have a size and an overflow to report
+                reading = getattr(engine.pool, method, None)
+                if callable(reading):
+                    lines.append(f'{metric}{{engine="{name}"}} {reading()}')
+        metric = "floodguard_db_pool_max_connections"
+        lines += [
+            f"# HELP {metric} Pool size plus allowed overflow",
+            f"# TYPE {metric} gauge",
+        ]
+        for name, (_, capacity) in sorted(self.engines.items()):
+            if capacity is not None:
+                lines.append(f'{metric}{{engine="{name}"}} {capacity}')
+        return lines
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP floodguard_process_start_time_seconds Start time of the process",
+            "# TYPE floodguard_process_start_time_seconds gauge",
+            f"floodguard_process_start_time_seconds {self.started!r}",
+        ]
+        for metric in (
+            self.requests,
+            self.streams,
+            self.repository_calls,
+            self.statements,
+            self.rows,
+            self.errors,
+            self.result_cache,
+        ):
+            lines += metric.expose()
+        lines += self.pool_lines()
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def timed_calls(backend: str):
+    """Class decorator timing the public async methods of a repository"""
+
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, _timed(method, backend, name))
+        return cls
+
+    return decorate
+
+
+def _timed(method, backend: str, call: str):
+    observe = metrics.repository_calls.observe
+    labels = (backend, call)
+
+    @functools.wraps(method)
+    async def timed(*args, **kwargs):
+        token = current_query.set(call)
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            observe(labels, time.perf_counter() - started)
+            current_query.reset(token)
+
+    return timed
+
+
+def route_template(scope) -> str:
+    """Path template of the route that served a request, e.g. /api/stations/{id}"""
+    # The router stores the matched route in the scope; templates, unlike
+    # paths, keep the label set small
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI matches routes of an included router without copying
+    # them, so the router's prefix is not part of the route's own path
+    included = scope.get("fastapi", {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "")
+    return prefix + getattr(route, "path", "") or "/"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request
+
+    Event streams are timed separately: their lifetime is not a latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        streaming = False
+
+        async def send_status(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", ())).get(
+                    b"content-type", b""
+                )
+                streaming = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            seconds = time.perf_counter() - started
+            if streaming:
+                metrics.observe_stream(route_template(scope), seconds)
+            else:
+                metrics.observe_request(
+                    scope["method"], route_template(scope), status, seconds
+                )
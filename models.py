@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from geoalchemy2 import Geometry
-from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, Integer, String
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -25,23 +25,52 @@ class MonitoringStation(Base):
 
 
 class WaterLevel(Base):
-    """Current and historical water level readings"""
+    """Current and historical water level readings, partitioned by month"""
 
     __tablename__ = "water_levels"
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     station_id = Column(Integer, nullable=False)  # Reference to MonitoringStation
     level = Column(Float, nullable=False)  # Water level in meters
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     status = Column(String(20), nullable=False)  # "normal", "warning", "danger"
 
 
+class WaterLevelHourly(Base):
+    """Hourly water level aggregates, maintained by a trigger on water_levels"""
+
+    __tablename__ = "water_levels_hourly"
+
+    station_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour (UTC)
+    readings = Column(Integer, nullable=False)
+    level_sum = Column(Float, nullable=False)
+    level_min = Column(Float, nullable=False)
+    level_max = Column(Float, nullable=False)
+
+
+class WaterLevelDaily(Base):
+    """Daily water level aggregates, maintained by a trigger on water_levels"""
+
+    __tablename__ = "water_levels_daily"
+
+    station_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # Start of the day (UTC)
+    readings = Column(Integer, nullable=False)
+    level_sum = Column(Float, nullable=False)
+    level_min = Column(Float, nullable=False)
+    level_max = Column(Float, nullable=False)
+
+
 class RainfallData(Base):
-    """Rainfall data by district"""
+    """Rainfall data by district, partitioned by month"""
 
     __tablename__ = "rainfall_data"
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     district = Column(String(50), nullable=False)
     location = Column(
         Geometry("POINT", srid=4326), nullable=False
@@ -50,7 +79,7 @@ class RainfallData(Base):
     duration_hours = Column(
         Integer, nullable=False
     )  # Duration over which rainfall was measured
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
 
 
 class FloodForecast(Base):
@@ -81,3 +110,13 @@ class District(Base):
     population = Column(Integer, default=0)
     area_sq_km = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped by statement-level triggers"""
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(63), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)  # Writes seen so far
+    changed_at = Column(DateTime, default=datetime.utcnow)  # Last write (UTC)
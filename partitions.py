@@ -0,0 +1,334 @@
+"""
+Monthly partitioning, rollups and retention for the reading tables.
+
+water_levels and rainfall_data are range-partitioned by month on `timestamp`.
+Time-window queries only touch the partitions they need, and retention drops
+whole partitions instead of deleting rows. Partitions are created a few months
+ahead, and a DEFAULT partition catches anything outside them so inserts never
+fail. Tables created before partitioning are migrated in place on startup.
+
+Hourly and daily water level rollups are maintained by a statement trigger
+from each insert's transition table, so every writer (API, seed script, COPY)
+keeps them current. Long history ranges are served from them, and they outlive
+the raw readings.
+
+    python partitions.py            # create upcoming partitions, apply retention
+    python partitions.py --dry-run  # only report what retention would drop
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("water_levels", "rainfall_data")
+
+# Monthly partitions kept ready beyond the current month
+PARTITION_MONTHS_AHEAD = 3
+
+# Raw readings older than this many days are dropped (0 keeps everything)
+READING_RETENTION_DAYS = int(os.environ.get("READING_RETENTION_DAYS", "730"))
+
+# Hourly rollups are kept longer than raw readings; daily rollups are kept
+HOURLY_ROLLUP_RETENTION_DAYS = int(
+    os.environ.get("HOURLY_ROLLUP_RETENTION_DAYS", "1825")
+)
+
+# Hours between storage maintenance runs in the server (0 disables)
+STORAGE_MAINTENANCE_HOURS = float(os.environ.get("STORAGE_MAINTENANCE_HOURS", "24"))
+
+ROLLUP_TABLES = {"water_levels_hourly": "hour", "water_levels_daily": "day"}
+
+# Rows are upserted in key order, so concurrent batches touching the same
+# buckets lock them in the same order instead of deadlocking
+ROLLUP_UPSERT = """
+    INSERT INTO {table} AS r (
+        station_id, bucket, readings, level_sum, level_min, level_max
+    )
+    SELECT
+        station_id, date_trunc('{unit}', timestamp),
+        COUNT(*), SUM(level), MIN(level), MAX(level)
+    FROM new_rows
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (station_id, bucket) DO UPDATE
+    SET readings = r.readings + EXCLUDED.readings,
+        level_sum = r.level_sum + EXCLUDED.level_sum,
+        level_min = LEAST(r.level_min, EXCLUDED.level_min),
+        level_max = GREATEST(r.level_max, EXCLUDED.level_max);
+"""
+
+ROLLUP_FUNCTION = """
+CREATE OR REPLACE FUNCTION rollup_water_levels() RETURNS trigger AS $$
+BEGIN
+%s
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""" % "".join(
+    ROLLUP_UPSERT.format(table=table, unit=unit)
+    for table, unit in ROLLUP_TABLES.items()
+)
+
+PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    query = text("SELECT relkind FROM pg_class WHERE relname = :table")
+    return connection.execute(query, {"table": table}).scalar() == "p"
+
+
+def partitions(connection, table: str) -> dict:
+    """Monthly partitions of a table, keyed by the month they start"""
+    query = text(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE parent.relname = :table
+    """
+    )
+    months = {}
+    for name in connection.execute(query, {"table": table}).scalars():
+        match = PARTITION_NAME.search(name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partition(connection, table: str, month: datetime):
+    """Add the partition of one month, moving its rows out of DEFAULT if needed"""
+    name = partition_name(table, month)
+    bounds = {"lo": month, "hi": add_months(month, 1)}
+    values = f"FROM ('{month:%Y-%m-%d}') TO ('{bounds['hi']:%Y-%m-%d}')"
+    stranded = connection.execute(
+        text(
+            f"SELECT EXISTS (SELECT 1 FROM {table}_default "
+            "WHERE timestamp >= :lo AND timestamp < :hi)"
+        ),
+        bounds,
+    ).scalar()
+    if not stranded:
+        connection.execute(
+            text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {values}")
+        )
+        return
+
+    # Rows that landed in DEFAULT would make a plain CREATE fail: build the
+    # partition on its own, move them over and attach it
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    connection.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE timestamp >= :lo AND timestamp < :hi
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """
+        ),
+        bounds,
+    )
+    connection.execute(
+        text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {values}")
+    )
+
+
+def ensure_partitions(connection, table: str, first: datetime, last: datetime):
+    """Create the DEFAULT partition and monthly ones from first to last month"""
+    connection.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    )
+    existing = partitions(connection, table)
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            create_partition(connection, table, month)
+        month = add_months(month, 1)
+
+
+def migrate_to_partitioned(connection, table: str):
+    """Rebuild a plain table created before partitioning as a partitioned one"""
+    legacy = f"{table}_unpartitioned"
+    columns = ", ".join(column.name for column in Base.metadata.tables[table].columns)
+    logger.warning("Migrating %s to a partitioned table", table)
+
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Free the index, constraint and sequence names for the new table
+    indexes = connection.execute(
+        text(
+            """
+            SELECT i.relname
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            WHERE t.relname = :table AND NOT x.indisprimary
+        """
+        ),
+        {"table": legacy},
+    ).scalars()
+    for index in list(indexes):
+        connection.execute(text(f"DROP INDEX {index}"))
+    connection.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey"))
+    connection.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT"))
+    connection.execute(text(f"DROP SEQUENCE IF EXISTS {table}_id_seq"))
+
+    Base.metadata.tables[table].create(connection)
+    oldest = connection.execute(text(f"SELECT MIN(timestamp) FROM {legacy}")).scalar()
+    now = datetime.utcnow()
+    ensure_partitions(
+        connection, table, oldest or now, add_months(now, PARTITION_MONTHS_AHEAD)
+    )
+    if table == "water_levels":
+        install_rollup_trigger(connection)
+
+    connection.execute(
+        text(
+            f"INSERT INTO {table} ({columns}) "
+            f"SELECT {columns} FROM {legacy} WHERE timestamp IS NOT NULL"
+        )
+    )
+    connection.execute(
+        text(
+            f"SELECT setval('{table}_id_seq', "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {legacy}"))
+
+
+def install_rollup_trigger(connection):
+    """(Re)create the trigger feeding water_levels inserts into the rollups"""
+    connection.execute(text(ROLLUP_FUNCTION))
+    connection.execute(
+        text("DROP TRIGGER IF EXISTS water_levels_rollup_trigger ON water_levels")
+    )
+    connection.execute(
+        text(
+            """
+            CREATE TRIGGER water_levels_rollup_trigger
+            AFTER INSERT ON water_levels
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION rollup_water_levels()
+        """
+        )
+    )
+
+
+def init_partitions(connection):
+    """Partition the reading tables and keep the coming months ready"""
+    now = datetime.utcnow()
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            migrate_to_partitioned(connection, table)
+        ensure_partitions(
+            connection,
+            table,
+            add_months(month_start(now), -1),
+            add_months(now, PARTITION_MONTHS_AHEAD),
+        )
+    install_rollup_trigger(connection)
+
+
+def apply_retention(connection, now: datetime, dry_run: bool = False) -> dict:
+    """Drop partitions and rollup rows past their retention period"""
+    report = {}
+    if READING_RETENTION_DAYS > 0:
+        cutoff = now - timedelta(days=READING_RETENTION_DAYS)
+        for table in PARTITIONED_TABLES:
+            expired = [
+                name
+                for month, name in sorted(partitions(connection, table).items())
+                if add_months(month, 1) <= cutoff
+            ]
+            report[table] = expired
+            if dry_run:
+                continue
+            for name in expired:
+                connection.execute(text(f"DROP TABLE {name}"))
+            connection.execute(
+                text(f"DELETE FROM {table}_default WHERE timestamp < :cutoff"),
+                {"cutoff": cutoff},
+            )
+            # Dropping partitions fires no trigger: bump the version directly
+            connection.execute(
+                text(
+                    """
+                    UPDATE table_versions
+                    SET version = version + 1,
+                        changed_at = clock_timestamp() AT TIME ZONE 'UTC'
+                    WHERE table_name = :table
+                """
+                ),
+                {"table": table},
+            )
+
+    if HOURLY_ROLLUP_RETENTION_DAYS > 0 and not dry_run:
+        cutoff = now - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS)
+        deleted = connection.execute(
+            text("DELETE FROM water_levels_hourly WHERE bucket < :cutoff"),
+            {"cutoff": cutoff},
+        )
+        report["water_levels_hourly"] = deleted.rowcount
+    return report
+
+
+def maintain_storage(engine, dry_run: bool = False) -> dict:
+    """Create upcoming partitions and apply retention"""
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        if not dry_run:
+            for table in PARTITIONED_TABLES:
+                ensure_partitions(
+                    connection, table, now, add_months(now, PARTITION_MONTHS_AHEAD)
+                )
+        return apply_retention(connection, now, dry_run)
+
+
+async def run_periodically():
+    """Background task running storage maintenance every few hours"""
+    from database import get_engine
+
+    while True:
+        await asyncio.sleep(STORAGE_MAINTENANCE_HOURS * 3600)
+        try:
+            report = await asyncio.to_thread(maintain_storage, get_engine())
+            logger.info("Storage maintenance: %s", report)
+        except Exception as e:
+            logger.warning("Storage maintenance failed: %s", e)
+
+
+if __name__ == "__main__":
+    from database import get_engine
+
+    parser = argparse.ArgumentParser(
+        description="Create upcoming partitions and apply retention"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="drop nothing")
+    args = parser.parse_args()
+    report = maintain_storage(get_engine(), args.dry_run)
+    print(json.dumps(report, indent=2, default=str))
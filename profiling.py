@@ -0,0 +1,303 @@
+"""
+On-demand sampling profiles of single requests, in speedscope format.
+
+A request is profiled when it carries `?__profile=1` and an `X-Profile-Token`
+header matching PROFILE_TOKEN, or at random with probability
+PROFILE_SAMPLE_RATE. While it runs, a thread samples the event loop thread's
+Python stack every PROFILE_INTERVAL_MS, and the SQL cursor hooks in metrics.py
+add each statement the request runs with its duration. An explicit request
+gets the profile back instead of its response; a sampled one is written to
+PROFILE_DIR. Open either at https://www.speedscope.app.
+
+The sampler sees whatever the loop thread is running, so work of concurrent
+requests shows up too; the SQL profile only holds the request's own
+statements. One request is profiled at a time per process, and sampling
+stops after PROFILE_MAX_SECONDS. Server-Sent Events streams are never
+profiled: they stay open for as long as the client is connected.
+
+Sampled profiles are written after the response is sent, off the event loop,
+so that time is not counted in the request's latency. An explicit profile is
+the response, so building it is.
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Shared secret for `?__profile=1`; explicit profiling is off when unset
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+
+# Fraction of requests profiled at random and written to PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
+# Where sampled profiles are written, and how many of them are kept
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "floodguard-profiles")
+)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "100"))
+
+# Milliseconds between stack samples
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+
+# Longest a request is sampled for; later work is left out of its profile
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "30"))
+
+# Profile of the request being handled, read by the SQL hooks
+current_profile: ContextVar["RequestProfile | None"] = ContextVar(
+    "current_profile", default=None
+)
+
+# Held while a request is profiled; the sampler can only watch one at a time
+_profiling = threading.Lock()
+
+# Profiles being written in the background, and the lock their pruning takes
+_saving = set()
+_pruning = threading.Lock()
+
+
+class RequestProfile:
+    """Stack samples and SQL statements of one request"""
+
+    def __init__(
+        self,
+        name: str,
+        thread_id: int,
+        interval: float,
+        max_seconds: float = PROFILE_MAX_SECONDS,
+    ):
+        self.name = name
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.truncated = False
+        self.frames = {}
+        self.samples = []
+        self.weights = []
+        self.statements = []
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample, name="request-profiler", daemon=True
+        )
+
+    def _frame(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self):
+        last = time.perf_counter()
+        deadline = last + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if now > deadline:
+                self.truncated = True
+                return
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append((now - last) * 1000)
+            last = now
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+    def add_statement(self, query: str, statement: str, seconds: float):
+        self.statements.append((query, " ".join(statement.split()), seconds * 1000))
+
+    def speedscope(self) -> bytes:
+        """The profile as a speedscope file: Python stacks, then SQL time"""
+        frames = [
+            {"name": name, "file": file, "line": line}
+            for name, file, line in self.frames
+        ]
+        sql_samples, sql_weights = [], []
+        for query, statement, milliseconds in self.statements:
+            stack = []
+            for name in (f"SQL {query}", statement[:200]):
+                stack.append(len(frames))
+                frames.append({"name": name})
+            sql_samples.append(stack)
+            sql_weights.append(milliseconds)
+        python_ms = sum(self.weights)
+        cut = f", first {self.max_seconds:g} s" if self.truncated else ""
+        sql_ms = sum(sql_weights)
+        return orjson.dumps(
+            {
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "name": self.name,
+                "exporter": "floodguard",
+                "activeProfileIndex": 0,
+                "shared": {"frames": frames},
+                "profiles": [
+                    {
+                        "type": "sampled",
+                        "name": f"{self.name} ({self.elapsed_ms:.1f} ms{cut})",
+                        "unit": "milliseconds",
+                        "startValue": 0,
+                        "endValue": python_ms,
+                        "samples": self.samples,
+                        "weights": self.weights,
+                    },
+                    {
+                        "type": "sampled",
+                        "name": f"SQL ({len(sql_weights)} statements)",
+                        "unit": "milliseconds",
+                        "startValue": 0,
+                        "endValue": sql_ms,
+                        "samples": sql_samples,
+                        "weights": sql_weights,
+                    },
+                ],
+            }
+        )
+
+
+def save(profile: RequestProfile, directory: str | None = None) -> str:
+    """Write a profile to the profile directory, dropping the oldest ones"""
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    slug = "".join(c if c.isalnum() else "-" for c in profile.name).strip("-")
+    path = os.path.join(directory, f"{time.time():.6f}-{slug}.speedscope.json")
+    with open(path, "wb") as f:
+        f.write(profile.speedscope())
+    # Names start with the time, so they sort oldest first
+    with _pruning:
+        profiles = sorted(os.listdir(directory))
+        for name in profiles[: max(len(profiles) - PROFILE_KEEP, 0)]:
+            os.remove(os.path.join(directory, name))
+    return path
+
+
+def _saved(task):
+    _saving.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Could not write a sampled profile: %s", task.exception())
+
+
+def _streaming(scope) -> bool:
+    """Whether a request asks for a Server-Sent Events stream"""
+    accept = dict(scope["headers"]).get(b"accept", b"")
+    return scope["path"].endswith("/stream") or b"text/event-stream" in accept
+
+
+def _explicitly_requested(scope) -> bool:
+    query = scope.get("query_string", b"")
+    if b"__profile" not in query:
+        return False
+    if parse_qs(query.decode("latin-1")).get("__profile") != ["1"]:
+        return False
+    if PROFILE_TOKEN is None:
+        return False
+    # Compared as bytes: compare_digest rejects non-ASCII str
+    token = dict(scope["headers"]).get(b"x-profile-token", b"")
+    return hmac.compare_digest(token, PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it, or a sample of all"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        explicit = _explicitly_requested(scope)
+        sampled = not explicit and random.random() < PROFILE_SAMPLE_RATE
+        if not (explicit or sampled):
+            return await self.app(scope, receive, send)
+        if _streaming(scope):
+            if explicit:
+                return await _send_bytes(
+                    send, 400, b'{"detail":"Event streams cannot be profiled"}'
+                )
+            return await self.app(scope, receive, send)
+        if not _profiling.acquire(blocking=False):
+            if explicit:
+                return await _send_bytes(
+                    send, 409, b'{"detail":"Another request is being profiled"}'
+                )
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(
+            f"{scope['method']} {scope['path']}",
+            threading.get_ident(),
+            PROFILE_INTERVAL_MS / 1000,
+            PROFILE_MAX_SECONDS,
+        )
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            # The caller of an explicit profile gets the profile instead
+            if not explicit:
+                await send(message)
+
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            _profiling.release()
+
+        if explicit:
+            await _send_bytes(
+                send,
+                200,
+                profile.speedscope(),
+                [
+                    (b"x-profiled-status", str(status).encode()),
+                    (
+                        b"content-disposition",
+                        b'attachment; filename="profile.speedscope.json"',
+                    ),
+                ],
+            )
+        else:
+            # Not awaited: writing the file is no part of serving the request
+            task = asyncio.ensure_future(asyncio.to_thread(save, profile))
+            _saving.add(task)
+            task.add_done_callback(_saved)
+
+
+async def _send_bytes(send, status: int, body: bytes, headers=()):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,213 @@
+"""
+Read queries behind the map and dashboard endpoints.
+
+Each function takes a repository (repository.py) and returns the payload of
+one API endpoint, so a route and the combined `/api/dashboard` snapshot share
+exactly the same data whichever backend serves it.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import downsample
+from alert_engine import alert_engine
+from district_cache import (
+    DEFAULT_DETAIL,
+    DETAIL_TOLERANCES,
+    district_cache,
+    resolve_detail,
+)
+from fast_json import RawJSON
+from rainfall_store import RAINFALL_WINDOW_HOURS
+from rainfall_store import store as rainfall_store
+from repository import Repository
+from station_store import store as station_store
+from trends import trend_tracker
+
+# History ranges longer than this are read from the hourly rollups, whose
+# hourly maximum keeps the peaks that matter for flood levels
+HISTORY_ROLLUP_AFTER = timedelta(days=31)
+
+
+def parse_bbox(bbox: str | None):
+    """Parse `minLon,minLat,maxLon,maxLat` into a tuple, or None when absent"""
+    if not bbox:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox must be ordered min to max within lon/lat ranges")
+    return (min_lon, min_lat, max_lon, max_lat)
+
+
+async def ensure_station_store(repo: Repository):
+    """Warm the station store on first use if startup could not"""
+    if not station_store.warmed:
+        await station_store.load(repo)
+
+
+async def get_stations(repo: Repository, bbox=None) -> dict:
+    """Active stations with their latest reading, from the station store"""
+    await ensure_station_store(repo)
+    stations = station_store.all()
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        stations = [
+            station
+            for station in stations
+            if min_lon <= station.longitude <= max_lon
+            and min_lat <= station.latitude <= max_lat
+        ]
+    trends = trend_tracker.trends(stations)
+    return {
+        "stations": [station.to_api(trend) for station, trend in zip(stations, trends)]
+    }
+
+
+async def get_station_history(
+    repo: Repository,
+    station_id: int,
+    start: datetime,
+    end: datetime,
+    points: int,
+    method: str = "lttb",
+) -> dict | None:
+    """Downsampled water levels of one station, or None if it does not exist"""
+    await ensure_station_store(repo)
+    station = station_store.get(station_id)
+    if station is None:
+        return None
+
+    hourly = end - start > HISTORY_ROLLUP_AFTER
+    x, y = await repo.level_series(station_id, start, end, hourly)
+
+    history = downsample.history_payload(
+        x, y, points, station.warning_level, station.danger_level, method
+    )
+    return {
+        "station": station.to_api(trend_tracker.trends([station])[0]),
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": "hourly" if hourly else "raw",
+        **history,
+    }
+
+
+def _intensity(total_rainfall):
+    if total_rainfall > 50:
+        return "high"
+    if total_rainfall > 25:
+        return "medium"
+    return "low"
+
+
+async def get_rainfall(repo: Repository, hours: int = 24, bbox=None) -> dict:
+    """Rainfall totals per gauge over the last N hours"""
+    if not 1 <= hours <= RAINFALL_WINDOW_HOURS:
+        return await _get_rainfall_from_table(repo, hours, bbox)
+
+    # Two lookups per gauge in the hourly prefix sums of the rainfall store
+    if not rainfall_store.warmed:
+        await rainfall_store.load(repo)
+    gauges, totals, latest = rainfall_store.totals(hours)
+    order = np.argsort(-totals, kind="stable")
+    stamps = np.datetime_as_string(latest, unit="s").tolist()
+    totals = totals.round(2).tolist()
+
+    rainfall_data = []
+    for i in order.tolist():
+        district, longitude, latitude = gauges[i]
+        if bbox is not None and not (
+            bbox[0] <= longitude <= bbox[2] and bbox[1] <= latitude <= bbox[3]
+        ):
+            continue
+        rainfall_data.append(
+            {
+                "district": district,
+                "coordinates": [longitude, latitude],
+                "rainfall": totals[i],
+                "intensity": _intensity(totals[i]),
+                "lastUpdated": stamps[i],
+            }
+        )
+    return {"rainfall": rainfall_data}
+
+
+async def _get_rainfall_from_table(repo: Repository, hours: int, bbox=None) -> dict:
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    rainfall_data = []
+    for row in await repo.rainfall_totals(cutoff_time, bbox):
+        rainfall_data.append(
+            {
+                "district": row["district"],
+                "coordinates": [row["longitude"], row["latitude"]],
+                "rainfall": row["total_rainfall"],
+                "intensity": _intensity(row["total_rainfall"]),
+                "lastUpdated": (
+                    row["latest_timestamp"].isoformat()
+                    if row["latest_timestamp"]
+                    else None
+                ),
+            }
+        )
+
+    return {"rainfall": rainfall_data}
+
+
+async def get_forecasts(repo: Repository, bbox=None, zoom: str | None = None) -> dict:
+    """Forecasts for the next 24 hours issued within the last day"""
+    now = datetime.utcnow()
+    tolerance = None if zoom is None else DETAIL_TOLERANCES[resolve_detail(zoom)]
+    rows = await repo.forecasts(
+        now - timedelta(hours=24), now + timedelta(hours=24), bbox, tolerance
+    )
+    forecasts = []
+
+    for row in rows:
+        forecasts.append(
+            {
+                "district": row["district"],
+                "riskLevel": row["risk_level"],
+                "area": RawJSON(row["area_geojson"]),
+                "forecastTime": row["forecast_time"].isoformat(),
+                "confidence": row["confidence"],
+                "affectedPopulation": row["affected_population"],
+                "createdAt": row["created_at"].isoformat(),
+            }
+        )
+
+    return {"forecasts": forecasts}
+
+
+async def get_alerts(repo: Repository) -> dict:
+    """Top 5 districts by combined station and forecast risk"""
+    # Kept up to date by the alert engine as readings and forecasts arrive
+    if not alert_engine.warmed:
+        await alert_engine.load(repo)
+    return {"alerts": alert_engine.panel()}
+
+
+async def get_districts(
+    repo: Repository, detail: str = DEFAULT_DETAIL, bbox=None
+) -> dict:
+    """District boundaries as GeoJSON, from the pre-serialized cache"""
+    payload = await district_cache.get(repo, detail)
+    if bbox is not None:
+        return {"districts": payload.within(bbox)}
+    return {"districts": payload.districts}
+
+
+async def get_table_versions(repo: Repository) -> dict:
+    """Change counter and last change time of every tracked table"""
+    return await repo.table_versions()
+
+
+async def rows_crossed_boundary(
+    repo: Repository, table: str, column: str, offset: timedelta, since: datetime
+) -> bool:
+    """Whether a moving `now + offset` window edge passed any row after `since`"""
+    now = datetime.utcnow()
+    return await repo.rows_crossed_boundary(table, column, since + offset, now + offset)
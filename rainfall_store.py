@@ -0,0 +1,161 @@
+"""
+In-memory hourly rainfall accumulations per gauge.
+
+`/api/rainfall?hours=N` used to sum raw rainfall_data rows for whatever window
+was asked for. The store instead keeps, for every gauge (district and
+location), a running cumulative total at the end of each of the last
+`RAINFALL_WINDOW_HOURS` hours in a NumPy ring. Any 1-72 hour accumulation is
+then the difference of two columns, whatever the window. Windows are aligned
+to the hour: they cover the current partial hour and the N - 1 hours before
+it.
+
+Readings are added as they are ingested and picked up from other workers by
+id. An IdCursor remembers the recent ids already added, so rows that commit
+out of id order are picked up late rather than lost, and none is added twice.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from repository import CATCH_UP_ID_MARGIN, IdCursor, Repository
+
+RAINFALL_WINDOW_HOURS = 72
+
+# One more column than the longest window: its start is the column before it
+SPAN = RAINFALL_WINDOW_HOURS + 1
+
+# Latest-reading time of a gauge that has not reported, in epoch microseconds
+NO_READING = np.iinfo(np.int64).min
+
+
+def hour_of(timestamps) -> np.ndarray:
+    """Absolute hour number of naive UTC datetimes"""
+    stamps = np.asarray(timestamps, dtype="datetime64[h]")
+    return stamps.astype(np.int64)
+
+
+class RainfallStore:
+    """Cumulative rainfall per gauge over a ring of hourly columns"""
+
+    def __init__(self):
+        # Bumped whenever a reading or a reload changes the totals
+        self.version = 0
+        self._reset()
+
+    def _reset(self):
+        self._rows = {}
+        self.gauges = []
+        self.cumulative = np.zeros((0, SPAN))
+        self.last_time = np.zeros(0, dtype=np.int64)
+        self.hour = None
+        self.cursor = IdCursor()
+        self.warmed = False
+
+    def _row(self, district, longitude, latitude):
+        key = (district, longitude, latitude)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self.gauges)
+            self.gauges.append(key)
+        return row
+
+    def _advance(self, hour):
+        """Carry every gauge's total forward into the hours up to `hour`"""
+        if self.hour is None:
+            self.hour = hour
+            return
+        if hour <= self.hour:
+            return
+        carried = self.cumulative[:, self.hour % SPAN, None]
+        columns = np.arange(max(self.hour + 1, hour - SPAN + 1), hour + 1) % SPAN
+        self.cumulative[:, columns] = carried
+        self.hour = hour
+
+    def add(self, readings, ids=None, now: datetime | None = None):
+        """Add reading dicts (district, longitude, latitude, rainfall_mm, timestamp)"""
+        if ids is not None:
+            fresh = self.cursor.take(ids).tolist()
+            readings = [reading for reading, new in zip(readings, fresh) if new]
+        if not readings:
+            return
+        self.version += 1
+
+        rows = np.array(
+            [self._row(r["district"], r["longitude"], r["latitude"]) for r in readings],
+            dtype=np.intp,
+        )
+        if len(self.gauges) > len(self.cumulative):
+            grown = np.zeros((max(len(self.gauges), 2 * len(self.cumulative)), SPAN))
+            grown[: len(self.cumulative)] = self.cumulative
+            self.cumulative = grown
+            last_time = np.full(len(grown), NO_READING, dtype=np.int64)
+            last_time[: len(self.last_time)] = self.last_time
+            self.last_time = last_time
+
+        stamps = np.array([r["timestamp"] for r in readings], dtype="datetime64[us]")
+        # Ingestion accepts readings a little ahead of the clock. They count in
+        # the current hour: the ring must not move past it, or its newest
+        # column would overwrite the start of the longest window
+        hours = np.minimum(hour_of(stamps), hour_of(now or datetime.utcnow()).item())
+        self._advance(int(hours.max()))
+        amounts = np.array([r["rainfall_mm"] for r in readings], dtype=np.float64)
+
+        # A reading raises the total of its hour and of every hour after it.
+        # Readings older than the ring raise every column alike, which leaves
+        # every window unchanged
+        first = np.maximum(hours, self.hour - SPAN + 1)
+        spans = np.maximum(self.hour - first + 1, 0)
+        expanded = np.repeat(np.arange(len(rows)), spans)
+        offsets = np.arange(len(expanded)) - np.repeat(np.cumsum(spans) - spans, spans)
+        columns = (first[expanded] + offsets) % SPAN
+        np.add.at(self.cumulative, (rows[expanded], columns), amounts[expanded])
+        np.maximum.at(self.last_time, rows, stamps.astype(np.int64))
+
+    def totals(self, hours: int, now: datetime | None = None):
+        """(gauges, totals, latest reading) of gauges with rain data in the window"""
+        now = now or datetime.utcnow()
+        current = hour_of(now).item()
+        self._advance(current)
+        if self.hour is None or not self.gauges:
+            return [], np.zeros(0), np.zeros(0, dtype="datetime64[us]")
+
+        size = len(self.gauges)
+        end = self.cumulative[:size, current % SPAN]
+        start = self.cumulative[:size, (current - hours) % SPAN]
+        # Only gauges reporting since the start of the window are listed
+        first_hour = np.datetime64(current - hours + 1, "h").astype("datetime64[us]")
+        reporting = np.flatnonzero(self.last_time[:size] >= first_hour.astype(np.int64))
+        gauges = [self.gauges[i] for i in reporting]
+        latest = self.last_time[reporting].astype("datetime64[us]")
+        return gauges, (end - start)[reporting], latest
+
+    async def load(self, repo: Repository):
+        """(Re)build the hourly totals of the last RAINFALL_WINDOW_HOURS"""
+        # Rows up to a margin below the last id are summed by the database.
+        # The ones above it are read one by one, so the cursor knows which
+        # ones it has and picks up the others when they commit
+        floor = max(await repo.max_rainfall_id() - CATCH_UP_ID_MARGIN, 0)
+        now = datetime.utcnow()
+        since = np.datetime64(hour_of(now).item() - SPAN, "h").item()
+        rows = await repo.rainfall_hourly(since, through_id=floor)
+        recent = await repo.rainfall_after(floor)
+        self._reset()
+        self.cursor = IdCursor(floor)
+        self.add(rows, now=now)
+        self.add(recent, ids=[row["id"] for row in recent], now=now)
+        self._advance(hour_of(now).item())
+        self.warmed = True
+        self.version += 1
+
+    async def catch_up(self, repo: Repository):
+        """Add rows written by other processes since the last load or catch-up"""
+        rows = await repo.rainfall_after(
+            self.cursor.last_id, missing=self.cursor.missing()
+        )
+        if rows:
+            self.add(rows, ids=[row["id"] for row in rows])
+
+
+# Process-wide store used by the rainfall endpoint
+store = RainfallStore()
@@ -0,0 +1,1254 @@
+"""
+Data access behind the API: a PostGIS repository and an in-memory one.
+
+Queries, stores and caches read and write through a repository instead of
+issuing SQL themselves. `PostgisRepository` runs the queries on an
+AsyncSession. `MemoryRepository` answers the same calls from NumPy column
+arrays, and is used:
+
+- as a read replica (`DATA_BACKEND=replica`), hydrated from PostGIS at startup
+  and caught up by id on every refresh, while writes, vector tiles and history
+  older than `REPLICA_HISTORY_DAYS` still go to PostGIS,
+- as the whole backend (`DATA_BACKEND=memory`), filled by seed_data.py, for
+  tests and benchmarks that run without a database.
+
+Readings are kept sorted by (station, time), so a station's history is two
+binary searches and a slice. New readings go to a small unsorted tail that is
+merged in once it reaches `MERGE_TAIL_ROWS`.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import shapely
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from metrics import timed_calls
+from models import RainfallData, WaterLevel
+
+DATA_BACKENDS = ("postgis", "replica", "memory")
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "postgis")
+if DATA_BACKEND not in DATA_BACKENDS:
+    raise ValueError(f"DATA_BACKEND must be one of {', '.join(DATA_BACKENDS)}")
+
+# Days of readings and rainfall a replica holds; older history is read from
+# PostGIS
+REPLICA_HISTORY_DAYS = float(os.environ.get("REPLICA_HISTORY_DAYS", "400"))
+
+# Forecasts created this long ago are outside every endpoint's window
+FORECAST_HORIZON = timedelta(days=2)
+
+# Readings fetched per query while hydrating a replica
+REPLICA_BATCH_ROWS = 200_000
+
+# Ids below the highest one read that catch-ups look at again. Sequence ids
+# are taken before commit, so a row can become visible after rows with higher
+# ids; it is picked up as long as it commits within this many later ids.
+CATCH_UP_ID_MARGIN = int(os.environ.get("CATCH_UP_ID_MARGIN", "100000"))
+
+# Unsorted readings held before they are merged into the sorted columns
+MERGE_TAIL_ROWS = 65_536
+
+# Reading statuses by index, as ingest.VALID_STATUSES and seed_data.STATUSES
+STATUSES = ("normal", "warning", "danger")
+
+HOUR_US = 3_600_000_000
+
+# Envelope of the requested viewport, matched against GiST-indexed columns
+BBOX_ENVELOPE = "ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)"
+
+
+class IdCursor:
+    """The ids of an append-only table read so far, allowing for late commits
+
+    Ids within CATCH_UP_ID_MARGIN of the highest one read are remembered, so a
+    catch-up can ask again for the ones in between it has not seen, and a row
+    read twice is only taken once.
+    """
+
+    def __init__(self, last_id: int = 0):
+        self.last_id = last_id
+        self.floor = last_id
+        self._seen = np.zeros(0, dtype=np.int64)
+
+    def missing(self) -> list:
+        """Ids between the floor and the last id read that have not been read"""
+        span = np.arange(self.floor + 1, self.last_id + 1)
+        return span[~np.isin(span, self._seen)].tolist()
+
+    def take(self, ids) -> np.ndarray:
+        """Mark ids as read; True for each one that had not been read before"""
+        ids = np.asarray(ids, dtype=np.int64)
+        fresh = (ids > self.floor) & ~np.isin(ids, self._seen)
+        if fresh.any():
+            self._seen = np.union1d(self._seen, ids[fresh])
+            self.last_id = max(self.last_id, int(ids.max()))
+        floor = self.last_id - CATCH_UP_ID_MARGIN
+        if floor > self.floor:
+            self.floor = floor
+            self._seen = self._seen[self._seen > floor]
+        return fresh
+
+
+def _bbox_params(bbox) -> dict:
+    return dict(zip(("min_lon", "min_lat", "max_lon", "max_lat"), bbox))
+
+
+def to_micros(timestamps) -> np.ndarray:
+    """Epoch microseconds of naive UTC datetimes"""
+    return np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64)
+
+
+def to_datetimes(micros) -> list:
+    """Naive UTC datetimes of epoch microseconds"""
+    return np.asarray(micros, dtype=np.int64).astype("datetime64[us]").tolist()
+
+
+def geojson(geometry, tolerance=None, digits=None) -> str:
+    """GeoJSON of a shapely geometry, as ST_AsGeoJSON of a simplified one"""
+    if tolerance is not None:
+        geometry = shapely.simplify(geometry, tolerance, preserve_topology=True)
+    if digits is not None:
+        geometry = shapely.transform(geometry, lambda coords: coords.round(digits))
+    return shapely.to_geojson(geometry)
+
+
+class Repository:
+    """Every read and write the API makes against its tables"""
+
+    async def stations(self) -> list:
+        """Active stations with their latest level, status and timestamp"""
+        raise NotImplementedError
+
+    async def station_thresholds(self, station_ids) -> dict:
+        """(warning, danger) levels of the given active stations by id"""
+        raise NotImplementedError
+
+    async def max_reading_id(self) -> int:
+        raise NotImplementedError
+
+    async def latest_readings(self, after_id: int):
+        """Latest reading per station among rows after an id, and the last id"""
+        raise NotImplementedError
+
+    async def recent_readings(self, since: datetime):
+        """(station ids, timestamps, levels) of readings after a time"""
+        raise NotImplementedError
+
+    async def level_series(
+        self, station_id: int, start: datetime, end: datetime, hourly: bool
+    ):
+        """(epoch seconds, levels) of one station, raw or as hourly maxima"""
+        raise NotImplementedError
+
+    async def max_rainfall_id(self) -> int:
+        raise NotImplementedError
+
+    async def rainfall_hourly(self, since: datetime, through_id=None) -> list:
+        """Rainfall per gauge and hour since a time, of rows up to an id"""
+        raise NotImplementedError
+
+    async def rainfall_after(self, after_id: int, since=None, missing=()) -> list:
+        """Rainfall rows after an id or among missing ids, in id order"""
+        raise NotImplementedError
+
+    async def rainfall_totals(self, since: datetime, bbox=None) -> list:
+        """Total and latest time per gauge since a time, wettest first"""
+        raise NotImplementedError
+
+    async def forecasts(
+        self, created_since: datetime, due_before: datetime, bbox=None, tolerance=None
+    ) -> list:
+        """Forecasts with their area as GeoJSON, highest risk first"""
+        raise NotImplementedError
+
+    async def forecast_risks(self, created_since: datetime) -> list:
+        """(district, risk, created_at, forecast_time) of recent forecasts"""
+        raise NotImplementedError
+
+    async def latest_forecast_time(self) -> datetime | None:
+        raise NotImplementedError
+
+    async def districts(self, tolerance=None) -> list:
+        """Districts by name with their boundary as GeoJSON and its bounds"""
+        raise NotImplementedError
+
+    async def table_versions(self) -> dict:
+        """(version, changed_at) of every tracked table"""
+        raise NotImplementedError
+
+    async def rows_crossed_boundary(
+        self, table: str, column: str, start: datetime, end: datetime
+    ) -> bool:
+        """Whether any row of a table has a time column within [start, end)"""
+        raise NotImplementedError
+
+    async def render_tile(self, layer: str, z: int, x: int, y: int) -> bytes:
+        raise NotImplementedError
+
+    async def insert_water_levels(self, rows: list):
+        """Store reading dicts (station_id, level, timestamp, status)"""
+        raise NotImplementedError
+
+    async def insert_rainfall(self, rows: list) -> list:
+        """Store rainfall dicts; returns their ids in order"""
+        raise NotImplementedError
+
+    async def rollback(self):
+        raise NotImplementedError
+
+
+@timed_calls("postgis")
+class PostgisRepository(Repository):
+    """Reads and writes on a PostGIS AsyncSession"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _all(self, sql: str, params=None) -> list:
+        return [row._asdict() for row in await self.db.execute(text(sql), params)]
+
+    async def _scalar(self, sql: str, params=None):
+        return (await self.db.execute(text(sql), params)).scalar()
+
+    async def stations(self) -> list:
+        return await self._all(
+            """
+            SELECT
+                ms.id, ms.name, ms.river_name, ms.district,
+                ST_X(ms.location) as longitude, ST_Y(ms.location) as latitude,
+                ms.normal_level, ms.warning_level, ms.danger_level,
+                wl.level, wl.status, wl.timestamp
+            FROM monitoring_stations ms
+            LEFT JOIN LATERAL (
+                SELECT level, status, timestamp
+                FROM water_levels
+                WHERE station_id = ms.id
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ) wl ON true
+            WHERE ms.is_active = true
+        """
+        )
+
+    async def station_thresholds(self, station_ids) -> dict:
+        if not station_ids:
+            return {}
+        query = text(
+            """
+            SELECT id, warning_level, danger_level
+            FROM monitoring_stations
+            WHERE is_active = true AND id IN :ids
+        """
+        ).bindparams(bindparam("ids", expanding=True))
+        result = await self.db.execute(query, {"ids": sorted(station_ids)})
+        return {row.id: (row.warning_level, row.danger_level) for row in result}
+
+    async def max_reading_id(self) -> int:
+        return await self._scalar("SELECT COALESCE(MAX(id), 0) FROM water_levels")
+
+    async def latest_readings(self, after_id: int):
+        rows = await self._all(
+            """
+            SELECT DISTINCT ON (station_id)
+                station_id, level, status, timestamp,
+                MAX(id) OVER () as last_id
+            FROM water_levels
+            WHERE id > :last_id
+            ORDER BY station_id, timestamp DESC
+        """,
+            {"last_id": after_id},
+        )
+        if not rows:
+            return [], after_id
+        last_id = rows[0]["last_id"]
+        for row in rows:
+            del row["last_id"]
+        return rows, last_id
+
+    async def recent_readings(self, since: datetime):
+        query = text(
+            """
+            SELECT station_id, timestamp, level
+            FROM water_levels
+            WHERE timestamp > :since
+        """
+        )
+        rows = (await self.db.execute(query, {"since": since})).all()
+        return tuple(zip(*rows)) if rows else ((), (), ())
+
+    async def level_series(
+        self, station_id: int, start: datetime, end: datetime, hourly: bool
+    ):
+        # Aggregate into two arrays so the driver decodes one row, not one per
+        # reading; long ranges come from the hourly rollups
+        if hourly:
+            query = text(
+                """
+                SELECT
+                    array_agg(EXTRACT(EPOCH FROM bucket)::float8 ORDER BY bucket) as x,
+                    array_agg(level_max ORDER BY bucket) as y
+                FROM water_levels_hourly
+                WHERE station_id = :station_id
+                AND bucket >= date_trunc('hour', :start)
+                AND bucket < :end
+            """
+            )
+        else:
+            query = text(
+                """
+                SELECT
+                    array_agg(EXTRACT(EPOCH FROM timestamp)::float8 ORDER BY timestamp) as x,
+                    array_agg(level ORDER BY timestamp) as y
+                FROM water_levels
+                WHERE station_id = :station_id
+                AND timestamp >= :start
+                AND timestamp < :end
+            """
+            )
+        params = {"station_id": station_id, "start": start, "end": end}
+        row = (await self.db.execute(query, params)).one()
+        return (
+            np.asarray(row.x or [], dtype=np.float64),
+            np.asarray(row.y or [], dtype=np.float64),
+        )
+
+    async def reading_batch(
+        self, after_id: int, since=None, limit=REPLICA_BATCH_ROWS, missing=()
+    ):
+        """Column arrays of the next readings after an id or among missing
+        ids, or None when done"""
+        in_window = "" if since is None else "AND timestamp >= :since"
+        row = (
+            await self.db.execute(
+                text(
+                    f"""
+                    SELECT
+                        array_agg(id ORDER BY id) as id,
+                        array_agg(station_id ORDER BY id) as station_id,
+                        array_agg(micros ORDER BY id) as timestamp,
+                        array_agg(level ORDER BY id) as level,
+                        array_agg(status ORDER BY id) as status
+                    FROM (
+                        SELECT
+                            id, station_id, level, status,
+                            (EXTRACT(EPOCH FROM timestamp) * 1000000)::int8 as micros
+                        FROM water_levels
+                        WHERE (id > :after_id OR id = ANY(:missing))
+                        {in_window}
+                        ORDER BY id
+                        LIMIT :limit
+                    ) batch
+                """
+                ),
+                {
+                    "after_id": after_id,
+                    "missing": list(missing),
+                    "since": since,
+                    "limit": limit,
+                },
+            )
+        ).one()
+        if not row.id:
+            return None
+        index = {status: i for i, status in enumerate(STATUSES)}
+        return {
+            "id": np.asarray(row.id, dtype=np.int64),
+            "station_id": np.asarray(row.station_id, dtype=np.int64),
+            "timestamp": np.asarray(row.timestamp, dtype=np.int64),
+            "level": np.asarray(row.level, dtype=np.float64),
+            "status": np.array([index.get(s, 0) for s in row.status], dtype=np.int8),
+        }
+
+    async def max_rainfall_id(self) -> int:
+        return await self._scalar("SELECT COALESCE(MAX(id), 0) FROM rainfall_data")
+
+    async def rainfall_hourly(self, since: datetime, through_id=None) -> list:
+        up_to = "" if through_id is None else "AND id <= :through_id"
+        return await self._all(
+            f"""
+            SELECT
+                district,
+                ST_X(location) as longitude,
+                ST_Y(location) as latitude,
+                SUM(rainfall_mm) as rainfall_mm,
+                MAX(timestamp) as timestamp
+            FROM rainfall_data
+            WHERE timestamp >= :since
+            {up_to}
+            GROUP BY district, location, date_trunc('hour', timestamp)
+        """,
+            {"since": since, "through_id": through_id},
+        )
+
+    async def rainfall_after(self, after_id: int, since=None, missing=()) -> list:
+        in_window = "" if since is None else "AND timestamp >= :since"
+        return await self._all(
+            f"""
+            SELECT
+                id, district,
+                ST_X(location) as longitude,
+                ST_Y(location) as latitude,
+                rainfall_mm, timestamp
+            FROM rainfall_data
+            WHERE (id > :last_id OR id = ANY(:missing))
+            {in_window}
+            ORDER BY id
+        """,
+            {"last_id": after_id, "missing": list(missing), "since": since},
+        )
+
+    async def rainfall_totals(self, since: datetime, bbox=None) -> list:
+        in_view = "" if bbox is None else f"AND location && {BBOX_ENVELOPE}"
+        params = {"cutoff_time": since}
+        if bbox is not None:
+            params.update(_bbox_params(bbox))
+        return await self._all(
+            f"""
+            SELECT
+                district,
+                ST_X(location) as longitude,
+                ST_Y(location) as latitude,
+                SUM(rainfall_mm) as total_rainfall,
+                MAX(timestamp) as latest_timestamp
+            FROM rainfall_data
+            WHERE timestamp >= :cutoff_time
+            {in_view}
+            GROUP BY district, ST_X(location), ST_Y(location)
+            ORDER BY total_rainfall DESC
+        """,
+            params,
+        )
+
+    async def forecasts(
+        self, created_since: datetime, due_before: datetime, bbox=None, tolerance=None
+    ) -> list:
+        params = {"created_since": created_since, "forecast_time": due_before}
+        area = "forecast_area"
+        if tolerance is not None:
+            area = "ST_SimplifyPreserveTopology(forecast_area, :tolerance)"
+            params["tolerance"] = tolerance
+
+        in_view = ""
+        if bbox is not None:
+            in_view = f"AND ST_Intersects(forecast_area, {BBOX_ENVELOPE})"
+            params.update(_bbox_params(bbox))
+
+        return await self._all(
+            f"""
+            SELECT
+                district,
+                risk_level,
+                ST_AsGeoJSON({area}) as area_geojson,
+                forecast_time,
+                confidence,
+                affected_population,
+                created_at
+            FROM flood_forecasts
+            WHERE forecast_time <= :forecast_time
+            AND created_at >= :created_since
+            {in_view}
+            ORDER BY risk_level DESC, created_at DESC
+        """,
+            params,
+        )
+
+    async def forecast_risks(self, created_since: datetime) -> list:
+        query = text(
+            """
+            SELECT district, risk_level, created_at, forecast_time
+            FROM flood_forecasts
+            WHERE created_at >= :since
+        """
+        )
+        return [
+            tuple(row) for row in await self.db.execute(query, {"since": created_since})
+        ]
+
+    async def forecast_rows(self, created_since: datetime) -> list:
+        """Recent forecasts with their full area, to hydrate a replica"""
+        return await self._all(
+            """
+            SELECT
+                district, risk_level, ST_AsGeoJSON(forecast_area) as area_geojson,
+                forecast_time, confidence, affected_population, created_at
+            FROM flood_forecasts
+            WHERE created_at >= :since
+        """,
+            {"since": created_since},
+        )
+
+    async def latest_forecast_time(self) -> datetime | None:
+        return await self._scalar("SELECT MAX(created_at) FROM flood_forecasts")
+
+    async def districts(self, tolerance=None) -> list:
+        geometry = (
+            "boundary"
+            if tolerance is None
+            else "ST_SimplifyPreserveTopology(boundary, :tolerance)"
+        )
+        return await self._all(
+            f"""
+            SELECT
+                name,
+                ST_AsGeoJSON({geometry}, 6) as boundary_geojson,
+                population,
+                area_sq_km,
+                ST_XMin(boundary) as min_lon,
+                ST_YMin(boundary) as min_lat,
+                ST_XMax(boundary) as max_lon,
+                ST_YMax(boundary) as max_lat
+            FROM districts
+            ORDER BY name
+        """,
+            {} if tolerance is None else {"tolerance": tolerance},
+        )
+
+    async def station_rows(self) -> list:
+        """Every monitoring station, to hydrate a replica"""
+        return await self._all(
+            """
+            SELECT
+                id, name, river_name, district,
+                ST_X(location) as longitude, ST_Y(location) as latitude,
+                normal_level, warning_level, danger_level, is_active
+            FROM monitoring_stations
+        """
+        )
+
+    async def district_rows(self) -> list:
+        """Every district with its full boundary, to hydrate a replica"""
+        return await self._all(
+            """
+            SELECT name, ST_AsGeoJSON(boundary) as boundary_geojson,
+                population, area_sq_km
+            FROM districts
+        """
+        )
+
+    async def table_versions(self) -> dict:
+        result = await self.db.execute(
+            text("SELECT table_name, version, changed_at FROM table_versions")
+        )
+        return {row.table_name: (row.version, row.changed_at) for row in result}
+
+    async def rows_crossed_boundary(
+        self, table: str, column: str, start: datetime, end: datetime
+    ) -> bool:
+        query = f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {table}
+                WHERE {column} >= :start AND {column} < :end
+            )
+        """
+        return bool(await self._scalar(query, {"start": start, "end": end}))
+
+    async def render_tile(self, layer: str, z: int, x: int, y: int) -> bytes:
+        from tiles import render_tile
+
+        return await render_tile(self.db, layer, z, x, y)
+
+    async def insert_water_levels(self, rows: list):
+        # executemany on a Core insert is sent as multi-row VALUES batches
+        await self.db.execute(WaterLevel.__table__.insert(), rows)
+        await self.db.commit()
+
+    async def insert_rainfall(self, rows: list) -> list:
+        table = RainfallData.__table__
+        insert = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+        values = [
+            {
+                "district": row["district"],
+                "location": f"SRID=4326;POINT({row['longitude']} {row['latitude']})",
+                "rainfall_mm": row["rainfall_mm"],
+                "duration_hours": row.get("duration_hours"),
+                "timestamp": row["timestamp"],
+            }
+            for row in rows
+        ]
+        ids = (await self.db.execute(insert, values)).scalars().all()
+        await self.db.commit()
+        return ids
+
+    async def rollback(self):
+        await self.db.rollback()
+
+
+class Columns:
+    """Growable NumPy columns of one table"""
+
+    def __init__(self, **dtypes):
+        self.size = 0
+        self._data = {name: np.empty(1024, dtype) for name, dtype in dtypes.items()}
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self._data[name][: self.size]
+
+    def append(self, **columns):
+        count = len(next(iter(columns.values())))
+        needed = self.size + count
+        capacity = len(next(iter(self._data.values())))
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity)
+            for name, array in self._data.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[: self.size] = array[: self.size]
+                self._data[name] = grown
+        for name, values in columns.items():
+            self._data[name][self.size : needed] = values
+        self.size = needed
+
+    def clear(self):
+        self.size = 0
+
+
+def _latest(columns: dict) -> dict:
+    """Row with the newest timestamp of each station, as columns"""
+    if not len(columns["station_id"]):
+        return columns
+    order = np.lexsort((columns["timestamp"], columns["station_id"]))
+    stations = columns["station_id"][order]
+    last = order[np.append(stations[1:] != stations[:-1], True)]
+    return {name: values[last] for name, values in columns.items()}
+
+
+@timed_calls("memory")
+class MemoryRepository(Repository):
+    """Tables held as NumPy columns in process memory"""
+
+    READING_COLUMNS = {
+        "id": np.int64,
+        "station_id": np.int64,
+        "timestamp": np.int64,
+        "level": np.float64,
+        "status": np.int8,
+    }
+
+    def __init__(self, history_days: float | None = None):
+        self.history_days = history_days
+        self._reset()
+
+    def _reset(self):
+        self._stations = {}
+        self._forecasts = []
+        self._districts = []
+        self._versions = {}
+        # Readings sorted by (station, time), their (start, end) per station,
+        # and the rows not merged yet in arrival order
+        self._sorted = {
+            name: np.empty(0, dtype) for name, dtype in self.READING_COLUMNS.items()
+        }
+        self._blocks = {}
+        self._tail = Columns(**self.READING_COLUMNS)
+        # The last merged tail, in id order, for catch-ups just behind a merge
+        self._previous = None
+        self._merged_id = 0
+        self._last_reading_id = 0
+        self._reading_cursor = IdCursor()
+        self._rainfall = Columns(
+            id=np.int64, gauge=np.int64, timestamp=np.int64, rainfall_mm=np.float64
+        )
+        self._gauges = []
+        self._gauge_rows = {}
+        self._last_rainfall_id = 0
+        self._rainfall_cursor = IdCursor()
+        self.horizon = None
+        self.warmed = False
+
+    # -- Filling and hydrating -------------------------------------------
+
+    def _bump(self, table, now=None):
+        version = self._versions.get(table, (0, None))[0]
+        self._versions[table] = (version + 1, now or datetime.utcnow())
+
+    def add_stations(self, rows) -> list:
+        """Add station dicts (ids are assigned if missing); returns their ids"""
+        ids = []
+        for row in rows:
+            station = dict(row)
+            station.setdefault("id", max(self._stations, default=0) + 1)
+            station.setdefault("is_active", True)
+            self._stations[station["id"]] = station
+            ids.append(station["id"])
+        self._bump("monitoring_stations")
+        return ids
+
+    def add_districts(self, rows):
+        """Add district dicts whose boundary is GeoJSON, WKT or a geometry"""
+        for row in rows:
+            district = dict(row)
+            boundary = district.pop("boundary_geojson", None) or district["boundary"]
+            district["boundary"] = _geometry(boundary)
+            self._districts.append(district)
+        self._districts.sort(key=lambda district: district["name"])
+        self._bump("districts")
+
+    def add_forecasts(self, rows):
+        """Add forecast dicts whose area is GeoJSON, WKT or a geometry"""
+        for row in rows:
+            forecast = dict(row)
+            area = forecast.pop("area_geojson", None) or forecast["forecast_area"]
+            forecast["forecast_area"] = _geometry(area)
+            forecast["geojson"] = {}
+            self._forecasts.append(forecast)
+        self._bump("flood_forecasts")
+
+    def append_readings(self, station_ids, timestamps, levels, statuses, ids=None):
+        """Add reading columns; statuses index STATUSES, timestamps are naive UTC
+
+        Timestamps may also be given as epoch microseconds.
+        """
+        station_ids = np.asarray(station_ids, dtype=np.int64)
+        if not len(station_ids):
+            return
+        if ids is None:
+            ids = self._last_reading_id + np.arange(1, len(station_ids) + 1)
+        self._tail.append(
+            id=ids,
+            station_id=station_ids,
+            timestamp=to_micros(timestamps),
+            level=levels,
+            status=statuses,
+        )
+        self._last_reading_id = max(self._last_reading_id, int(np.max(ids)))
+        if self._tail.size >= MERGE_TAIL_ROWS:
+            self.merge()
+
+    def merge(self):
+        """Merge the unsorted tail into the (station, time) sorted columns"""
+        if not self._tail.size:
+            return
+        tail = {name: self._tail[name].copy() for name in self.READING_COLUMNS}
+        self._previous = tail
+        order = np.lexsort((tail["timestamp"], tail["station_id"]))
+        tail = {name: values[order] for name, values in tail.items()}
+
+        # Tail rows go after the readings of their station with the same time
+        positions = np.empty(len(order), dtype=np.intp)
+        stations, firsts = np.unique(tail["station_id"], return_index=True)
+        lasts = np.append(firsts[1:], len(order))
+        for station, first, last in zip(stations.tolist(), firsts, lasts):
+            lo, hi = self._blocks.get(station, (None, None))
+            if lo is None:
+                lo = hi = np.searchsorted(self._sorted["station_id"], station)
+            stamps = self._sorted["timestamp"][lo:hi]
+            positions[first:last] = lo + np.searchsorted(
+                stamps, tail["timestamp"][first:last], "right"
+            )
+        merged = {
+            name: np.insert(self._sorted[name], positions, tail[name])
+            for name in self.READING_COLUMNS
+        }
+        if self.history_days is not None:
+            cutoff = datetime.utcnow() - timedelta(days=self.history_days)
+            keep = merged["timestamp"] >= to_micros(cutoff)
+            if not keep.all():
+                merged = {name: values[keep] for name, values in merged.items()}
+            self.horizon = cutoff
+
+        stations = merged["station_id"]
+        edges = np.flatnonzero(stations[1:] != stations[:-1]) + 1
+        starts = np.append(0, edges) if len(stations) else edges
+        ends = np.append(edges, len(stations))
+        self._blocks = dict(
+            zip(stations[starts].tolist(), zip(starts.tolist(), ends.tolist()))
+        )
+        self._sorted = merged
+        self._merged_id = max(self._merged_id, int(tail["id"].max(initial=0)))
+        self._tail.clear()
+
+    def append_rainfall(self, rows, ids=None) -> list:
+        """Add rainfall dicts (district, longitude, latitude, rainfall_mm, timestamp)"""
+        if not rows:
+            return []
+        gauges = []
+        for row in rows:
+            key = (row["district"], row["longitude"], row["latitude"])
+            gauge = self._gauge_rows.get(key)
+            if gauge is None:
+                gauge = self._gauge_rows[key] = len(self._gauges)
+                self._gauges.append(key)
+            gauges.append(gauge)
+        if ids is None:
+            ids = list(
+                range(
+                    self._last_rainfall_id + 1, self._last_rainfall_id + 1 + len(rows)
+                )
+            )
+        self._rainfall.append(
+            id=ids,
+            gauge=gauges,
+            timestamp=to_micros([row["timestamp"] for row in rows]),
+            rainfall_mm=[row["rainfall_mm"] for row in rows],
+        )
+        self._last_rainfall_id = max(self._last_rainfall_id, int(max(ids)))
+        return list(ids)
+
+    async def _fetch_readings(self, source, since=None):
+        cursor = self._reading_cursor
+        # Ids below the last one read that were not visible then come first
+        after, missing = cursor.last_id, cursor.missing()
+        while True:
+            batch = await source.reading_batch(after, since, missing=missing)
+            if batch is None:
+                return
+            after, missing = max(after, int(batch["id"].max())), ()
+            fresh = cursor.take(batch["id"])
+            self.append_readings(
+                batch["station_id"][fresh],
+                batch["timestamp"][fresh],
+                batch["level"][fresh],
+                batch["status"][fresh],
+                ids=batch["id"][fresh],
+            )
+
+    async def _fetch_rainfall(self, source, since=None):
+        cursor = self._rainfall_cursor
+        rows = await source.rainfall_after(
+            cursor.last_id, since, missing=cursor.missing()
+        )
+        fresh = cursor.take([row["id"] for row in rows])
+        rows = [row for row, new in zip(rows, fresh.tolist()) if new]
+        self.append_rainfall(rows, ids=[row["id"] for row in rows])
+
+    async def _reload(self, source, table, now):
+        if table == "monitoring_stations":
+            self._stations = {}
+            self.add_stations(await source.station_rows())
+        elif table == "flood_forecasts":
+            self._forecasts = []
+            self.add_forecasts(await source.forecast_rows(now - FORECAST_HORIZON))
+        elif table == "districts":
+            self._districts = []
+            self.add_districts(await source.district_rows())
+
+    async def load(self, source: PostgisRepository):
+        """(Re)build the replica from PostGIS, keeping REPLICA_HISTORY_DAYS"""
+        now = datetime.utcnow()
+        since = None
+        if self.history_days is not None:
+            since = now - timedelta(days=self.history_days)
+        # Build aside and swap in, so readers never see a half-loaded replica
+        fresh = MemoryRepository(self.history_days)
+        versions = await source.table_versions()
+        for table in ("monitoring_stations", "flood_forecasts", "districts"):
+            await fresh._reload(source, table, now)
+        await fresh._fetch_readings(source, since)
+        fresh.merge()
+        fresh.horizon = since
+        await fresh._fetch_rainfall(source, since)
+        # Changes count from when this process can serve them
+        fresh._versions = {table: (v, now) for table, (v, _) in versions.items()}
+        fresh.warmed = True
+        self.__dict__.update(fresh.__dict__)
+
+    async def catch_up(self, source: PostgisRepository):
+        """Pick up rows and table changes written to PostGIS since the last call"""
+        now = datetime.utcnow()
+        versions = await source.table_versions()
+        changed = [
+            table
+            for table, (version, _) in versions.items()
+            if self._versions.get(table, (None, None))[0] != version
+        ]
+        for table in changed:
+            await self._reload(source, table, now)
+        await self._fetch_readings(source)
+        await self._fetch_rainfall(source)
+        for table in changed:
+            self._versions[table] = (versions[table][0], now)
+
+    # -- Reads -----------------------------------------------------------
+
+    def _reading_rows(self, rows: dict) -> list:
+        return [
+            {
+                "station_id": station_id,
+                "level": level,
+                "status": STATUSES[status],
+                "timestamp": timestamp,
+            }
+            for station_id, level, status, timestamp in zip(
+                rows["station_id"].tolist(),
+                rows["level"].tolist(),
+                rows["status"].tolist(),
+                to_datetimes(rows["timestamp"]),
+            )
+        ]
+
+    def _concat(self, *parts) -> dict:
+        return {
+            name: np.concatenate([part[name] for part in parts])
+            for name in self.READING_COLUMNS
+        }
+
+    def _tail_columns(self, mask=None) -> dict:
+        return {
+            name: self._tail[name] if mask is None else self._tail[name][mask]
+            for name in self.READING_COLUMNS
+        }
+
+    async def stations(self) -> list:
+        # Candidates: the last sorted row of every station and the whole tail
+        ends = np.array([hi - 1 for _, hi in self._blocks.values()], dtype=np.intp)
+        last = {name: values[ends] for name, values in self._sorted.items()}
+        latest = _latest(self._concat(last, self._tail_columns()))
+        readings = {row["station_id"]: row for row in self._reading_rows(latest)}
+
+        stations = []
+        for station in self._stations.values():
+            if not station["is_active"]:
+                continue
+            reading = readings.get(station["id"], {})
+            stations.append(
+                {
+                    **{
+                        key: value
+                        for key, value in station.items()
+                        if key != "is_active"
+                    },
+                    "level": reading.get("level"),
+                    "status": reading.get("status"),
+                    "timestamp": reading.get("timestamp"),
+                }
+            )
+        return stations
+
+    async def station_thresholds(self, station_ids) -> dict:
+        return {
+            station["id"]: (station["warning_level"], station["danger_level"])
+            for station in map(self._stations.get, station_ids)
+            if station is not None and station["is_active"]
+        }
+
+    async def max_reading_id(self) -> int:
+        return self._last_reading_id
+
+    async def latest_readings(self, after_id: int):
+        parts = [self._tail_columns(self._tail["id"] > after_id)]
+        # Merged rows are only scanned when a merge happened since `after_id`,
+        # and only the last merged tail unless `after_id` is older than it
+        if after_id < self._merged_id:
+            previous = self._previous
+            if (
+                previous is None
+                or not len(previous["id"])
+                or after_id < previous["id"].min() - 1
+            ):
+                previous = self._sorted
+            newer = previous["id"] > after_id
+            parts.append({name: values[newer] for name, values in previous.items()})
+        rows = self._concat(*parts)
+        if not len(rows["id"]):
+            return [], after_id
+        return self._reading_rows(_latest(rows)), int(rows["id"].max())
+
+    async def recent_readings(self, since: datetime):
+        after = to_micros(since)
+        stamps = self._sorted["timestamp"]
+        picked = [
+            np.arange(lo + np.searchsorted(stamps[lo:hi], after, "right"), hi)
+            for lo, hi in self._blocks.values()
+        ]
+        rows = np.concatenate(picked) if picked else np.zeros(0, dtype=np.intp)
+        recent = {name: values[rows] for name, values in self._sorted.items()}
+        recent = self._concat(
+            recent, self._tail_columns(self._tail["timestamp"] > after)
+        )
+        return (
+            recent["station_id"],
+            recent["timestamp"].astype("datetime64[us]"),
+            recent["level"],
+        )
+
+    async def level_series(
+        self, station_id: int, start: datetime, end: datetime, hourly: bool
+    ):
+        first, last = to_micros(start), to_micros(end)
+        if hourly:
+            # Whole hours overlapping the range, as the hourly rollups
+            first = first // HOUR_US * HOUR_US
+            last = (last - 1) // HOUR_US * HOUR_US + HOUR_US
+        lo, hi = self._blocks.get(station_id, (0, 0))
+        stamps = self._sorted["timestamp"][lo:hi]
+        lo, hi = lo + np.searchsorted(stamps, [first, last])
+        times = self._sorted["timestamp"][lo:hi]
+        levels = self._sorted["level"][lo:hi]
+
+        tail_times = self._tail["timestamp"]
+        newer = (
+            (self._tail["station_id"] == station_id)
+            & (tail_times >= first)
+            & (tail_times < last)
+        )
+        if newer.any():
+            times = np.concatenate([times, tail_times[newer]])
+            levels = np.concatenate([levels, self._tail["level"][newer]])
+            order = np.argsort(times, kind="stable")
+            times, levels = times[order], levels[order]
+
+        if hourly and len(times):
+            buckets = times // HOUR_US
+            starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+            return (
+                (buckets[starts] * 3600).astype(np.float64),
+                np.maximum.reduceat(levels, starts),
+            )
+        return times / 1e6, levels.copy()
+
+    async def max_rainfall_id(self) -> int:
+        return self._last_rainfall_id
+
+    def _gauge_row(self, gauge, **values) -> dict:
+        district, longitude, latitude = self._gauges[gauge]
+        return {
+            "district": district,
+            "longitude": longitude,
+            "latitude": latitude,
+            **values,
+        }
+
+    async def rainfall_hourly(self, since: datetime, through_id=None) -> list:
+        recent = self._rainfall["timestamp"] >= to_micros(since)
+        if through_id is not None:
+            recent &= self._rainfall["id"] <= through_id
+        stamps = self._rainfall["timestamp"][recent]
+        keys = self._rainfall["gauge"][recent] << 32 | stamps // HOUR_US
+        keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, self._rainfall["rainfall_mm"][recent], len(keys))
+        latest = np.full(len(keys), np.iinfo(np.int64).min)
+        np.maximum.at(latest, inverse, stamps)
+        return [
+            self._gauge_row(gauge, rainfall_mm=total, timestamp=timestamp)
+            for gauge, total, timestamp in zip(
+                (keys >> 32).tolist(), sums.tolist(), to_datetimes(latest)
+            )
+        ]
+
+    async def rainfall_after(self, after_id: int, since=None, missing=()) -> list:
+        ids = self._rainfall["id"]
+        # Late commits are appended out of id order
+        picked = np.flatnonzero((ids > after_id) | np.isin(ids, list(missing)))
+        picked = picked[np.argsort(ids[picked], kind="stable")]
+        return [
+            self._gauge_row(gauge, id=row_id, rainfall_mm=amount, timestamp=timestamp)
+            for row_id, gauge, amount, timestamp in zip(
+                ids[picked].tolist(),
+                self._rainfall["gauge"][picked].tolist(),
+                self._rainfall["rainfall_mm"][picked].tolist(),
+                to_datetimes(self._rainfall["timestamp"][picked]),
+            )
+        ]
+
+    async def rainfall_totals(self, since: datetime, bbox=None) -> list:
+        recent = self._rainfall["timestamp"] >= to_micros(since)
+        gauges = self._rainfall["gauge"][recent]
+        size = len(self._gauges)
+        totals = np.bincount(gauges, self._rainfall["rainfall_mm"][recent], size)
+        latest = np.full(size, np.iinfo(np.int64).min)
+        np.maximum.at(latest, gauges, self._rainfall["timestamp"][recent])
+
+        reporting = np.unique(gauges)
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            reporting = [
+                gauge
+                for gauge in reporting.tolist()
+                if min_lon <= self._gauges[gauge][1] <= max_lon
+                and min_lat <= self._gauges[gauge][2] <= max_lat
+            ]
+        reporting = np.asarray(reporting, dtype=np.intp)
+        reporting = reporting[np.argsort(-totals[reporting], kind="stable")]
+        return [
+            self._gauge_row(gauge, total_rainfall=total, latest_timestamp=timestamp)
+            for gauge, total, timestamp in zip(
+                reporting.tolist(),
+                totals[reporting].tolist(),
+                to_datetimes(latest[reporting]),
+            )
+        ]
+
+    def _recent_forecasts(self, created_since, due_before=None):
+        return [
+            forecast
+            for forecast in self._forecasts
+            if forecast["created_at"] >= created_since
+            and (due_before is None or forecast["forecast_time"] <= due_before)
+        ]
+
+    async def forecasts(
+        self, created_since: datetime, due_before: datetime, bbox=None, tolerance=None
+    ) -> list:
+        forecasts = self._recent_forecasts(created_since, due_before)
+        if bbox is not None:
+            view = shapely.box(*bbox)
+            forecasts = [f for f in forecasts if f["forecast_area"].intersects(view)]
+        forecasts.sort(key=lambda f: (f["risk_level"], f["created_at"]), reverse=True)
+
+        rows = []
+        for forecast in forecasts:
+            # Serialized once per detail level
+            area = forecast["geojson"].get(tolerance)
+            if area is None:
+                area = forecast["geojson"][tolerance] = geojson(
+                    forecast["forecast_area"], tolerance
+                )
+            rows.append(
+                {
+                    "district": forecast["district"],
+                    "risk_level": forecast["risk_level"],
+                    "area_geojson": area,
+                    "forecast_time": forecast["forecast_time"],
+                    "confidence": forecast["confidence"],
+                    "affected_population": forecast["affected_population"],
+                    "created_at": forecast["created_at"],
+                }
+            )
+        return rows
+
+    async def forecast_risks(self, created_since: datetime) -> list:
+        return [
+            (f["district"], f["risk_level"], f["created_at"], f["forecast_time"])
+            for f in self._recent_forecasts(created_since)
+        ]
+
+    async def latest_forecast_time(self) -> datetime | None:
+        return max((f["created_at"] for f in self._forecasts), default=None)
+
+    async def districts(self, tolerance=None) -> list:
+        rows = []
+        for district in self._districts:
+            boundary = district["boundary"]
+            min_lon, min_lat, max_lon, max_lat = boundary.bounds
+            rows.append(
+                {
+                    "name": district["name"],
+                    "boundary_geojson": geojson(boundary, tolerance, digits=6),
+                    "population": district["population"],
+                    "area_sq_km": district["area_sq_km"],
+                    "min_lon": min_lon,
+                    "min_lat": min_lat,
+                    "max_lon": max_lon,
+                    "max_lat": max_lat,
+                }
+            )
+        return rows
+
+    async def table_versions(self) -> dict:
+        return dict(self._versions)
+
+    async def rows_crossed_boundary(
+        self, table: str, column: str, start: datetime, end: datetime
+    ) -> bool:
+        if table == "rainfall_data" and column == "timestamp":
+            stamps = self._rainfall["timestamp"]
+            return bool(
+                ((stamps >= to_micros(start)) & (stamps < to_micros(end))).any()
+            )
+        if table == "flood_forecasts" and column in ("created_at", "forecast_time"):
+            return any(start <= f[column] < end for f in self._forecasts)
+        raise ValueError(f"No in-memory time column {table}.{column}")
+
+    async def render_tile(self, layer: str, z: int, x: int, y: int) -> bytes:
+        raise NotImplementedError("Vector tiles are rendered by PostGIS only")
+
+    # -- Writes (memory backend) -----------------------------------------
+
+    async def insert_water_levels(self, rows: list):
+        index = {status: i for i, status in enumerate(STATUSES)}
+        self.append_readings(
+            [row["station_id"] for row in rows],
+            [row["timestamp"] for row in rows],
+            [row["level"] for row in rows],
+            [index[row["status"]] for row in rows],
+        )
+        self._bump("water_levels")
+
+    async def insert_rainfall(self, rows: list) -> list:
+        ids = self.append_rainfall(rows)
+        self._bump("rainfall_data")
+        return ids
+
+    async def rollback(self):
+        pass
+
+
+def _geometry(value):
+    """Shapely geometry from GeoJSON, (E)WKT or a geometry"""
+    if not isinstance(value, str):
+        return value
+    if value.lstrip().startswith("{"):
+        return shapely.from_geojson(value)
+    return shapely.from_wkt(value.split(";", 1)[-1])
+
+
+class ReplicaRepository:
+    """Reads from the in-memory replica; writes, tiles and old history to PostGIS"""
+
+    PRIMARY_CALLS = (
+        "render_tile",
+        "insert_water_levels",
+        "insert_rainfall",
+        "rollback",
+    )
+
+    def __init__(self, replica: MemoryRepository, primary: PostgisRepository):
+        self.replica = replica
+        self.primary = primary
+
+    def __getattr__(self, name):
+        target = self.primary if name in self.PRIMARY_CALLS else self.replica
+        return getattr(target, name)
+
+    async def level_series(
+        self, station_id: int, start: datetime, end: datetime, hourly: bool
+    ):
+        horizon = self.replica.horizon
+        source = (
+            self.primary if horizon is not None and start < horizon else self.replica
+        )
+        return await source.level_series(station_id, start, end, hourly)
+
+
+# Process-wide tables of the memory backend, or the replica of PostGIS
+memory_repository = MemoryRepository(
+    REPLICA_HISTORY_DAYS if DATA_BACKEND == "replica" else None
+)
+
+
+@asynccontextmanager
+async def open_repository(backend: str = DATA_BACKEND):
+    """Repository of a backend for one unit of work"""
+    if backend == "memory":
+        yield memory_repository
+        return
+
+    # Imported on first use, so the memory backend needs no DATABASE_URL
+    from database import get_async_sessionmaker
+
+    async with get_async_sessionmaker()() as db:
+        primary = PostgisRepository(db)
+        if backend == "replica" and memory_repository.warmed:
+            yield ReplicaRepository(memory_repository, primary)
+        else:
+            yield primary
+
+
+async def get_repository():
+    """FastAPI dependency yielding the configured repository"""
+    async with open_repository() as repo:
+        yield repo
+
+
+async def refresh_replica():
+    """Hydrate the replica, or catch it up with PostGIS, in replica mode"""
+    if DATA_BACKEND != "replica":
+        return
+    async with open_repository("postgis") as primary:
+        if memory_repository.warmed:
+            await memory_repository.catch_up(primary)
+        else:
+            await memory_repository.load(primary)
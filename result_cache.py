@@ -0,0 +1,231 @@
+"""
+Cache of encoded read payloads, shared by identical concurrent requests.
+
+During a flood event most clients poll the same few endpoints. Routes look up
+the encoded body by endpoint and by the digest of the endpoint's ETag
+validator (conditional.py). That digest already covers the request
+parameters and the versions of the data the payload is read from, so a new
+reading or forecast run leads to a new key instead of a stale hit. In
+addition:
+
+- Entries expire after RESULT_CACHE_TTL_SECONDS. This bounds how far payloads
+  whose window moves with the clock, like the next 24 hours of forecasts,
+  lag behind.
+- Ingestion invalidates the tables it wrote. Each table has a generation
+  that is part of every key reading from it. Forecast runs may happen in
+  serve.py's jobs process, so they reach the workers through the
+  flood_forecasts version in table_versions, which the forecast and alerts
+  digests read on every request.
+- Concurrent misses of one key wait for a single build instead of each
+  running the query.
+- The in-process backend evicts the least recently used bodies beyond
+  RESULT_CACHE_MAX_BYTES.
+
+With RESULT_CACHE_URL set to a redis:// URL, bodies and generations live in
+Redis and are shared by every worker; Redis' own maxmemory policy bounds it.
+Misses are still coalesced per process. Only digests that every worker
+computes alike go there: those of payloads read from PostGIS, like
+forecasts. Payloads of a worker's in-memory stores (stations, alerts and
+recent rainfall) have digests tagged with the process, so their bodies stay
+in that worker's own LRU.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from conditional import EPOCH
+from fast_json import dumps
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds a body is served from the cache. 0 keeps nothing, but concurrent
+# misses are still coalesced.
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "5"))
+
+# Total size of the bodies held by the in-process backend
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", "67108864"))
+
+# redis:// URL of a cache shared by all workers; unset keeps it in process
+RESULT_CACHE_URL = os.environ.get("RESULT_CACHE_URL")
+
+# Namespace of the cache's keys in a shared Redis
+REDIS_PREFIX = "floodguard:results:"
+
+
+class LocalBackend:
+    """Bodies and generations in this process, evicted least recently used"""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # key -> (body, issued, expires), oldest use first
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    async def generations(self, tables) -> list:
+        return [self._generations.get(table, 0) for table in tables]
+
+    async def invalidate(self, tables):
+        for table in tables:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, issued, expires = entry
+        if expires <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return body, issued
+
+    async def set(self, key: str, body: bytes, issued: datetime, ttl: float):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (body, issued, time.monotonic() + ttl)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        body, _, _ = self._entries.pop(key)
+        self.size -= len(body)
+
+    async def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+class RedisBackend:
+    """Bodies and generations in Redis, shared by every worker"""
+
+    def __init__(self, url: str):
+        # Imported here: only a shared cache needs the client
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+
+    async def generations(self, tables) -> list:
+        values = await self.client.mget(
+            [f"{REDIS_PREFIX}generation:{table}" for table in tables]
+        )
+        return [int(value or 0) for value in values]
+
+    async def invalidate(self, tables):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for table in tables:
+                pipe.incr(f"{REDIS_PREFIX}generation:{table}")
+            await pipe.execute()
+
+    async def get(self, key: str):
+        value = await self.client.get(REDIS_PREFIX + key)
+        if value is None:
+            return None
+        # Stored as the issue time in microseconds, a newline, then the body
+        micros, body = value.split(b"\n", 1)
+        return body, EPOCH + timedelta(microseconds=int(micros))
+
+    async def set(self, key: str, body: bytes, issued: datetime, ttl: float):
+        micros = (issued - EPOCH) // timedelta(microseconds=1)
+        await self.client.set(
+            REDIS_PREFIX + key, b"%d\n" % micros + body, px=max(int(ttl * 1000), 1)
+        )
+
+    async def clear(self):
+        # Bodies only: generations keep counting, so no stale key comes back
+        keys = [
+            key
+            async for key in self.client.scan_iter(match=f"{REDIS_PREFIX}*")
+            if not key.startswith(f"{REDIS_PREFIX}generation:".encode())
+        ]
+        for start in range(0, len(keys), 1000):
+            await self.client.unlink(*keys[start : start + 1000])
+
+
+class ResultCache:
+    """Encoded payloads by endpoint and validator digest"""
+
+    def __init__(self, backend, ttl: float = RESULT_CACHE_TTL_SECONDS, local=None):
+        self.backend = backend
+        # Holds the bodies other workers could never hit
+        if local is None:
+            local = backend if isinstance(backend, LocalBackend) else LocalBackend()
+        self.local = local
+        self.ttl = ttl
+        self._flights = {}
+
+    async def get(
+        self, endpoint: str, digest: str, tables: tuple, build, shared: bool = True
+    ):
+        """The encoded body of `await build()`, and when its data was read
+
+        `shared` is False for digests only this process computes.
+        """
+        backend = self.backend if shared else self.local
+        try:
+            generations = await backend.generations(tables)
+            key = f"{endpoint}:{digest}:{'.'.join(map(str, generations))}"
+            entry = await backend.get(key) if self.ttl > 0 else None
+        except Exception as e:
+            # A shared cache that is down costs a query, not the request
+            logger.warning("Result cache lookup failed: %s", e)
+            key, entry = f"{endpoint}:{digest}:uncached", None
+        if entry is not None:
+            metrics.result_cache.inc((endpoint, "hit"))
+            return entry
+
+        flight = self._flights.get(key)
+        if flight is None:
+            metrics.result_cache.inc((endpoint, "miss"))
+            # A task, so a client that disconnects does not cancel the
+            # build the other requests are waiting for
+            flight = self._flights[key] = asyncio.ensure_future(
+                self._build(backend, key, build)
+            )
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            metrics.result_cache.inc((endpoint, "coalesced"))
+        return await asyncio.shield(flight)
+
+    async def _build(self, backend, key: str, build):
+        # Taken before the data is read, like the issue time of an ETag
+        issued = datetime.utcnow()
+        body = dumps(await build())
+        if self.ttl > 0:
+            try:
+                await backend.set(key, body, issued, self.ttl)
+            except Exception as e:
+                logger.warning("Result cache store failed: %s", e)
+        return body, issued
+
+    async def invalidate(self, *tables: str):
+        """Drop every entry read from these tables, in every worker sharing it"""
+        if self.local is not self.backend:
+            await self.local.invalidate(tables)
+        try:
+            await self.backend.invalidate(tables)
+        except Exception as e:
+            logger.warning("Result cache invalidation failed: %s", e)
+
+    async def clear(self):
+        """Drop every cached body, including the shared ones"""
+        await self.local.clear()
+        if self.backend is not self.local:
+            await self.backend.clear()
+
+
+def _backend():
+    if RESULT_CACHE_URL:
+        return RedisBackend(RESULT_CACHE_URL)
+    return LocalBackend()
+
+
+result_cache = ResultCache(_backend())
@@ -0,0 +1,120 @@
+"""
+Schema setup for FloodGuard: ORM tables plus database-side change tracking.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from models import Base
+from partitions import init_partitions
+
+# Tables whose writes bump their row in table_versions
+VERSIONED_TABLES = (
+    "monitoring_stations",
+    "water_levels",
+    "rainfall_data",
+    "flood_forecasts",
+    "districts",
+)
+
+# Geometry columns queried by bounding box; each needs a GiST index
+SPATIAL_COLUMNS = (
+    ("monitoring_stations", "location"),
+    ("rainfall_data", "location"),
+    ("flood_forecasts", "forecast_area"),
+    ("districts", "boundary"),
+)
+
+# B-tree indexes that tables created before they were needed may lack
+SECONDARY_INDEXES = (
+    # Per-station time range scans for history and latest-reading lookups
+    "CREATE INDEX IF NOT EXISTS idx_water_levels_station_time "
+    "ON water_levels (station_id, timestamp DESC)",
+    # Time window scans for rainfall totals
+    "CREATE INDEX IF NOT EXISTS idx_rainfall_data_time ON rainfall_data (timestamp)",
+)
+
+BUMP_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, clock_timestamp() AT TIME ZONE 'UTC')
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = table_versions.version + 1,
+        changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def install_version_triggers(connection):
+    """(Re)create the statement-level triggers that maintain table_versions"""
+    connection.execute(text(BUMP_VERSION_FUNCTION))
+    for table in VERSIONED_TABLES:
+        trigger = f"{table}_version_trigger"
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+        connection.execute(
+            text(
+                f"""
+                CREATE TRIGGER {trigger}
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+            """
+            )
+        )
+
+
+def _has_gist_index(connection, table: str, column: str) -> bool:
+    query = text(
+        """
+        SELECT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_class ix ON ix.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = ix.relam
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]
+            WHERE t.relname = :table
+            AND a.attname = :column
+            AND am.amname = 'gist'
+            AND i.indisvalid
+        )
+    """
+    )
+    return bool(connection.execute(query, {"table": table, "column": column}).scalar())
+
+
+def ensure_spatial_indexes(connection):
+    """Create any missing GiST index on the bbox-filtered geometry columns"""
+    for table, column in SPATIAL_COLUMNS:
+        if _has_gist_index(connection, table, column):
+            continue
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} "
+                f"ON {table} USING GIST ({column})"
+            )
+        )
+        # An index with the expected name but another access method would
+        # satisfy IF NOT EXISTS without helping bbox queries
+        if not _has_gist_index(connection, table, column):
+            raise RuntimeError(f"No usable GiST index on {table}.{column}")
+
+
+def init_schema(engine: Engine):
+    """Create missing tables, partitions, indexes and change tracking"""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        init_partitions(connection)
+        ensure_spatial_indexes(connection)
+        for statement in SECONDARY_INDEXES:
+            connection.execute(text(statement))
+        install_version_triggers(connection)
+
+
+if __name__ == "__main__":
+    from database import get_engine
+
+    init_schema(get_engine())
+    print("Schema is up to date")
@@ -1,350 +1,775 @@
 """
-Seed script to populate the database with Punjab flood monitoring data
+Synthetic data generator and seeder for the Punjab flood monitoring database.
+
+Creates the districts and monitoring stations, then generates water level and
+rainfall history for them. Storms are drawn over the period, mostly in the
+monsoon. Rain falls on each district gauge according to its distance from the
+storm centre. Each station's level is a seasonal baseline plus AR(1) noise
+plus a unit-hydrograph response to the rain over it, arriving later the
+further downstream the station is. Stations under the same storm therefore
+rise together, after the rain. Everything is drawn from one seed, so the same
+arguments (and --end) reproduce the same data.
+
+Readings are generated in chunks with NumPy and streamed into the database
+with binary COPY, or written to CSV or Parquet files (Parquet needs pyarrow).
+`seed_memory` fills the in-memory repository instead, for tests and
+benchmarks that run without a database.
+
+    python seed_data.py                                    # 12 stations, 2 days
+    python seed_data.py --stations 2000 --years 5 --seed 7
+    python seed_data.py --stations 2000 --years 5 --output parquet --out-dir seed
 """
 
+import argparse
+import io
 import os
-import random
+import struct
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+import numpy as np
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert
 
-from models import (
-    District,
-    FloodForecast,
-    MonitoringStation,
-    RainfallData,
-    WaterLevel,
-)
+from models import District, FloodForecast, MonitoringStation
+from partitions import PARTITIONED_TABLES, ensure_partitions
+from schema import init_schema
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Database connection
-DATABASE_URL = os.environ.get("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable not set")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def seed_districts():
-    """Seed Punjab districts with approximate boundaries"""
-    districts_data = [
-        # Major Punjab districts with approximate center coordinates and boundaries
-        ("Amritsar", 31.6340, 74.8723, 2490000, 5075.0),
-        ("Ludhiana", 30.9010, 75.8573, 3498000, 3767.0),
-        ("Jalandhar", 31.3260, 75.5762, 2193000, 2682.0),
-        ("Patiala", 30.3398, 76.3869, 1895000, 3212.0),
-        ("Bathinda", 30.2118, 74.9455, 1388000, 3385.0),
-        ("Mohali", 30.7046, 76.7179, 994000, 1001.0),
-        ("Firozpur", 30.9328, 74.6122, 1170000, 5305.0),
-        ("Hoshiarpur", 31.5344, 75.9119, 1586000, 3386.0),
-        ("Kapurthala", 31.3800, 75.3800, 815000, 1633.0),
-        ("Faridkot", 30.6735, 74.7555, 617000, 1469.0),
-        ("Muktsar", 30.4762, 74.5161, 901000, 2297.0),
-        ("Fatehgarh Sahib", 30.6466, 76.3969, 600000, 1180.0),
-        ("Pathankot", 32.2746, 75.6411, 649000, 929.0),
-        ("Rupnagar", 30.9631, 76.5270, 684000, 1569.0),
-        ("Sangrur", 30.2459, 75.8421, 1655000, 3635.0),
-        ("Tarn Taran", 31.4532, 74.9205, 1119000, 2414.0),
-        ("Gurdaspur", 32.0409, 75.4024, 2298000, 3564.0),
-        ("Fazilka", 30.4028, 74.0281, 1048000, 2463.0),
-        ("Barnala", 30.3804, 75.5504, 595000, 1423.0),
-        ("Mansa", 29.9988, 75.3933, 769000, 2174.0),
-        ("Nawanshahr", 31.1242, 76.1172, 612000, 1268.0),
-        ("Moga", 30.8028, 75.1667, 995000, 2235.0),
-    ]
-
-    db = SessionLocal()
-    try:
-        for name, lat, lon, population, area in districts_data:
-            # Create approximate rectangular boundary (simplified)
-            boundary_wkt = f"POLYGON(({lon-0.2} {lat-0.2}, {lon+0.2} {lat-0.2}, {lon+0.2} {lat+0.2}, {lon-0.2} {lat+0.2}, {lon-0.2} {lat-0.2}))"
-
-            district = District(
-                name=name,
-                boundary=text(f"ST_GeomFromText('{boundary_wkt}', 4326)"),
-                population=population,
-                area_sq_km=area,
+# Major Punjab districts: name, centre latitude and longitude, population, km²
+DISTRICTS = [
+    ("Amritsar", 31.6340, 74.8723, 2490000, 5075.0),
+    ("Ludhiana", 30.9010, 75.8573, 3498000, 3767.0),
+    ("Jalandhar", 31.3260, 75.5762, 2193000, 2682.0),
+    ("Patiala", 30.3398, 76.3869, 1895000, 3212.0),
+    ("Bathinda", 30.2118, 74.9455, 1388000, 3385.0),
+    ("Mohali", 30.7046, 76.7179, 994000, 1001.0),
+    ("Firozpur", 30.9328, 74.6122, 1170000, 5305.0),
+    ("Hoshiarpur", 31.5344, 75.9119, 1586000, 3386.0),
+    ("Kapurthala", 31.3800, 75.3800, 815000, 1633.0),
+    ("Faridkot", 30.6735, 74.7555, 617000, 1469.0),
+    ("Muktsar", 30.4762, 74.5161, 901000, 2297.0),
+    ("Fatehgarh Sahib", 30.6466, 76.3969, 600000, 1180.0),
+    ("Pathankot", 32.2746, 75.6411, 649000, 929.0),
+    ("Rupnagar", 30.9631, 76.5270, 684000, 1569.0),
+    ("Sangrur", 30.2459, 75.8421, 1655000, 3635.0),
+    ("Tarn Taran", 31.4532, 74.9205, 1119000, 2414.0),
+    ("Gurdaspur", 32.0409, 75.4024, 2298000, 3564.0),
+    ("Fazilka", 30.4028, 74.0281, 1048000, 2463.0),
+    ("Barnala", 30.3804, 75.5504, 595000, 1423.0),
+    ("Mansa", 29.9988, 75.3933, 769000, 2174.0),
+    ("Nawanshahr", 31.1242, 76.1172, 612000, 1268.0),
+    ("Moga", 30.8028, 75.1667, 995000, 2235.0),
+]
+
+# Gauging stations on the major rivers: name, river, latitude, longitude,
+# district, normal, warning and danger levels in meters
+STATIONS = [
+    ("Sutlej at Harike", "Sutlej", 31.1656, 74.9619, "Firozpur", 248.0, 252.0, 255.0),
+    ("Sutlej at Ganguwal", "Sutlej", 31.05, 75.2, "Ludhiana", 245.0, 249.0, 252.0),
+    ("Sutlej at Ludhiana", "Sutlej", 30.901, 75.8573, "Ludhiana", 242.0, 246.0, 249.0),
+    ("Beas at Talagang", "Beas", 31.9167, 76.0167, "Hoshiarpur", 280.0, 284.0, 287.0),
+    ("Beas at Sujanpur", "Beas", 31.8333, 76.5, "Hoshiarpur", 275.0, 279.0, 282.0),
+    ("Beas at Mirthal", "Beas", 31.4167, 75.3333, "Kapurthala", 230.0, 234.0, 237.0),
+    ("Ravi at Madhopur", "Ravi", 32.05, 75.5667, "Pathankot", 290.0, 294.0, 297.0),
+    ("Ravi at Basantar", "Ravi", 32.2, 75.4, "Pathankot", 295.0, 299.0, 302.0),
+    ("Ghaggar at Ottu", "Ghaggar", 30.25, 76.4, "Patiala", 210.0, 214.0, 217.0),
+    ("Ghaggar at Sirsa", "Ghaggar", 29.5333, 75.0167, "Bathinda", 205.0, 209.0, 212.0),
+    ("Choe at Kharar", "Choe", 30.7418, 76.6469, "Mohali", 300.0, 304.0, 307.0),
+    ("Swan at Bajakhana", "Swan", 30.8, 75.3, "Hoshiarpur", 250.0, 254.0, 257.0),
+]
+
+RIVERS = ("Sutlej", "Beas", "Ravi", "Ghaggar", "Choe", "Swan")
+
+# Sample forecasts so the forecast layer is not empty before the first run
+SAMPLE_FORECASTS = [
+    ("Firozpur", 30.9328, 74.6122, "high"),
+    ("Ludhiana", 30.9010, 75.8573, "medium"),
+    ("Kapurthala", 31.3800, 75.3800, "high"),
+]
+
+# Area synthetic districts, stations and storms are placed in (lon, lat)
+BOUNDS = ((73.9, 29.6), (76.9, 32.4))
+
+# Rivers drain from the north-east; flood waves reach a station later the
+# further it is from there
+HEADWATERS = (76.8, 32.5)
+MAX_LAG_HOURS = 30.0
+
+# Level rise per mm of storm rain over a station's catchment
+RISE_PER_MM = 0.04
+
+# Multiples of the time to peak after which a storm's response is cut off
+RESPONSE_TAIL = 12.0
+
+# Hours from the end of a storm's rain to the peak of the local response
+CATCHMENT_HOURS = 6.0
+
+# Level noise: standard deviation (m) and correlation time (hours)
+NOISE_M = 0.05
+NOISE_HOURS = 6.0
+
+# Readings per noise block; each block's noise is drawn from its own seeded
+# generator so the series does not depend on the chunk size
+NOISE_BLOCK = 256
+
+STATUSES = ("normal", "warning", "danger")
+
+# Binary COPY framing and the epoch of PostgreSQL binary timestamps
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+PG_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+
+
+def day_of_year(timestamps) -> np.ndarray:
+    stamps = np.asarray(timestamps, dtype="datetime64[us]")
+    days = stamps.astype("datetime64[D]") - stamps.astype("datetime64[Y]")
+    return days.astype(np.int64) + 1
+
+
+def monsoon(timestamps) -> np.ndarray:
+    """Seasonal wetness between 0 and 1, peaking in mid-August"""
+    return np.exp(-(((day_of_year(timestamps) - 225) / 35.0) ** 2))
+
+
+def classify_levels(levels, warning_levels, danger_levels) -> np.ndarray:
+    """Index into STATUSES of each level, as ingest.classify_level"""
+    return (levels >= warning_levels).astype(np.int8) + (levels >= danger_levels)
+
+
+def make_districts(count: int, rng) -> list:
+    """The real districts, then synthetic ones scattered over Punjab"""
+    districts = DISTRICTS[:count]
+    (west, south), (east, north) = BOUNDS
+    for i in range(len(districts), count):
+        districts.append(
+            (
+                f"District {i + 1}",
+                round(rng.uniform(south, north), 4),
+                round(rng.uniform(west, east), 4),
+                int(rng.integers(300_000, 2_000_000)),
+                round(rng.uniform(800.0, 4000.0), 1),
+            )
+        )
+    return districts
+
+
+def make_stations(count: int, districts: list, rng) -> list:
+    """The real stations in the chosen districts, then synthetic ones"""
+    names = {district[0] for district in districts}
+    stations = [station for station in STATIONS if station[4] in names][:count]
+    for i in range(len(stations), count):
+        district, latitude, longitude = districts[rng.integers(len(districts))][:3]
+        river = RIVERS[i % len(RIVERS)]
+        normal = round(rng.uniform(200.0, 300.0), 1)
+        stations.append(
+            (
+                f"{river} at {district} {i + 1}",
+                river,
+                round(latitude + rng.uniform(-0.15, 0.15), 4),
+                round(longitude + rng.uniform(-0.15, 0.15), 4),
+                district,
+                normal,
+                normal + 4.0,
+                normal + 7.0,
+            )
+        )
+    return stations
+
+
+@dataclass
+class Storms:
+    """Storm events, timed in hours from the start of the seeded period"""
+
+    start: np.ndarray
+    duration: np.ndarray
+    intensity: np.ndarray  # Peak rain rate at the centre, mm/h
+    longitude: np.ndarray
+    latitude: np.ndarray
+    radius: np.ndarray  # Degrees
+
+    def weights(self, longitude, latitude) -> np.ndarray:
+        """(points, storms) share of each storm's rain falling at each point"""
+        distance2 = (np.asarray(longitude)[:, None] - self.longitude) ** 2 + (
+            np.asarray(latitude)[:, None] - self.latitude
+        ) ** 2
+        return np.exp(-distance2 / (2 * self.radius**2))
+
+    @property
+    def depth(self) -> np.ndarray:
+        """Total rain at the centre in mm (triangular rate over the duration)"""
+        return self.intensity * self.duration / 2
+
+
+def make_storms(count: int, start: datetime, hours: float, rng) -> Storms:
+    """Storms weighted towards the monsoon, including some just before start"""
+    # Rejection-sample start times against the seasonal wetness
+    candidates = rng.uniform(-72.0, hours, 20 * count + 100)
+    stamps = np.datetime64(start, "us") + (candidates * 3.6e9).astype("timedelta64[us]")
+    wet = rng.uniform(size=len(candidates)) < 0.15 + 0.85 * monsoon(stamps)
+    starts = np.r_[candidates[wet], candidates[~wet]][:count]
+
+    (west, south), (east, north) = BOUNDS
+    return Storms(
+        start=starts,
+        duration=rng.uniform(6.0, 48.0, count),
+        intensity=rng.gamma(2.0, 4.0, count),
+        longitude=rng.uniform(west, east, count),
+        latitude=rng.uniform(south, north, count),
+        radius=rng.uniform(0.2, 0.8, count),
+    )
+
+
+class HydrographGenerator:
+    """Correlated water level and rainfall series for a set of stations"""
+
+    def __init__(
+        self,
+        stations: list,
+        districts: list,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+        storms: Storms,
+        seed: int,
+    ):
+        self.stations = stations
+        self.districts = districts
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self.storms = storms
+        self.seed = seed
+        self.steps = int((end - start) / interval)
+
+        _, _, latitude, longitude, _, normal, warning, danger = zip(*stations)
+        self.normal_level = np.array(normal)
+        self.warning_level = np.array(warning)
+        self.danger_level = np.array(danger)
+        distance = np.hypot(
+            np.array(longitude) - HEADWATERS[0], np.array(latitude) - HEADWATERS[1]
+        )
+        self.lag = MAX_LAG_HOURS * distance / max(distance.max(), 1e-9)
+        # Metres of rise from each storm at each station, and when it peaks
+        self.rise = RISE_PER_MM * storms.depth * storms.weights(longitude, latitude)
+        self.peak = storms.duration / 2 + CATCHMENT_HOURS
+
+    @property
+    def rows(self) -> int:
+        return self.steps * len(self.stations)
+
+    def _noise(self, first_block: int, blocks: int, state: np.ndarray):
+        """AR(1) level noise for whole blocks of readings, and the final state"""
+        phi = np.exp(-self.interval / timedelta(hours=NOISE_HOURS))
+        powers = phi ** np.arange(1, NOISE_BLOCK + 1)[:, None]
+        noise = []
+        for block in range(first_block, first_block + blocks):
+            rng = np.random.default_rng([self.seed, block])
+            shocks = rng.normal(
+                0.0, NOISE_M * np.sqrt(1 - phi**2), (NOISE_BLOCK, len(self.stations))
+            )
+            # x[t] = phi^(t+1) * (x[-1] + sum of phi^-(i+1) * e[i] up to t)
+            values = powers * (state + np.cumsum(shocks / powers, axis=0))
+            state = values[-1]
+            noise.append(values)
+        return np.concatenate(noise), state
+
+    def _storm_response(self, hours: np.ndarray) -> np.ndarray:
+        """(readings, stations) rise from the storms active over the hours"""
+        response = np.zeros((len(hours), len(self.stations)))
+        storms = self.storms
+        active = np.flatnonzero(
+            (storms.start + self.lag.min() < hours[-1])
+            & (storms.start + self.lag.max() + RESPONSE_TAIL * self.peak > hours[0])
+        )
+        for s in active:
+            # Gamma-shaped unit hydrograph scaled to peak at the storm's rise
+            ratio = (hours[:, None] - storms.start[s] - self.lag) / self.peak[s]
+            ratio = np.where(ratio < RESPONSE_TAIL, np.clip(ratio, 0.0, None), 0.0)
+            response += self.rise[:, s] * ratio**2 * np.exp(2 * (1 - ratio))
+        return response
+
+    def water_levels(self, station_ids, chunk_rows: int = 1_000_000):
+        """Yield (station_ids, timestamps, levels, statuses) chunks of readings"""
+        station_ids = np.asarray(station_ids, dtype=np.int32)
+        size = len(self.stations)
+        blocks = max(1, chunk_rows // (size * NOISE_BLOCK))
+        step_hours = self.interval / timedelta(hours=1)
+        start = np.datetime64(self.start, "us")
+        interval = np.timedelta64(self.interval, "us")
+        state = np.zeros(size)
+
+        for block in range(0, -(-self.steps // NOISE_BLOCK), blocks):
+            noise, state = self._noise(block, blocks, state)
+            steps = np.arange(
+                block * NOISE_BLOCK,
+                min((block + blocks) * NOISE_BLOCK, self.steps),
+            )
+            noise = noise[: len(steps)]
+            timestamps = start + steps * interval
+            levels = (
+                self.normal_level
+                - 1.0
+                + 1.2 * monsoon(timestamps)[:, None]
+                + noise
+                + self._storm_response(steps * step_hours)
+            ).round(3)
+            statuses = classify_levels(levels, self.warning_level, self.danger_level)
+            yield (
+                np.tile(station_ids, len(steps)),
+                np.repeat(timestamps, size),
+                levels.ravel(),
+                statuses.ravel(),
             )
-            db.add(district)
 
-        db.commit()
-        print(f"Seeded {len(districts_data)} districts")
-    except Exception as e:
-        print(f"Error seeding districts: {e}")
-        db.rollback()
-    finally:
-        db.close()
-
-
-def seed_monitoring_stations():
-    """Seed monitoring stations on major rivers"""
-    stations_data = [
-        # Sutlej River stations
-        (
-            "Sutlej at Harike",
-            "Sutlej",
-            31.1656,
-            74.9619,
-            "Firozpur",
-            248.0,
-            252.0,
-            255.0,
-        ),
-        (
-            "Sutlej at Ganguwal",
-            "Sutlej",
-            31.0500,
-            75.2000,
-            "Ludhiana",
-            245.0,
-            249.0,
-            252.0,
-        ),
-        (
-            "Sutlej at Ludhiana",
-            "Sutlej",
-            30.9010,
-            75.8573,
-            "Ludhiana",
-            242.0,
-            246.0,
-            249.0,
-        ),
-        # Beas River stations
-        (
-            "Beas at Talagang",
-            "Beas",
-            31.9167,
-            76.0167,
-            "Hoshiarpur",
-            280.0,
-            284.0,
-            287.0,
-        ),
-        (
-            "Beas at Sujanpur",
-            "Beas",
-            31.8333,
-            76.5000,
-            "Hoshiarpur",
-            275.0,
-            279.0,
-            282.0,
-        ),
-        (
-            "Beas at Mirthal",
-            "Beas",
-            31.4167,
-            75.3333,
-            "Kapurthala",
-            230.0,
-            234.0,
-            237.0,
-        ),
-        # Ravi River stations
-        (
-            "Ravi at Madhopur",
-            "Ravi",
-            32.0500,
-            75.5667,
-            "Pathankot",
-            290.0,
-            294.0,
-            297.0,
-        ),
-        (
-            "Ravi at Basantar",
-            "Ravi",
-            32.2000,
-            75.4000,
-            "Pathankot",
-            295.0,
-            299.0,
-            302.0,
-        ),
-        # Ghaggar River stations
-        (
-            "Ghaggar at Ottu",
-            "Ghaggar",
-            30.2500,
-            76.4000,
-            "Patiala",
-            210.0,
-            214.0,
-            217.0,
-        ),
-        (
-            "Ghaggar at Sirsa",
-            "Ghaggar",
-            29.5333,
-            75.0167,
-            "Bathinda",
-            205.0,
-            209.0,
-            212.0,
-        ),
-        # Additional stations
-        ("Choe at Kharar", "Choe", 30.7418, 76.6469, "Mohali", 300.0, 304.0, 307.0),
-        (
-            "Swan at Bajakhana",
-            "Swan",
-            30.8000,
-            75.3000,
-            "Hoshiarpur",
-            250.0,
-            254.0,
-            257.0,
-        ),
-    ]
-
-    db = SessionLocal()
+    def rainfall(self):
+        """(district indexes, hour timestamps, mm) of hourly gauge readings"""
+        storms = self.storms
+        _, latitude, longitude, _, _ = zip(*self.districts)
+        weights = storms.weights(longitude, latitude)
+        hours_total = (self.end - self.start) / timedelta(hours=1)
+
+        gauges, hours, amounts = [], [], []
+        for s in range(len(storms.start)):
+            hours_s = np.arange(
+                np.floor(storms.start[s]), np.ceil(storms.start[s] + storms.duration[s])
+            )
+            # Triangular rain rate over the storm, sampled at each hour's middle
+            position = (hours_s + 0.5 - storms.start[s]) / storms.duration[s]
+            rate = storms.intensity[s] * np.clip(1 - np.abs(2 * position - 1), 0, 1)
+            mm = rate[:, None] * weights[:, s]
+            hour, gauge = np.nonzero(
+                (mm >= 0.1) & ((hours_s >= 0) & (hours_s < hours_total))[:, None]
+            )
+            gauges.append(gauge)
+            hours.append(hours_s[hour].astype(np.int64))
+            amounts.append(mm[hour, gauge])
+        if not gauges:
+            return np.zeros(0, np.intp), np.zeros(0, "datetime64[us]"), np.zeros(0)
+
+        # Overlapping storms add up within the same gauge-hour
+        keys = np.concatenate(hours) * len(self.districts) + np.concatenate(gauges)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        amounts = np.bincount(inverse, weights=np.concatenate(amounts))
+        hour, gauge = np.divmod(keys, len(self.districts))
+        first_hour = np.datetime64(self.start, "h").astype("datetime64[us]")
+        timestamps = first_hour + hour * np.timedelta64(1, "h")
+        return gauge, timestamps, amounts.round(2)
+
+
+def binary_copy(station_ids, timestamps, levels, statuses) -> bytes:
+    """water_levels rows in PostgreSQL binary COPY format"""
+    parts = [COPY_HEADER]
+    for index, status in enumerate(STATUSES):
+        selected = statuses == index
+        encoded = status.encode()
+        rows = np.empty(
+            int(selected.sum()),
+            np.dtype(
+                [
+                    ("fields", ">i2"),
+                    ("id_size", ">i4"),
+                    ("station_id", ">i4"),
+                    ("level_size", ">i4"),
+                    ("level", ">f8"),
+                    ("time_size", ">i4"),
+                    ("timestamp", ">i8"),
+                    ("status_size", ">i4"),
+                    ("status", f"S{len(encoded)}"),
+                ]
+            ),
+        )
+        rows["fields"] = 4
+        rows["id_size"] = 4
+        rows["station_id"] = station_ids[selected]
+        rows["level_size"] = 8
+        rows["level"] = levels[selected]
+        rows["time_size"] = 8
+        rows["timestamp"] = (timestamps[selected] - PG_EPOCH).astype(np.int64)
+        rows["status_size"] = len(encoded)
+        rows["status"] = encoded
+        parts.append(rows.tobytes())
+    parts.append(COPY_TRAILER)
+    return b"".join(parts)
+
+
+def point(longitude, latitude) -> str:
+    return f"SRID=4326;POINT({longitude} {latitude})"
+
+
+def square(longitude, latitude, half) -> str:
+    corners = [(-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1)]
+    ring = ", ".join(
+        f"{longitude + dx * half} {latitude + dy * half}" for dx, dy in corners
+    )
+    return f"SRID=4326;POLYGON(({ring}))"
+
+
+def rainfall_records(generator: HydrographGenerator):
+    gauge, timestamps, amounts = generator.rainfall()
+    districts = generator.districts
+    return {
+        "district": [districts[g][0] for g in gauge.tolist()],
+        "longitude": [districts[g][2] for g in gauge.tolist()],
+        "latitude": [districts[g][1] for g in gauge.tolist()],
+        "rainfall_mm": amounts,
+        "duration_hours": np.ones(len(amounts), dtype=np.int32),
+        "timestamp": timestamps,
+    }
+
+
+def seed_database(engine, generator: HydrographGenerator, chunk_rows: int) -> int:
+    """Create the schema and COPY every generated row; returns readings written"""
+    init_schema(engine)
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            ensure_partitions(connection, table, generator.start, generator.end)
+        connection.execute(
+            insert(District.__table__).on_conflict_do_nothing(index_elements=["name"]),
+            [
+                {
+                    "name": name,
+                    "boundary": square(longitude, latitude, 0.2),
+                    "population": population,
+                    "area_sq_km": area,
+                }
+                for name, latitude, longitude, population, area in generator.districts
+            ],
+        )
+        table = MonitoringStation.__table__
+        station_ids = (
+            connection.execute(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": name,
+                        "river_name": river,
+                        "location": point(longitude, latitude),
+                        "district": district,
+                        "normal_level": normal,
+                        "warning_level": warning,
+                        "danger_level": danger,
+                        "is_active": True,
+                    }
+                    for (
+                        name,
+                        river,
+                        latitude,
+                        longitude,
+                        district,
+                        normal,
+                        warning,
+                        danger,
+                    ) in generator.stations
+                ],
+            )
+            .scalars()
+            .all()
+        )
+        connection.execute(
+            FloodForecast.__table__.insert(),
+            [
+                {
+                    "forecast_area": square(longitude, latitude, 0.1),
+                    "district": district,
+                    "risk_level": risk,
+                    "forecast_time": generator.end + timedelta(hours=24),
+                    "created_at": generator.end,
+                    "confidence": 0.8,
+                    "affected_population": 10000,
+                }
+                for district, latitude, longitude, risk in SAMPLE_FORECASTS
+            ],
+        )
+    print(f"Seeded {len(generator.districts)} districts, {len(station_ids)} stations")
+
+    written = 0
+    started = time.perf_counter()
+    raw = engine.raw_connection()
     try:
-        for name, river, lat, lon, district, normal, warning, danger in stations_data:
-            station = MonitoringStation(
-                name=name,
-                river_name=river,
-                location=text(f"ST_Point({lon}, {lat})"),
-                district=district,
-                normal_level=normal,
-                warning_level=warning,
-                danger_level=danger,
-                is_active=True,
+        cursor = raw.cursor()
+        for chunk in generator.water_levels(station_ids, chunk_rows):
+            cursor.copy_expert(
+                "COPY water_levels (station_id, level, timestamp, status) "
+                "FROM STDIN WITH (FORMAT binary)",
+                io.BytesIO(binary_copy(*chunk)),
             )
-            db.add(station)
-
-        db.commit()
-        print(f"Seeded {len(stations_data)} monitoring stations")
-    except Exception as e:
-        print(f"Error seeding stations: {e}")
-        db.rollback()
+            raw.commit()
+            written += len(chunk[0])
+            rate = written / (time.perf_counter() - started)
+            print(f"  {written:,} / {generator.rows:,} readings ({rate:,.0f}/s)")
+
+        rainfall = rainfall_records(generator)
+        buffer = io.StringIO()
+        for row in zip(
+            rainfall["district"],
+            rainfall["longitude"],
+            rainfall["latitude"],
+            rainfall["rainfall_mm"].tolist(),
+            np.datetime_as_string(rainfall["timestamp"], unit="s").tolist(),
+        ):
+            district, longitude, latitude, mm, stamp = row
+            buffer.write(f"{district},{point(longitude, latitude)},{mm},1,{stamp}\n")
+        buffer.seek(0)
+        cursor.copy_expert(
+            "COPY rainfall_data (district, location, rainfall_mm, duration_hours, "
+            "timestamp) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        raw.commit()
+        print(f"Seeded {len(rainfall['district']):,} rainfall readings")
     finally:
-        db.close()
-
-
-def seed_sample_data():
-    """Seed sample water level and rainfall data"""
-    db = SessionLocal()
-    try:
-        # Get all stations
-        stations = db.query(MonitoringStation).all()
-
-        # Generate sample water level data for last 48 hours
-        for station in stations:
-            base_time = datetime.utcnow() - timedelta(hours=48)
-
-            for hour in range(48):
-                timestamp = base_time + timedelta(hours=hour)
-
-                # Generate realistic water levels with some variation
-                base_level = station.normal_level
-                variation = random.uniform(
-                    -2.0, 4.0
-                )  # Some stations may be above normal
-                level = base_level + variation
-
-                # Determine status
-                if level >= station.danger_level:
-                    status = "danger"
-                elif level >= station.warning_level:
-                    status = "warning"
-                else:
-                    status = "normal"
-
-                water_level = WaterLevel(
-                    station_id=station.id,
-                    level=level,
-                    timestamp=timestamp,
-                    status=status,
-                )
-                db.add(water_level)
-
-        # Generate sample rainfall data
-        districts = [
-            "Amritsar",
-            "Ludhiana",
-            "Jalandhar",
-            "Patiala",
-            "Bathinda",
-            "Mohali",
-            "Firozpur",
-            "Hoshiarpur",
-            "Kapurthala",
-            "Faridkot",
-        ]
-
-        for district in districts:
-            # Get district center (simplified)
-            district_coords = {
-                "Amritsar": (31.6340, 74.8723),
-                "Ludhiana": (30.9010, 75.8573),
-                "Jalandhar": (31.3260, 75.5762),
-                "Patiala": (30.3398, 76.3869),
-                "Bathinda": (30.2118, 74.9455),
-                "Mohali": (30.7046, 76.7179),
-                "Firozpur": (30.9328, 74.6122),
-                "Hoshiarpur": (31.5344, 75.9119),
-                "Kapurthala": (31.3800, 75.3800),
-                "Faridkot": (30.6735, 74.7555),
+        raw.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as c:
+        c.execute(text("ANALYZE"))
+    return written
+
+
+def seed_memory(repo, generator: HydrographGenerator, chunk_rows: int) -> int:
+    """Fill a repository.MemoryRepository; returns readings written"""
+    repo.add_districts(
+        {
+            "name": name,
+            "boundary": square(longitude, latitude, 0.2),
+            "population": population,
+            "area_sq_km": area,
+        }
+        for name, latitude, longitude, population, area in generator.districts
+    )
+    station_ids = repo.add_stations(
+        {
+            "name": name,
+            "river_name": river,
+            "district": district,
+            "longitude": longitude,
+            "latitude": latitude,
+            "normal_level": normal,
+            "warning_level": warning,
+            "danger_level": danger,
+        }
+        for (
+            name,
+            river,
+            latitude,
+            longitude,
+            district,
+            normal,
+            warning,
+            danger,
+        ) in generator.stations
+    )
+    repo.add_forecasts(
+        {
+            "forecast_area": square(longitude, latitude, 0.1),
+            "district": district,
+            "risk_level": risk,
+            "forecast_time": generator.end + timedelta(hours=24),
+            "created_at": generator.end,
+            "confidence": 0.8,
+            "affected_population": 10000,
+        }
+        for district, latitude, longitude, risk in SAMPLE_FORECASTS
+    )
+
+    written = 0
+    for ids, timestamps, levels, status in generator.water_levels(
+        station_ids, chunk_rows
+    ):
+        repo.append_readings(ids, timestamps, levels, status)
+        written += len(ids)
+    repo.merge()
+
+    rainfall = rainfall_records(generator)
+    repo.append_rainfall(
+        [
+            {
+                "district": district,
+                "longitude": longitude,
+                "latitude": latitude,
+                "rainfall_mm": amount,
+                "timestamp": timestamp,
             }
-
-            if district in district_coords:
-                lat, lon = district_coords[district]
-
-                # Generate rainfall data for last 24 hours
-                base_time = datetime.utcnow() - timedelta(hours=24)
-                for hour in range(0, 24, 6):  # Every 6 hours
-                    timestamp = base_time + timedelta(hours=hour)
-                    rainfall = random.uniform(0, 15.0)  # 0-15mm rainfall
-
-                    rainfall_data = RainfallData(
-                        district=district,
-                        location=text(f"ST_Point({lon}, {lat})"),
-                        rainfall_mm=rainfall,
-                        duration_hours=6,
-                        timestamp=timestamp,
-                    )
-                    db.add(rainfall_data)
-
-        # Generate sample flood forecasts
-        high_risk_areas = [
-            ("Firozpur", 30.9328, 74.6122, "high"),
-            ("Ludhiana", 30.9010, 75.8573, "medium"),
-            ("Kapurthala", 31.3800, 75.3800, "high"),
+            for district, longitude, latitude, amount, timestamp in zip(
+                rainfall["district"],
+                rainfall["longitude"],
+                rainfall["latitude"],
+                rainfall["rainfall_mm"].tolist(),
+                rainfall["timestamp"].tolist(),
+            )
         ]
-
-        forecast_time = datetime.utcnow() + timedelta(hours=24)
-
-        for district, lat, lon, risk in high_risk_areas:
-            # Create a sample flood area polygon
-            polygon_wkt = f"POLYGON(({lon-0.1} {lat-0.1}, {lon+0.1} {lat-0.1}, {lon+0.1} {lat+0.1}, {lon-0.1} {lat+0.1}, {lon-0.1} {lat-0.1}))"
-
-            forecast = FloodForecast(
-                forecast_area=text(f"ST_GeomFromText('{polygon_wkt}', 4326)"),
-                district=district,
-                risk_level=risk,
-                forecast_time=forecast_time,
-                confidence=random.uniform(0.7, 0.95),
-                affected_population=random.randint(1000, 50000),
+    )
+    repo.warmed = True
+    return written
+
+
+class FileWriter:
+    """Appends column chunks to one CSV or Parquet file per table"""
+
+    def __init__(self, directory: str, output: str):
+        self.directory = directory
+        self.output = output
+        self._parquet = {}
+        self._started = set()
+        os.makedirs(directory, exist_ok=True)
+        if output == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit('Parquet output needs pyarrow: pip install ".[seed]"')
+
+    def write(self, table: str, columns: dict):
+        path = os.path.join(self.directory, f"{table}.{self.output}")
+        if self.output == "csv":
+            import pandas as pd
+
+            first = table not in self._started
+            self._started.add(table)
+            pd.DataFrame(columns).to_csv(
+                path,
+                mode="w" if first else "a",
+                header=first,
+                index=False,
             )
-            db.add(forecast)
-
-        db.commit()
-        print("Seeded sample water level, rainfall, and forecast data")
-
-    except Exception as e:
-        print(f"Error seeding sample data: {e}")
-        db.rollback()
-    finally:
-        db.close()
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        batch = pa.table(columns)
+        if table not in self._parquet:
+            self._parquet[table] = pq.ParquetWriter(path, batch.schema)
+        self._parquet[table].write_table(batch)
+
+    def close(self):
+        for writer in self._parquet.values():
+            writer.close()
+
+
+def write_files(
+    writer: FileWriter, generator: HydrographGenerator, chunk_rows: int
+) -> int:
+    """Write districts, stations, readings and rainfall; returns readings written"""
+    names, latitudes, longitudes, populations, areas = zip(*generator.districts)
+    writer.write(
+        "districts",
+        {
+            "name": list(names),
+            "latitude": list(latitudes),
+            "longitude": list(longitudes),
+            "population": list(populations),
+            "area_sq_km": list(areas),
+        },
+    )
+    columns = [list(column) for column in zip(*generator.stations)]
+    station_ids = np.arange(1, len(generator.stations) + 1, dtype=np.int32)
+    writer.write(
+        "monitoring_stations",
+        {
+            "id": station_ids,
+            **dict(
+                zip(
+                    (
+                        "name",
+                        "river_name",
+                        "latitude",
+                        "longitude",
+                        "district",
+                        "normal_level",
+                        "warning_level",
+                        "danger_level",
+                    ),
+                    columns,
+                )
+            ),
+        },
+    )
+
+    written = 0
+    started = time.perf_counter()
+    statuses = np.array(STATUSES)
+    for ids, timestamps, levels, status in generator.water_levels(
+        station_ids, chunk_rows
+    ):
+        writer.write(
+            "water_levels",
+            {
+                "station_id": ids,
+                "timestamp": timestamps,
+                "level": levels,
+                "status": statuses[status],
+            },
+        )
+        written += len(ids)
+        rate = written / (time.perf_counter() - started)
+        print(f"  {written:,} / {generator.rows:,} readings ({rate:,.0f}/s)")
+    writer.write("rainfall_data", rainfall_records(generator))
+    writer.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stations", type=int, default=12)
+    parser.add_argument("--districts", type=int, default=len(DISTRICTS))
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument("--days", type=float, default=2.0)
+    period.add_argument("--years", type=float)
+    parser.add_argument(
+        "--interval", type=float, default=15.0, help="minutes between readings"
+    )
+    parser.add_argument(
+        "--storms", type=float, default=12.0, help="storm events per year"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        help="end of the period (naive UTC); defaults to now",
+    )
+    parser.add_argument(
+        "--output", choices=("database", "csv", "parquet"), default="database"
+    )
+    parser.add_argument("--out-dir", default="seed")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    days = args.years * 365.25 if args.years is not None else args.days
+    interval = timedelta(minutes=args.interval)
+    end = args.end or datetime.utcnow()
+    end = datetime.min + (end - datetime.min) // interval * interval
+    start = end - timedelta(days=days)
+
+    rng = np.random.default_rng(args.seed)
+    districts = make_districts(args.districts, rng)
+    stations = make_stations(args.stations, districts, rng)
+    storms = make_storms(
+        max(1, round(args.storms * days / 365.25)), start, days * 24, rng
+    )
+    generator = HydrographGenerator(
+        stations, districts, start, end, interval, storms, args.seed
+    )
+    print(
+        f"Generating {generator.rows:,} readings for {len(stations)} stations "
+        f"from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} "
+        f"with {len(storms.start)} storms"
+    )
+
+    started = time.perf_counter()
+    if args.output == "database":
+        database_url = os.environ.get("DATABASE_URL")
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable not set")
+        written = seed_database(create_engine(database_url), generator, args.chunk_rows)
+    else:
+        writer = FileWriter(args.out_dir, args.output)
+        written = write_files(writer, generator, args.chunk_rows)
+    print(f"Seeded {written:,} readings in {time.perf_counter() - started:.1f}s")
 
 
 if __name__ == "__main__":
-    print("Starting database seeding...")
-    seed_districts()
-    seed_monitoring_stations()
-    seed_sample_data()
-    print("Database seeding completed!")
+    main()
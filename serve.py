@@ -0,0 +1,104 @@
+"""
+Production server for FloodGuard: schema step, then several uvicorn workers.
+
+The schema is brought up to date once, before any worker starts. Each worker
+builds the app with main.create_app and warms its in-memory state in the
+lifespan startup before it accepts connections, so no request lands on a cold
+worker. Forecast runs and storage maintenance run once in a separate jobs
+process instead of once per worker. Workers see a new forecast run through
+the flood_forecasts version in table_versions, not through the jobs process's
+memory.
+
+    python serve.py --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+
+import uvicorn
+
+from repository import DATA_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Worker processes; the usual variable read by uvicorn and gunicorn
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def migrate():
+    """Create missing tables, partitions, indexes and change tracking"""
+    from database import get_engine
+    from schema import init_schema
+
+    engine = get_engine()
+    init_schema(engine)
+    # Workers open their own connections
+    engine.dispose()
+
+
+async def _run_jobs():
+    from main import background_jobs
+
+    await asyncio.gather(*background_jobs())
+
+
+def run_jobs():
+    """Entry point of the jobs process"""
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_run_jobs())
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(host: str, port: int, workers: int, jobs: bool = True):
+    """Serve the API until interrupted"""
+    if not jobs:
+        os.environ["BACKGROUND_JOBS"] = "false"
+    if workers <= 1:
+        # One process: the app's lifespan schedules the jobs itself
+        uvicorn.run("main:create_app", factory=True, host=host, port=port)
+        return
+
+    jobs_process = None
+    if jobs and DATA_BACKEND != "memory":
+        # Not a daemon: forecast ensembles start processes of their own
+        jobs_process = multiprocessing.get_context("spawn").Process(
+            target=run_jobs, name="floodguard-jobs"
+        )
+        jobs_process.start()
+    # Inherited by the spawned workers
+    os.environ["BACKGROUND_JOBS"] = "false"
+    try:
+        uvicorn.run(
+            "main:create_app", factory=True, host=host, port=port, workers=workers
+        )
+    finally:
+        if jobs_process is not None:
+            jobs_process.terminate()
+            jobs_process.join(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument(
+        "--skip-migrate", action="store_true", help="do not touch the schema"
+    )
+    parser.add_argument(
+        "--no-jobs", action="store_true", help="run no forecasts or maintenance"
+    )
+    args = parser.parse_args()
+
+    if not args.skip_migrate and DATA_BACKEND != "memory":
+        migrate()
+    serve(args.host, args.port, args.workers, jobs=not args.no_jobs)
+
+
+if __name__ == "__main__":
+    main()
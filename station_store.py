@@ -0,0 +1,190 @@
+"""
+In-memory latest-state store for monitoring stations.
+
+Holds each active station's thresholds together with its most recent reading
+so `/api/stations` and the station half of `/api/alerts` can be answered
+without a per-station LATERAL lookup. The store is warmed from the repository
+at startup, updated in place by the ingestion endpoints and periodically
+caught up with readings written by other workers. It is reloaded when the
+`monitoring_stations` row in `table_versions` moves, so added, deactivated
+and re-thresholded stations are picked up too.
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from repository import CATCH_UP_ID_MARGIN, Repository
+
+
+@dataclass
+class StationState:
+    """Thresholds and latest reading for one station"""
+
+    id: int
+    name: str
+    river: str
+    district: str
+    longitude: float
+    latitude: float
+    normal_level: float
+    warning_level: float
+    danger_level: float
+    level: float | None = None
+    status: str = "normal"
+    timestamp: datetime | None = None
+
+    @property
+    def risk_level(self):
+        """Threshold class of the latest level, as used by the alerts panel"""
+        if self.level is None:
+            return "normal"
+        if self.level >= self.danger_level:
+            return "danger"
+        if self.level >= self.warning_level:
+            return "warning"
+        return "normal"
+
+    def to_api(self, trend=None):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "river": self.river,
+            "district": self.district,
+            "coordinates": [self.longitude, self.latitude],
+            "levels": {
+                "normal": self.normal_level,
+                "warning": self.warning_level,
+                "danger": self.danger_level,
+                "current": (
+                    self.level if self.level is not None else self.normal_level
+                ),
+            },
+            "status": self.status,
+            "trend": trend,
+            "lastUpdated": (
+                self.timestamp or datetime.utcnow().replace(microsecond=0)
+            ).isoformat(),
+        }
+
+
+class StationStore:
+    """Latest reading per station, keyed by station id"""
+
+    def __init__(self):
+        self._stations = {}
+        self._ordered = []
+        self._last_reading_id = 0
+        self._lock = threading.Lock()
+        self.warmed = False
+        # Bumped whenever what the store serves changes
+        self.version = 0
+        # monitoring_stations table version the stations were read at
+        self.stations_version = None
+
+    async def _table_version(self, repo: Repository):
+        versions = await repo.table_versions()
+        return versions.get("monitoring_stations", (None, None))[0]
+
+    async def load(self, repo: Repository):
+        """(Re)build the store from the repository"""
+        # Read the versions first so changes racing the load are caught up
+        stations_version = await self._table_version(repo)
+        last_id = await repo.max_reading_id()
+
+        stations = {}
+        for row in await repo.stations():
+            stations[row["id"]] = StationState(
+                id=row["id"],
+                name=row["name"],
+                river=row["river_name"],
+                district=row["district"],
+                longitude=row["longitude"],
+                latitude=row["latitude"],
+                normal_level=row["normal_level"],
+                warning_level=row["warning_level"],
+                danger_level=row["danger_level"],
+                level=row["level"],
+                status=row["status"] or "normal",
+                timestamp=row["timestamp"],
+            )
+
+        with self._lock:
+            self._stations = stations
+            self._ordered = sorted(stations.values(), key=lambda s: s.name)
+            self._last_reading_id = last_id
+            self.stations_version = stations_version
+            self.warmed = True
+            self.version += 1
+
+    async def refresh(self, repo: Repository):
+        """Catch up with new readings, reloading if the stations table changed
+
+        Returns the stations whose status or threshold class changed.
+        """
+        if self.warmed and await self._table_version(repo) == self.stations_version:
+            return await self.catch_up(repo)
+        warmed = self.warmed
+        before = {s.id: (s.status, s.risk_level) for s in self._ordered}
+        await self.load(repo)
+        if not warmed:
+            return []
+        return [
+            station
+            for station in self._ordered
+            if before.get(station.id) != (station.status, station.risk_level)
+        ]
+
+    async def catch_up(self, repo: Repository):
+        """Apply readings written since the last load or catch-up"""
+        # Ids are taken before commit, so rows just below the last id read may
+        # have become visible since; the ones already applied are skipped
+        after = max(self._last_reading_id - CATCH_UP_ID_MARGIN, 0)
+        readings, last_id = await repo.latest_readings(after)
+        if not readings:
+            return []
+        return self.apply_readings(readings, last_reading_id=last_id)
+
+    def apply_readings(self, readings, last_reading_id=None):
+        """Update stations in place from freshly written reading dicts
+
+        Returns the stations whose status or threshold class changed.
+        """
+        changed = {}
+        applied = False
+        with self._lock:
+            for reading in readings:
+                station = self._stations.get(reading["station_id"])
+                if station is None:
+                    continue
+                if station.timestamp and reading["timestamp"] < station.timestamp:
+                    continue
+                if (reading["timestamp"], reading["level"], reading["status"]) == (
+                    station.timestamp,
+                    station.level,
+                    station.status,
+                ):
+                    continue
+                before = (station.status, station.risk_level)
+                station.level = reading["level"]
+                station.status = reading["status"]
+                station.timestamp = reading["timestamp"]
+                applied = True
+                if (station.status, station.risk_level) != before:
+                    changed[station.id] = station
+            if last_reading_id is not None:
+                self._last_reading_id = max(self._last_reading_id, last_reading_id)
+            if applied:
+                self.version += 1
+        return list(changed.values())
+
+    def get(self, station_id):
+        return self._stations.get(station_id)
+
+    def all(self):
+        """Active stations ordered by name"""
+        return list(self._ordered)
+
+
+# Process-wide store shared by the API routes
+store = StationStore()
@@ -0,0 +1,197 @@
+"""
+Server push of live updates over Server-Sent Events.
+
+A single Broadcaster fans every event out to all connected `/api/stream`
+clients. Each event is serialized once into an SSE frame and the same bytes are
+appended to every subscriber's bounded buffer, so publishing costs one deque
+append per client. A client that falls behind loses its oldest frames and is
+sent a `resync` event telling it to refetch the dashboard snapshot instead of
+growing memory without bound.
+"""
+
+import asyncio
+import os
+from collections import deque
+from datetime import datetime
+
+import queries
+from fast_json import dumps
+from repository import Repository
+from trends import trend_tracker
+
+# Frames buffered per client before the oldest are dropped
+STREAM_BUFFER_SIZE = int(os.environ.get("STREAM_BUFFER_SIZE", "32"))
+
+# Upper bound on concurrent subscribers per process
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get("STREAM_MAX_SUBSCRIBERS", "20000"))
+
+# Idle connections get a comment line this often to keep proxies from closing them
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get("STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Recent frames kept so reconnecting clients can resume from Last-Event-ID
+REPLAY_SIZE = 256
+
+RESYNC_FRAME = b'event: resync\ndata: {"reason": "missed events"}\n\n'
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+class Subscriber:
+    """One connected client: a bounded frame buffer and a wake-up future"""
+
+    __slots__ = ("frames", "waiter", "missed")
+
+    def __init__(self, buffer_size):
+        self.frames = deque(maxlen=buffer_size)
+        self.waiter = None
+        self.missed = False
+
+    def push(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.missed = True
+        self.frames.append(frame)
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+class Broadcaster:
+    """Fan-out of pre-serialized SSE frames to every subscriber"""
+
+    def __init__(self, buffer_size=STREAM_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_SIZE)
+        self._next_id = 1
+        self._loop = None
+        self._keepalive_task = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id=None) -> Subscriber:
+        if len(self._subscribers) >= STREAM_MAX_SUBSCRIBERS:
+            raise OverflowError("Too many stream subscribers")
+        self._loop = asyncio.get_running_loop()
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = self._loop.create_task(self._keepalive())
+        subscriber = Subscriber(self.buffer_size)
+
+        if last_event_id is not None:
+            oldest = self._recent[0][0] if self._recent else self._next_id
+            if last_event_id + 1 < oldest:
+                subscriber.push(RESYNC_FRAME)
+            for event_id, frame in self._recent:
+                if event_id > last_event_id:
+                    subscriber.push(frame)
+
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: dict):
+        """Serialize an event once and queue it for every subscriber"""
+        event_id = self._next_id
+        self._next_id += 1
+        payload = dumps({"sentAt": datetime.utcnow().isoformat(), **data})
+        frame = b"event: %s\nid: %d\ndata: %s\n\n" % (event.encode(), event_id, payload)
+
+        self._recent.append((event_id, frame))
+        for subscriber in self._subscribers:
+            subscriber.push(frame)
+
+    def publish_threadsafe(self, event: str, data: dict):
+        """Publish from a worker thread onto the serving event loop"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.publish, event, data)
+
+    async def _keepalive(self):
+        # One timer for all clients instead of a timeout per connection
+        while self._subscribers:
+            await asyncio.sleep(STREAM_KEEPALIVE_SECONDS)
+            for subscriber in list(self._subscribers):
+                if not subscriber.frames:
+                    subscriber.push(KEEPALIVE_FRAME)
+
+    async def frames(self, subscriber: Subscriber):
+        """Yield a subscriber's frames as they arrive"""
+        loop = asyncio.get_running_loop()
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                if not subscriber.frames:
+                    subscriber.waiter = loop.create_future()
+                    await subscriber.waiter
+                    subscriber.waiter = None
+
+                if subscriber.missed:
+                    subscriber.missed = False
+                    subscriber.frames.clear()
+                    yield RESYNC_FRAME
+                    continue
+
+                yield subscriber.frames.popleft()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+# Process-wide broadcaster used by the API routes
+broadcaster = Broadcaster()
+
+
+class LiveUpdates:
+    """Turns store and table changes into stream events"""
+
+    def __init__(self, broadcaster: Broadcaster):
+        self.broadcaster = broadcaster
+        self._alerts = None
+        self._forecast_version = None
+        self._forecast_created_at = None
+
+    async def prime(self, repo: Repository):
+        """Record the current state so only later changes are published"""
+        self._alerts = (await queries.get_alerts(repo))["alerts"]
+        versions = await queries.get_table_versions(repo)
+        self._forecast_version = versions.get("flood_forecasts", (None, None))[0]
+        self._forecast_created_at = await self._latest_forecast(repo)
+
+    def publish_station_changes(self, stations):
+        """Send the latest state of stations whose status changed"""
+        if stations:
+            trends = trend_tracker.trends(stations)
+            payload = [station.to_api(t) for station, t in zip(stations, trends)]
+            self.broadcaster.publish("stations", {"stations": payload})
+
+    async def publish_alerts_if_changed(self, repo: Repository):
+        """Recompute the alerts panel and send it only when it differs"""
+        alerts = (await queries.get_alerts(repo))["alerts"]
+        if alerts != self._alerts:
+            self._alerts = alerts
+            self.broadcaster.publish("alerts", {"alerts": alerts})
+
+    async def publish_new_forecasts(self, repo: Repository):
+        """Send forecasts created since the last check"""
+        versions = await queries.get_table_versions(repo)
+        version = versions.get("flood_forecasts", (None, None))[0]
+        if version == self._forecast_version:
+            return
+        self._forecast_version = version
+
+        since = self._forecast_created_at
+        self._forecast_created_at = await self._latest_forecast(repo)
+        forecasts = [
+            forecast
+            for forecast in (await queries.get_forecasts(repo))["forecasts"]
+            if since is None or datetime.fromisoformat(forecast["createdAt"]) > since
+        ]
+        if forecasts:
+            self.broadcaster.publish("forecasts", {"forecasts": forecasts})
+
+    async def _latest_forecast(self, repo: Repository):
+        return await repo.latest_forecast_time()
+
+
+# Process-wide change publisher feeding the broadcaster
+live_updates = LiveUpdates(broadcaster)
@@ -0,0 +1,60 @@
+"""
+Shared test helpers: a seeded in-memory repository and an app serving from it
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import seed_data
+from main import create_app
+from repository import MemoryRepository, get_repository
+from result_cache import result_cache
+
+END = datetime(2024, 9, 1)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def seeded(stations=6, days=10):
+    rng = np.random.default_rng(3)
+    districts = seed_data.make_districts(22, rng)
+    stations = seed_data.make_stations(stations, districts, rng)
+    start = END - timedelta(days=days)
+    storms = seed_data.make_storms(3, start, days * 24, rng)
+    generator = seed_data.HydrographGenerator(
+        stations, districts, start, END, timedelta(minutes=15), storms, 3
+    )
+    repo = MemoryRepository()
+    seed_data.seed_memory(repo, generator, 5_000)
+    return repo, generator
+
+
+def memory_app(repo):
+    """An app whose routes read from `repo` instead of the database"""
+    app = create_app()
+
+    async def memory_repository():
+        yield repo
+
+    app.dependency_overrides[get_repository] = memory_repository
+    return app
+
+
+@pytest.fixture
+def repo():
+    repo, _ = seeded()
+    return repo
+
+
+@pytest.fixture
+def client(repo):
+    # No lifespan: the stores warm from the overridden repository on first use
+    run(result_cache.clear())
+    yield TestClient(memory_app(repo))
+    run(result_cache.clear())
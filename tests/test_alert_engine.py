@@ -0,0 +1,133 @@
+"""
+Tests for the incremental alert engine
+"""
+
+from datetime import datetime, timedelta
+
+from alert_engine import AlertEngine, station_risk
+from station_store import StationState
+from trends import trend_tracker
+
+NOW = datetime(2024, 7, 1, 12)
+
+
+def station(station_id, district, level, minutes=0):
+    return StationState(
+        id=station_id,
+        name=f"Station {station_id}",
+        river="Ravi",
+        district=district,
+        longitude=74.0,
+        latitude=31.5,
+        normal_level=200.0,
+        warning_level=204.0,
+        danger_level=207.0,
+        level=level,
+        timestamp=NOW + timedelta(minutes=minutes),
+    )
+
+
+def test_station_risk_holds_within_margin():
+    assert station_risk(204.0, "normal", 204.0, 207.0, 0.5) == "warning"
+    assert station_risk(203.7, "warning", 204.0, 207.0, 0.5) == "warning"
+    assert station_risk(203.4, "warning", 204.0, 207.0, 0.5) == "normal"
+    assert station_risk(203.7, "normal", 204.0, 207.0, 0.5) == "normal"
+    # Falling out of danger can land in a held warning
+    assert station_risk(206.8, "danger", 204.0, 207.0, 0.5) == "danger"
+    assert station_risk(203.8, "danger", 204.0, 207.0, 0.5) == "warning"
+    assert station_risk(None, "danger", 204.0, 207.0, 0.5) == "normal"
+
+
+def test_level_hovering_at_warning_does_not_flap():
+    engine = AlertEngine()
+    assert engine.observe([station(1, "Lahore", 204.1)], NOW)
+    assert engine.panel(NOW)[0]["risks"] == "warning"
+
+    for minute, level in enumerate([203.9, 204.05, 203.95, 204.0], start=1):
+        assert not engine.observe([station(1, "Lahore", level, minute)], NOW)
+    assert engine.panel(NOW)[0]["risks"] == "warning"
+
+    assert engine.observe([station(1, "Lahore", 203.0, 10)], NOW)
+    assert engine.panel(NOW) == []
+
+
+def test_only_the_affected_district_is_reevaluated():
+    engine = AlertEngine()
+    engine.observe(
+        [station(1, "Lahore", 205.0), station(2, "Kasur", 208.0)],
+        NOW,
+    )
+    kasur = engine._alerts["Kasur"]
+    engine.observe([station(1, "Lahore", 208.0, 5), station(2, "Kasur", 208.0)], NOW)
+    assert engine._alerts["Kasur"] is kasur
+    assert engine._alerts["Lahore"]["risks"] == "danger"
+    # A repeated reading is skipped entirely
+    assert not engine.observe([station(1, "Lahore", 208.0, 5)], NOW)
+
+
+def test_forecasts_rank_and_expire():
+    engine = AlertEngine()
+    engine.observe([station(1, "Lahore", 205.0)], NOW)
+    engine.set_forecasts(
+        [
+            ("Kasur", "critical", NOW, NOW + timedelta(hours=6)),
+            ("Multan", "medium", NOW, NOW + timedelta(hours=25)),
+        ],
+        NOW,
+    )
+    panel = engine.panel(NOW)
+    assert [alert["district"] for alert in panel] == ["Kasur", "Lahore"]
+    assert panel[0] == {
+        "district": "Kasur",
+        "type": "high",
+        "risks": "critical",
+        "priority": 4,
+    }
+
+    # Multan's forecast comes within 24 hours of its due time
+    later = NOW + timedelta(hours=1)
+    assert [a["district"] for a in engine.panel(later)] == [
+        "Kasur",
+        "Multan",
+        "Lahore",
+    ]
+    # Both forecasts are older than two hours by then
+    assert [a["district"] for a in engine.panel(later + timedelta(hours=2))] == [
+        "Lahore"
+    ]
+
+
+def test_panel_keeps_top_five():
+    engine = AlertEngine()
+    engine.observe(
+        [station(i, f"District {i}", 205.0 if i % 2 else 208.0) for i in range(8)],
+        NOW,
+    )
+    panel = engine.panel(NOW)
+    assert len(panel) == 5
+    # Station risks share one priority, so districts are ranked by name
+    assert [alert["district"] for alert in panel] == [f"District {i}" for i in range(5)]
+    assert all(alert["type"] == "medium" for alert in panel)
+
+
+def test_fast_rise_alerts_before_the_warning_level():
+    engine = AlertEngine()
+    # 1 m/h from 203 m reaches danger (207 m) in four hours
+    readings = [station(501, "Okara", 202.0), station(501, "Okara", 203.0, 60)]
+    for reading in readings:
+        trend_tracker.observe([reading])
+        engine.observe([reading], NOW)
+    assert engine.panel(NOW) == [
+        {"district": "Okara", "type": "medium", "risks": "rising", "priority": 2}
+    ]
+
+    # 0.5 m/h is seven hours out, still within 1.5x of the six-hour horizon
+    held = station(501, "Okara", 203.5, 120)
+    trend_tracker.observe([held])
+    assert not engine.observe([held], NOW)
+
+    # Levelling off clears it
+    flat = station(501, "Okara", 203.55, 180)
+    trend_tracker.observe([flat])
+    assert engine.observe([flat], NOW)
+    assert engine.panel(NOW) == []
@@ -0,0 +1,54 @@
+"""
+Tests for the regression gate of the endpoint benchmark suite
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from bench_endpoints import percentile, regressions, tile_of  # noqa: E402
+
+
+def result(**metrics):
+    base = {
+        "failures": 0,
+        "p50_ms": 10.0,
+        "p95_ms": 20.0,
+        "p99_ms": 30.0,
+        "alloc_kb": 100.0,
+        "requests_per_sec": 500.0,
+        "rows_per_sec": 5000.0,
+    }
+    return {"endpoints": {"stations": {**base, **metrics}}}
+
+
+def test_within_tolerance_passes():
+    assert regressions(result(), result(p99_ms=35.0, rows_per_sec=4500.0), 0.2) == []
+
+
+def test_slower_or_leaner_throughput_fails():
+    failures = regressions(
+        result(), result(p95_ms=30.0, requests_per_sec=300.0, failures=2), 0.2
+    )
+    assert failures == [
+        "stations: 2 failed requests",
+        "stations: p95_ms 20.0 -> 30.0",
+        "stations: requests_per_sec 500.0 -> 300.0",
+    ]
+
+
+def test_tiny_latencies_are_not_gated_on_ratio():
+    fast = result(p50_ms=0.2)
+    assert regressions(fast, result(p50_ms=0.6), 0.2) == []
+    assert regressions(fast, result(p50_ms=1.5), 0.2) == ["stations: p50_ms 0.2 -> 1.5"]
+
+
+def test_new_endpoints_have_no_baseline():
+    assert regressions({"endpoints": {}}, result(p50_ms=1e6), 0.2) == []
+
+
+def test_nearest_rank_percentile_and_tiles():
+    samples = list(range(1, 101))
+    assert [percentile(samples, p) for p in (50, 95, 99)] == [50, 95, 99]
+    assert tile_of(75.5, 31.0, 7) == (7, 90, 52)
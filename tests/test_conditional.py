@@ -0,0 +1,118 @@
+"""
+Tests for ETags and 304 responses on the read endpoints
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from conditional import EPOCH
+from station_store import store as station_store
+from tests.conftest import END, seeded
+
+
+@pytest.fixture(scope="module")
+def repo():
+    repo, _ = seeded()
+    return repo
+
+
+def revalidate(client, path, etag, **headers):
+    return client.get(path, headers={"If-None-Match": etag, **headers})
+
+
+def test_unchanged_stations_are_not_modified_until_a_reading_arrives(client):
+    first = client.get("/api/stations")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    cached = revalidate(client, "/api/stations", etag)
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    station = station_store.get(1)
+    station_store.apply_readings(
+        [
+            {
+                "station_id": 1,
+                "level": station.level + 0.5,
+                "status": station.status,
+                "timestamp": station.timestamp + timedelta(minutes=15),
+            }
+        ]
+    )
+    changed = revalidate(client, "/api/stations", etag)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_forecast_revalidation_skips_the_main_query(client, repo, monkeypatch):
+    etag = client.get("/api/forecast").headers["etag"]
+
+    async def no_query(*args, **kwargs):
+        raise AssertionError("the forecast query ran")
+
+    monkeypatch.setattr(repo, "forecasts", no_query)
+    assert revalidate(client, "/api/forecast", etag).status_code == 304
+    # Another viewport is another representation, so its query does run
+    other = revalidate(client, "/api/forecast?bbox=75,30,76,31", etag)
+    assert other.status_code == 500
+
+
+def test_forecast_tags_expire_when_rows_cross_the_window(client, repo):
+    etag = client.get("/api/forecast").headers["etag"]
+    digest, _ = etag.removeprefix('W/"').rstrip('"').rsplit("-", 1)
+    assert revalidate(client, "/api/forecast", etag).status_code == 304
+
+    # A tag issued before the seeded forecasts left the 24-hour window
+    before = int((END - timedelta(hours=1) - EPOCH).total_seconds())
+    stale = f'W/"{digest}-{before}"'
+    response = revalidate(client, "/api/forecast", stale)
+    assert response.status_code == 200 and response.headers["etag"] != stale
+
+    repo.add_forecasts([])
+    assert revalidate(client, "/api/forecast", etag).status_code == 200
+
+
+def test_districts_tag_each_encoding_and_fixed_history_ranges(client):
+    plain = client.get("/api/districts", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/api/districts", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["etag"] != zipped.headers["etag"]
+    assert (
+        revalidate(
+            client,
+            "/api/districts",
+            zipped.headers["etag"],
+            **{"Accept-Encoding": "gzip"},
+        ).status_code
+        == 304
+    )
+
+    # A range ending now moves with every request
+    assert "etag" not in client.get("/api/stations/2/history").headers
+    path = f"/api/stations/2/history?to={END.isoformat()}"
+    etag = client.get(path).headers["etag"]
+    assert revalidate(client, path, etag).status_code == 304
+
+
+def test_alerts_pick_up_a_forecast_run_from_another_process(client, repo):
+    etag = client.get("/api/alerts").headers["etag"]
+    district = station_store.all()[0].district
+    now = datetime.utcnow()
+    # Written as the jobs process would: straight to the table, without
+    # telling this process's alert engine
+    repo.add_forecasts(
+        [
+            {
+                "district": district,
+                "risk_level": "critical",
+                "forecast_area": "POLYGON((74 31, 74.1 31, 74.1 31.1, 74 31))",
+                "forecast_time": now + timedelta(hours=1),
+                "confidence": 0.9,
+                "affected_population": 1000,
+                "created_at": now,
+            }
+        ]
+    )
+    response = revalidate(client, "/api/alerts", etag)
+    assert response.status_code == 200
+    assert district in [alert["district"] for alert in response.json()["alerts"]]
@@ -0,0 +1,77 @@
+"""
+Tests for the combined dashboard snapshot
+"""
+
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+import pytest
+
+import dashboard
+from dashboard import SECTIONS, parse_include, parse_version
+from station_store import store as station_store
+
+
+def test_parse_include_defaults_to_every_section_and_drops_repeats():
+    assert parse_include(None) == list(SECTIONS)
+    assert parse_include(" alerts,stations,alerts ") == ["alerts", "stations"]
+    with pytest.raises(ValueError, match="weather"):
+        parse_include("stations,weather")
+
+
+def test_only_version_tokens_are_versions():
+    token = "1760000000.stations-ab12.alerts-cd34"
+    issued, digests = parse_version(token)
+    assert issued.isoformat() == "2025-10-09T08:53:20"
+    assert digests == {"stations": "ab12", "alerts": "cd34"}
+    # A generatedAt from an older client gets every section back
+    assert parse_version("2025-10-09T08:53:20") is None
+    assert parse_version(None) is None
+
+
+@pytest.fixture
+def client(client, repo, monkeypatch):
+    # Sections are built on sessions of their own
+    @asynccontextmanager
+    async def open_memory_repository():
+        yield repo
+
+    monkeypatch.setattr(dashboard, "open_repository", open_memory_repository)
+    return client
+
+
+def test_dashboard_only_resends_sections_whose_data_changed(client):
+    path = "/api/dashboard?include=stations,districts"
+    first = client.get(path).json()
+    assert first["unchanged"] == [] and "stations" in first
+    assert client.get("/api/dashboard?include=weather").status_code == 400
+
+    again = client.get(path, params={"since": first["version"]}).json()
+    assert again["unchanged"] == ["stations", "districts"]
+    assert "stations" not in again
+
+    station = station_store.get(1)
+    station_store.apply_readings(
+        [
+            {
+                "station_id": 1,
+                "level": station.level + 0.5,
+                "status": station.status,
+                "timestamp": station.timestamp + timedelta(minutes=15),
+            }
+        ]
+    )
+    changed = client.get(path, params={"since": again["version"]}).json()
+    assert "stations" in changed and "stations" not in changed["unchanged"]
+    assert changed["version"] != again["version"]
+
+
+def test_empty_rainfall_windows_are_rejected(client):
+    for path in ("/api/rainfall", "/api/dashboard"):
+        for hours in (0, -1):
+            response = client.get(path, params={"hours": hours})
+            assert response.status_code == 400
+            assert response.json()["detail"] == "hours must be at least 1"
+        # Past the store's 72 hours, rainfall is summed from the table
+        for hours in (1, 72, 168):
+            assert client.get(path, params={"hours": hours}).status_code == 200
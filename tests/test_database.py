@@ -0,0 +1,64 @@
+"""
+Tests for the async database path and the routes awaiting it
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import database
+from result_cache import result_cache
+from tests.conftest import memory_app
+
+
+def test_async_url_translates_libpq_options():
+    url = database.to_async_url(
+        "postgresql://flood:secret@db:5432/floodguard"
+        "?sslmode=require&channel_binding=prefer"
+    )
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {"ssl": "require"}
+    assert url.password == "secret" and url.database == "floodguard"
+
+
+@pytest.fixture
+def async_engine(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://flood@db/floodguard")
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    database.get_async_engine.cache_clear()
+    yield database.get_async_engine()
+    database.get_async_engine.cache_clear()
+
+
+def test_async_engine_uses_asyncpg_with_the_configured_pool(async_engine):
+    # Creating the engine does not connect
+    assert async_engine.url.drivername == "postgresql+asyncpg"
+    pool = async_engine.pool
+    assert pool.size() == database.POOL_OPTIONS["pool_size"]
+    assert pool.timeout() == database.POOL_OPTIONS["pool_timeout"]
+
+
+def test_a_slow_query_does_not_stall_other_requests(repo):
+    release = asyncio.Event()
+    forecasts = repo.forecasts
+
+    async def slow_forecasts(*args, **kwargs):
+        await release.wait()
+        return await forecasts(*args, **kwargs)
+
+    repo.forecasts = slow_forecasts
+    app = memory_app(repo)
+
+    async def requests():
+        await result_cache.clear()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            slow = asyncio.ensure_future(c.get("/api/forecast"))
+            # Served while the forecast query is still waiting on the database
+            fast = await asyncio.wait_for(c.get("/api/stations"), timeout=5)
+            assert fast.status_code == 200 and not slow.done()
+            release.set()
+            return (await slow).status_code
+
+    assert asyncio.run(requests()) == 200
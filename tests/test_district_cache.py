@@ -0,0 +1,73 @@
+"""
+Tests for the pre-serialized district cache and /api/districts
+"""
+
+import gzip
+
+import orjson
+import pytest
+
+from district_cache import DistrictCache, district_cache, resolve_detail
+from tests.conftest import run
+
+SQUARE = "POLYGON((74 30, 74.5 30, 74.5 30.5, 74 30.5, 74 30))"
+
+
+def test_resolve_detail_maps_map_zooms_to_levels():
+    assert [resolve_detail(z) for z in ("3", "8", "12", "mid")] == [
+        "low",
+        "mid",
+        "high",
+        "mid",
+    ]
+    with pytest.raises(ValueError):
+        resolve_detail("street")
+
+
+def test_rebuilds_only_when_the_districts_version_moves(repo):
+    cache = DistrictCache()
+    builds = []
+    fetch = repo.districts
+
+    async def counted(tolerance=None):
+        builds.append(tolerance)
+        return await fetch(tolerance)
+
+    repo.districts = counted
+    first = run(cache.get(repo, "high"))
+    assert len(builds) == 3
+    run(cache.refresh_if_changed(repo))
+    assert len(builds) == 3 and run(cache.get(repo, "high")) is first
+
+    repo.add_districts(
+        [{"name": "Newtown", "boundary": SQUARE, "population": 1, "area_sq_km": 2}]
+    )
+    run(cache.refresh_if_changed(repo))
+    assert len(builds) == 6
+    payload = run(cache.get(repo, "high"))
+    assert "Newtown" in [district["name"] for district in payload.districts]
+    assert gzip.decompress(payload.gzip_body) == payload.body
+
+
+@pytest.fixture
+def client(client, repo):
+    run(district_cache.build(repo))
+    return client
+
+
+def test_districts_route_sends_the_gzip_copy_to_clients_accepting_it(client):
+    plain = client.get("/api/districts", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    packed = client.get("/api/districts", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in packed.headers["vary"]
+    # The client decompresses; both carry the same districts
+    assert packed.content == plain.content
+    assert packed.headers["etag"] != plain.headers["etag"]
+
+    # A viewport is filtered per request and never compressed here
+    box = client.get(
+        "/api/districts?bbox=60,20,100,40", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in box.headers
+    assert orjson.loads(box.content)["districts"]
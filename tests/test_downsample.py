@@ -0,0 +1,76 @@
+"""
+Tests for station history downsampling
+"""
+
+import numpy as np
+import pytest
+
+from downsample import downsample, history_payload, lttb, minmax
+
+
+def series(size=35040, seed=0):
+    # A year of 15-minute readings: seasonal swell plus noise around 240 m
+    x = 1.7e9 + np.arange(size) * 900.0
+    rng = np.random.default_rng(seed)
+    y = 240 + 3 * np.sin(np.linspace(0, 2 * np.pi, size)) + rng.normal(0, 0.02, size)
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    x, y = series()
+    indices = lttb(x, y, 500)
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_picks_a_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[637] = 10.0
+    assert 637 in lttb(x, y, 20)
+
+
+def test_minmax_keeps_global_extremes():
+    x, y = series()
+    indices = minmax(y, 400)
+    assert len(indices) <= 400
+    assert y.argmax() in indices and y.argmin() in indices
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_keeps_threshold_crossings(method):
+    x, y = series()
+    indices, bands, crossings = downsample(x, y, 300, 242.5, 243.5, method)
+    assert len(crossings) > 0
+    assert len(indices) <= 300
+    assert set(crossings) <= set(indices)
+    assert set(crossings + 1) <= set(indices)
+
+
+def test_history_payload_reports_crossings():
+    x = 1.7e9 + np.arange(6) * 900.0
+    y = np.array([240.0, 244.5, 247.5, 244.0, 241.0, 240.5])
+    payload = history_payload(x, y, 500, 244.0, 247.0)
+
+    assert payload["totalReadings"] == 6
+    assert [p["status"] for p in payload["points"]] == [
+        "normal",
+        "warning",
+        "danger",
+        "warning",
+        "normal",
+        "normal",
+    ]
+    assert [(c["from"], c["to"]) for c in payload["crossings"]] == [
+        ("normal", "warning"),
+        ("warning", "danger"),
+        ("danger", "warning"),
+        ("warning", "normal"),
+    ]
+    assert payload["points"][0]["timestamp"] == "2023-11-14T22:13:20"
+
+
+def test_history_payload_handles_empty_range():
+    payload = history_payload(np.array([]), np.array([]), 500, 244.0, 247.0)
+    assert payload == {"totalReadings": 0, "points": [], "crossings": []}
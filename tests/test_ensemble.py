@@ -0,0 +1,61 @@
+"""
+Tests for the ensemble forecast runner
+"""
+
+import numpy as np
+
+from ensemble import district_exceedance, perturb_rainfall, run_ensemble
+from forecast_engine import HISTORY_HOURS, extend_rainfall
+from tests.test_forecast_engine import chain
+
+
+def storm(size, hours=HISTORY_HOURS):
+    rain = np.zeros((size, hours))
+    rain[:, -12:] = 20.0
+    return extend_rainfall(rain)
+
+
+def test_perturbation_keeps_mean_rainfall():
+    rain = np.full((200, 72), 10.0)
+    perturbed = perturb_rainfall(rain, 48, np.random.default_rng(1))
+    assert perturbed.min() > 0
+    assert abs(perturbed[:, :48].mean() - 10.0) < 0.2
+    assert abs(perturbed[:, 48:].mean() - 10.0) < 0.5
+    # Forecast hours spread more than gauge history
+    assert perturbed[:, 48:].std() > 2 * perturbed[:, :48].std()
+
+
+def test_members_are_reproducible_per_seed():
+    network = chain(4)
+    rain, observed = storm(4), np.full(4, 241.0)
+    first = run_ensemble(network, rain, observed, members=6, workers=1, seed=3)
+    again = run_ensemble(network, rain, observed, members=6, workers=1, seed=3)
+    other = run_ensemble(network, rain, observed, members=6, workers=1, seed=4)
+    assert first.shape == (6, 4)
+    np.testing.assert_array_equal(first, again)
+    assert not np.array_equal(first, other)
+    # Members differ from each other
+    assert np.ptp(first, axis=0).max() > 0
+
+
+def test_process_pool_matches_serial_run():
+    network = chain(5)
+    rain, observed = storm(5), np.full(5, 241.0)
+    serial = run_ensemble(network, rain, observed, members=8, workers=1, seed=7)
+    pooled = run_ensemble(network, rain, observed, members=8, workers=2, seed=7)
+    np.testing.assert_allclose(pooled, serial)
+
+
+def test_district_exceedance_takes_worst_station_per_member():
+    network = chain(3)  # medium 242, high 244, critical 247
+    peaks = np.array(
+        [
+            [241.0, 243.0, 240.0],
+            [245.0, 240.0, 240.0],
+            [240.0, 240.0, 248.0],
+            [240.0, 240.0, 240.0],
+        ]
+    )
+    result = district_exceedance(peaks, network, ["A", "A", "B"])
+    assert result["A"] == {"medium": 0.5, "high": 0.25, "critical": 0.0}
+    assert result["B"] == {"medium": 0.25, "high": 0.25, "critical": 0.25}
@@ -0,0 +1,41 @@
+"""
+Tests for fast JSON encoding with raw GeoJSON fragments
+"""
+
+import json
+
+from fast_json import FastJSONResponse, RawJSON, dumps
+
+
+def test_dumps_splices_raw_fragments():
+    polygon = '{"type":"Polygon","coordinates":[[[75.1,30.9],[75.3,30.9],[75.1,30.9]]]}'
+    payload = {
+        "forecasts": [
+            {"district": "Ludhiana", "area": RawJSON(polygon)},
+            {"district": "Jalandhar", "area": RawJSON(polygon.encode())},
+        ]
+    }
+
+    body = dumps(payload)
+
+    assert polygon.encode() in body
+    decoded = json.loads(body)
+    assert decoded["forecasts"][1]["area"] == json.loads(polygon)
+    assert decoded["forecasts"][0]["district"] == "Ludhiana"
+
+
+def test_dumps_without_fragments_matches_json():
+    payload = {"stations": [{"id": 1, "name": "Sutlej at Ludhiana", "level": 245.5}]}
+    assert json.loads(dumps(payload)) == payload
+
+
+def test_placeholder_text_in_data_is_not_replaced():
+    note = "\x01" + "0" * 16 + ":0"
+    payload = {"note": note, "area": RawJSON(b"[1,2]")}
+    assert json.loads(dumps(payload)) == {"note": note, "area": [1, 2]}
+
+
+def test_response_renders_with_fragments():
+    response = FastJSONResponse({"boundary": RawJSON('{"type":"Point"}')})
+    assert response.body == b'{"boundary":{"type":"Point"}}'
+    assert response.media_type == "application/json"
@@ -0,0 +1,101 @@
+"""
+Tests for the vectorized runoff and routing forecast engine
+"""
+
+import numpy as np
+import pytest
+
+from forecast_engine import (
+    RiverNetwork,
+    causal_convolve,
+    hourly_rainfall,
+    kernel_spectra,
+    muskingum_kernel,
+    route,
+    routing_levels,
+    simulate,
+)
+
+
+def chain(size, normal=240.0):
+    # Stations 0 -> 1 -> ... -> size - 1 along one river
+    downstream = np.arange(1, size + 1)
+    downstream[-1] = -1
+    return RiverNetwork(
+        downstream=downstream,
+        area_km2=np.full(size, 500.0),
+        curve_number=np.full(size, 75.0),
+        reservoir_k=np.full(size, 0.8),
+        muskingum_k=np.full(size, 3.0),
+        muskingum_x=np.full(size, 0.1),
+        normal_level=np.full(size, normal),
+        warning_level=np.full(size, normal + 4),
+        danger_level=np.full(size, normal + 7),
+    )
+
+
+def test_routing_levels_follow_the_tree():
+    # 0 and 1 join at 2, which flows into 3
+    levels = routing_levels(np.array([2, 2, 3, -1]))
+    assert [list(nodes) for nodes, _ in levels] == [[0, 1], [2]]
+
+    with pytest.raises(ValueError):
+        routing_levels(np.array([1, 0]))
+
+
+def test_muskingum_conserves_volume_and_delays_peak():
+    kernel = muskingum_kernel(np.array([3.0]), np.array([0.1]), 200)
+    assert kernel.sum() == pytest.approx(1.0)
+
+    inflow = np.zeros((1, 200))
+    inflow[0, 10] = 100.0
+    outflow = causal_convolve(kernel_spectra(kernel, 200), inflow)
+    assert outflow.sum() == pytest.approx(100.0)
+    assert outflow.argmax() > 10
+
+
+def test_route_accumulates_upstream_flow():
+    network = chain(3)
+    local = np.ones((3, 100))
+    total = route(network, local)
+    # Steady inflow everywhere: the outlet carries all three catchments
+    assert total[2, -1] == pytest.approx(3.0, rel=1e-3)
+    assert network.contributing_area.tolist() == [500.0, 1000.0, 1500.0]
+
+
+def test_no_rain_recedes_from_the_observed_level():
+    network = chain(4)
+    observed = np.array([241.0, 243.0, 240.0, 246.0])
+    forecast = simulate(network, np.zeros((4, 72)), observed)
+    assert forecast.levels.shape == (4, 24)
+    assert np.allclose(forecast.levels[:, 0], observed, atol=0.5)
+    assert np.all(np.diff(forecast.levels, axis=1) <= 1e-9)
+    assert np.allclose(forecast.levels[2], 240.0)
+    assert forecast.peak_hour.tolist() == [1, 1, 1, 1]
+    assert forecast.risk.tolist() == ["low", "medium", "low", "high"]
+
+
+def test_heavy_rain_raises_risk_downstream_later():
+    network = chain(5)
+    rain = np.zeros((5, 72))
+    rain[:, 44:56] = 20.0
+    forecast = simulate(network, rain, np.full(5, 240.0))
+    assert np.all(forecast.peak_level > 240.0)
+    assert forecast.peak_hour[-1] >= forecast.peak_hour[0]
+    assert forecast.risk[-1] in ("high", "critical")
+
+
+def test_hourly_rainfall_spreads_records_over_their_duration():
+    rain = hourly_rainfall(
+        ["Ludhiana", "Moga"],
+        ["Ludhiana", "Ludhiana"],
+        [12.0, 3.0],
+        [6, 1],
+        [10, 2],
+        12,
+    )
+    assert rain[0, 4:10].tolist() == [2.0] * 6
+    assert rain[0, 1] == 3.0
+    assert rain.sum(axis=1)[0] == pytest.approx(15.0)
+    # Moga has no gauge and takes the mean of gauged districts
+    assert rain[1].tolist() == rain[0].tolist()
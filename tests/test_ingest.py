@@ -0,0 +1,110 @@
+"""
+Tests for bulk telemetry ingestion
+"""
+
+from datetime import timedelta
+
+import pytest
+
+import queries
+from ingest import (
+    RainfallReading,
+    WaterLevelReading,
+    classify_level,
+    ingest_water_levels,
+    parse_batch,
+)
+from result_cache import result_cache
+from station_store import store as station_store
+from tests.conftest import run
+from trends import trend_tracker
+
+
+class TestParseBatch:
+    """Test batch decoding"""
+
+    def test_json_array(self):
+        records = parse_batch(b'[{"station_id": 1, "level": 250.0}]')
+        assert records == [{"station_id": 1, "level": 250.0}]
+
+    def test_ndjson(self):
+        body = b'{"station_id": 1, "level": 1.0}\n\n{"station_id": 2, "level": 2.0}\n'
+        records = parse_batch(body, "application/x-ndjson; charset=utf-8")
+        assert [r["station_id"] for r in records] == [1, 2]
+
+    def test_rejects_non_array(self):
+        with pytest.raises(ValueError):
+            parse_batch(b'{"station_id": 1}')
+
+    def test_rejects_malformed_json(self):
+        with pytest.raises(ValueError):
+            parse_batch(b"[{")
+
+
+class TestValidation:
+    """Test per-record validation"""
+
+    def test_water_level_status_checked(self):
+        with pytest.raises(ValueError):
+            WaterLevelReading.model_validate(
+                {"station_id": 1, "level": 250.0, "status": "flooded"}
+            )
+
+    def test_water_level_timestamp_normalised(self):
+        reading = WaterLevelReading.model_validate(
+            {"station_id": 1, "level": 250.0, "timestamp": "2024-07-01T05:30:00+05:30"}
+        )
+        assert reading.timestamp.tzinfo is None
+        assert reading.timestamp.hour == 0
+
+    def test_rainfall_rejects_negative(self):
+        with pytest.raises(ValueError):
+            RainfallReading.model_validate(
+                {"district": "Ludhiana", "coordinates": [75.8, 30.9], "rainfall_mm": -1}
+            )
+
+    def test_rainfall_rejects_bad_coordinates(self):
+        with pytest.raises(ValueError):
+            RainfallReading.model_validate(
+                {"district": "Ludhiana", "coordinates": [30.9, 275.8], "rainfall_mm": 1}
+            )
+
+    def test_classify_level(self):
+        assert classify_level(245.0, 246.0, 249.0) == "normal"
+        assert classify_level(246.0, 246.0, 249.0) == "warning"
+        assert classify_level(250.0, 246.0, 249.0) == "danger"
+
+
+def test_stations_never_show_new_levels_with_old_trends(repo, monkeypatch):
+    run(station_store.load(repo))
+    run(trend_tracker.load(repo))
+    station = station_store.get(1)
+    (before,) = trend_tracker.trends([station])
+    served = []
+
+    async def invalidate(*tables):
+        # The first await after the store moved: a request may run here
+        served.append(await queries.get_stations(repo))
+
+    monkeypatch.setattr(result_cache, "invalidate", invalidate)
+    level = station.level + 1.0
+    reading = {
+        "station_id": 1,
+        "level": level,
+        "timestamp": (station.timestamp + timedelta(minutes=15)).isoformat(),
+    }
+    assert run(ingest_water_levels(repo, [reading]))["accepted"] == 1
+
+    (first,) = [s for s in served[0]["stations"] if s["id"] == 1]
+    assert first["levels"]["current"] == level
+    assert first["trend"] == trend_tracker.trends([station])[0] != before
+
+
+def test_stations_added_after_warm_up_are_accepted(repo):
+    run(station_store.load(repo))
+    (station_id,) = repo.add_stations([dict(repo._stations[1], id=7)])
+    reading = {"station_id": station_id, "level": 205.0}
+    summary = run(ingest_water_levels(repo, [reading]))
+    assert summary == {"accepted": 1, "rejected": 0, "errors": []}
+    unknown = run(ingest_water_levels(repo, [{**reading, "station_id": 99}]))
+    assert unknown["rejected"] == 1
@@ -0,0 +1,69 @@
+"""
+Tests for raster inundation mapping
+"""
+
+import numpy as np
+from affine import Affine
+from shapely.geometry import Point
+
+from inundation import candidate_mask, flood_extents, to_pixel
+
+# 0.001 degree cells with the grid's top-left corner at (75.0, 31.0)
+TRANSFORM = Affine(0.001, 0.0, 75.0, 0.0, -0.001, 31.0)
+
+
+def cell_centre(row, col):
+    return 75.0 + (col + 0.5) * 0.001, 31.0 - (row + 0.5) * 0.001
+
+
+def basin_dem():
+    # Flat 250 m ground with a 240 m channel and a separate 240 m pit
+    dem = np.full((100, 100), 250.0, dtype=np.float32)
+    dem[40:60, 10:90] = 240.0
+    dem[5:15, 5:15] = 240.0
+    return dem
+
+
+def test_to_pixel_inverts_the_transform():
+    lon, lat = cell_centre(12, 34)
+    rows, cols = to_pixel(TRANSFORM, np.array([lon]), np.array([lat]))
+    assert (rows[0], cols[0]) == (12, 34)
+
+
+def test_flood_fills_only_the_region_connected_to_the_station():
+    lon, lat = cell_centre(50, 50)
+    extents = flood_extents(basin_dem(), TRANSFORM, [lon], [lat], [245.0])
+
+    assert len(extents) == 1
+    assert extents[0].stations == [0]
+    assert extents[0].cells == 20 * 80
+    # The isolated pit is below the water surface but not connected
+    pit_lon, pit_lat = cell_centre(10, 10)
+    assert not extents[0].polygon.contains(Point(pit_lon, pit_lat))
+
+
+def test_stage_below_ground_floods_nothing():
+    lon, lat = cell_centre(50, 50)
+    assert flood_extents(basin_dem(), TRANSFORM, [lon], [lat], [239.0]) == []
+
+
+def test_reach_limits_the_spread():
+    lon, lat = cell_centre(50, 50)
+    # 0.001 degrees is ~95 m at 31N, so 1 km reaches about 10 cells each way
+    extents = flood_extents(
+        basin_dem(), TRANSFORM, [lon], [lat], [245.0], max_reach_m=1000
+    )
+    assert 300 < extents[0].cells < 20 * 22
+
+
+def test_nearest_station_sets_the_water_surface():
+    dem = np.full((10, 40), 245.0, dtype=np.float32)
+    mask = candidate_mask(
+        dem,
+        np.array([5, 5]),
+        np.array([5, 35]),
+        np.array([250.0, 240.0]),
+        reach_cells=100,
+    )
+    assert mask[:, :20].all()
+    assert not mask[:, 21:].any()
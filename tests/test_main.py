@@ -5,6 +5,7 @@ Basic tests for the FloodGuard application
 from fastapi.testclient import TestClient
 
 from main import app
+from tests.conftest import memory_app
 
 client = TestClient(app)
 
@@ -33,12 +34,12 @@ def test_frontend_serving():
     assert "text/html" in response.headers.get("content-type", "")
 
 
-def test_api_stations_endpoint():
+def test_api_stations_endpoint(repo):
     """Test the stations API endpoint"""
-    response = client.get("/api/stations")
-    # This might fail if database is not available, but that's expected in CI
-    # We're just testing that the endpoint exists and doesn't crash
-    assert response.status_code in [200, 500]  # 500 if no database in CI
+    # The in-memory repository stands in for the database, which CI lacks
+    response = TestClient(memory_app(repo)).get("/api/stations")
+    assert response.status_code == 200
+    assert response.json()["stations"]
 
 
 class TestModels:
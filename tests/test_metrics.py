@@ -0,0 +1,118 @@
+"""
+Tests for the request, repository and SQL metrics
+"""
+
+import asyncio
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from metrics import Histogram, MetricsMiddleware, metrics, timed_calls
+
+
+def sample(exposition: str, line_start: str) -> float:
+    for line in exposition.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_start} not exposed")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("/a",), value)
+    lines = histogram.expose()
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_middleware_labels_requests_by_route_template():
+    router = APIRouter()
+
+    @router.get("/things/{thing_id}")
+    async def thing(thing_id: int):
+        return {"id": thing_id}
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router, prefix="/test-metrics")
+    client = TestClient(app)
+    for thing_id in (1, 2, 3):
+        assert client.get(f"/test-metrics/things/{thing_id}").status_code == 200
+    client.get("/test-metrics/things/x")
+
+    exposition = metrics.expose()
+    labels = 'method="GET",route="/test-metrics/things/{thing_id}"'
+    assert (
+        sample(
+            exposition,
+            f'floodguard_http_request_duration_seconds_count{{{labels},status="200"}}',
+        )
+        == 3
+    )
+    assert (
+        sample(
+            exposition,
+            f'floodguard_http_request_duration_seconds_count{{{labels},status="422"}}',
+        )
+        == 1
+    )
+
+
+def test_event_streams_are_kept_out_of_the_latency_histogram():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/test-metrics/stream")
+    async def stream():
+        async def events():
+            yield "data: {}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    assert TestClient(app).get("/test-metrics/stream").status_code == 200
+    exposition = metrics.expose()
+    assert 'route="/test-metrics/stream",status' not in exposition
+    line = 'floodguard_http_stream_duration_seconds_count{route="/test-metrics/stream"}'
+    assert sample(exposition, line) == 1
+
+
+def test_statements_are_attributed_to_the_repository_call():
+    engine = create_engine("sqlite://", poolclass=QueuePool)
+    metrics.instrument_engine(engine, "test-sqlite", 5)
+
+    @timed_calls("test")
+    class Readings:
+        async def insert_readings(self, count):
+            with engine.begin() as connection:
+                connection.execute(text("CREATE TABLE r (level FLOAT)"))
+                connection.execute(
+                    text("INSERT INTO r VALUES (:level)"),
+                    [{"level": float(i)} for i in range(count)],
+                )
+
+    asyncio.run(Readings().insert_readings(7))
+    exposition = metrics.expose()
+    labels = '{engine="test-sqlite",query="insert_readings"}'
+    assert sample(exposition, f"floodguard_db_statement_duration_seconds_count{labels}")
+    assert sample(exposition, f"floodguard_db_statement_rows_total{labels}") == 7
+    assert sample(
+        exposition,
+        'floodguard_repository_call_duration_seconds_count{backend="test",'
+        'call="insert_readings"}',
+    )
+    assert (
+        sample(exposition, 'floodguard_db_pool_checked_out{engine="test-sqlite"}') == 0
+    )
+    assert (
+        sample(exposition, 'floodguard_db_pool_max_connections{engine="test-sqlite"}')
+        == 5
+    )
@@ -0,0 +1,92 @@
+"""
+Tests for monthly partition management and retention
+"""
+
+from datetime import datetime
+
+import partitions
+from partitions import add_months, apply_retention, ensure_partitions, partition_name
+
+
+class FakeResult:
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def scalar(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    """Answers the catalog queries from a list of partition names"""
+
+    def __init__(self, children=(), stranded=False):
+        self.children = list(children)
+        self.stranded = stranded
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if "FROM pg_inherits" in sql:
+            table = params["table"]
+            return FakeResult(c for c in self.children if c.startswith(table))
+        if sql.startswith("SELECT EXISTS"):
+            return FakeResult([self.stranded])
+        return FakeResult(rowcount=3)
+
+
+def test_month_arithmetic_crosses_years():
+    assert add_months(datetime(2024, 11, 1), 3) == datetime(2025, 2, 1)
+    assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+    assert partition_name("water_levels", datetime(2024, 3, 1)) == (
+        "water_levels_p202403"
+    )
+
+
+def test_only_missing_months_are_created():
+    connection = FakeConnection(["water_levels_default", "water_levels_p202406"])
+    ensure_partitions(
+        connection, "water_levels", datetime(2024, 5, 20), datetime(2024, 8, 3)
+    )
+    created = [s for s in connection.statements if "FOR VALUES FROM" in s]
+    assert created == [
+        f"CREATE TABLE water_levels_p2024{m:02d} PARTITION OF water_levels "
+        f"FOR VALUES FROM ('2024-{m:02d}-01') TO ('2024-{m + 1:02d}-01')"
+        for m in (5, 7, 8)
+    ]
+
+
+def test_rows_stranded_in_default_are_moved_before_attaching():
+    connection = FakeConnection(stranded=True)
+    ensure_partitions(
+        connection, "rainfall_data", datetime(2024, 5, 1), datetime(2024, 5, 1)
+    )
+    tail = connection.statements[-3:]
+    assert tail[0].startswith("CREATE TABLE rainfall_data_p202405 (LIKE")
+    assert "DELETE FROM rainfall_data_default" in tail[1]
+    assert tail[2].startswith("ALTER TABLE rainfall_data ATTACH PARTITION")
+
+
+def test_retention_drops_only_fully_expired_months(monkeypatch):
+    monkeypatch.setattr(partitions, "READING_RETENTION_DAYS", 90)
+    children = [f"water_levels_p2024{m:02d}" for m in range(1, 7)]
+    connection = FakeConnection(children + ["water_levels_default"])
+    # The cutoff falls on 2024-04-02: March ends before it, April does not
+    report = apply_retention(connection, datetime(2024, 7, 1))
+    assert report["water_levels"] == children[:3]
+    dropped = [s for s in connection.statements if s.startswith("DROP TABLE")]
+    assert dropped == [f"DROP TABLE {name}" for name in children[:3]]
+
+
+def test_dry_run_changes_nothing(monkeypatch):
+    monkeypatch.setattr(partitions, "READING_RETENTION_DAYS", 30)
+    connection = FakeConnection(["water_levels_p202301"])
+    report = apply_retention(connection, datetime(2024, 7, 1), dry_run=True)
+    assert report["water_levels"] == ["water_levels_p202301"]
+    assert not any(
+        s.startswith(("DROP", "DELETE", "UPDATE")) for s in connection.statements
+    )
@@ -0,0 +1,108 @@
+"""
+Tests for on-demand request profiling
+"""
+
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import profiling
+from metrics import metrics
+from profiling import ProfilingMiddleware
+
+engine = create_engine("sqlite://")
+metrics.instrument_engine(engine, "test-profiling")
+
+
+def busy_for(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+app = FastAPI()
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.get("/api/stream")
+async def stream():
+    return {"streaming": True}
+
+
+@app.get("/slow")
+async def slow():
+    busy_for(0.05)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1")).scalar()
+    return {"done": True}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    return TestClient(app)
+
+
+def test_requests_without_a_valid_token_are_not_profiled(client):
+    assert client.get("/slow?__profile=1").json() == {"done": True}
+    response = client.get("/slow?__profile=1", headers={"X-Profile-Token": "wrong"})
+    assert response.json() == {"done": True}
+    response = client.get(
+        "/slow?__profile=1", headers={"X-Profile-Token": "sécret".encode()}
+    )
+    assert response.json() == {"done": True}
+
+
+def test_explicit_profile_has_python_frames_and_sql(client):
+    response = client.get("/slow?__profile=1", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["x-profiled-status"] == "200"
+
+    profile = response.json()
+    frames = profile["shared"]["frames"]
+    python, sql = profile["profiles"]
+    sampled = {frames[i]["name"] for stack in python["samples"] for i in stack}
+    assert "busy_for" in sampled
+    assert sum(python["weights"]) >= 40
+    assert [frames[i]["name"] for i in sql["samples"][0]] == [
+        "SQL other",
+        "SELECT 1",
+    ]
+
+
+def test_sampled_profiles_are_written_and_pruned(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    for _ in range(3):
+        assert client.get("/slow").json() == {"done": True}
+    # Written in the background after each response
+    deadline = time.monotonic() + 5
+    while len(os.listdir(tmp_path)) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_streams_are_never_profiled(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    response = client.get(
+        "/api/stream?__profile=1", headers={"X-Profile-Token": "secret"}
+    )
+    assert response.status_code == 400
+    assert client.get("/api/stream").json() == {"streaming": True}
+    time.sleep(0.1)
+    assert os.listdir(tmp_path) == []
+
+
+def test_sampling_stops_after_the_time_limit(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MAX_SECONDS", 0.02)
+    response = client.get("/slow?__profile=1", headers={"X-Profile-Token": "secret"})
+    python = response.json()["profiles"][0]
+    assert "first 0.02 s" in python["name"]
+    assert sum(python["weights"]) < 40
@@ -0,0 +1,82 @@
+"""
+Tests for the hourly prefix-sum rainfall store
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from rainfall_store import RainfallStore
+
+NOW = datetime(2024, 7, 1, 12, 30)
+
+
+def reading(district, mm, hours_ago, longitude=74.3):
+    return {
+        "district": district,
+        "longitude": longitude,
+        "latitude": 31.5,
+        "rainfall_mm": mm,
+        "timestamp": NOW - timedelta(hours=hours_ago),
+    }
+
+
+def test_any_window_is_a_difference_of_two_columns():
+    store = RainfallStore()
+    store.add(
+        [
+            reading("Lahore", 5.0, 0),
+            reading("Lahore", 3.0, 2),
+            reading("Lahore", 10.0, 30),
+            reading("Kasur", 7.0, 50),
+            reading("Kasur", 1.0, 100),  # older than the ring
+        ]
+    )
+    expected = {1: [5.0], 3: [8.0], 24: [8.0], 48: [18.0], 72: [18.0, 7.0]}
+    for hours, totals in expected.items():
+        gauges, sums, _ = store.totals(hours, NOW)
+        assert [g[0] for g in gauges] == ["Lahore", "Kasur"][: len(totals)]
+        np.testing.assert_allclose(sums, totals)
+
+
+def test_late_readings_and_time_moving_on():
+    store = RainfallStore()
+    store.add([reading("Lahore", 5.0, 0)])
+    # A late reading for three hours ago lands in its own hour
+    store.add([reading("Lahore", 2.0, 3)])
+    assert store.totals(3, NOW)[1].tolist() == [5.0]
+    assert store.totals(4, NOW)[1].tolist() == [7.0]
+
+    later = NOW + timedelta(hours=5)
+    store.add([{**reading("Lahore", 1.0, 0), "timestamp": later}])
+    assert store.totals(1, later)[1].tolist() == [1.0]
+    assert store.totals(6, later)[1].tolist() == [6.0]
+    assert store.totals(9, later)[1].tolist() == [8.0]
+    # Once nothing is reported inside the window the gauge is not listed
+    gauges, _, latest = store.totals(1, later + timedelta(hours=2))
+    assert gauges == []
+    assert store.totals(3, later + timedelta(hours=2))[2].tolist() == [
+        datetime(2024, 7, 1, 17, 30)
+    ]
+
+
+def test_gauges_are_kept_apart_and_ids_applied_once():
+    store = RainfallStore()
+    rows = [reading("Lahore", 4.0, 1), reading("Lahore", 6.0, 1, longitude=74.4)]
+    store.add(rows, ids=[11, 12])
+    store.add(rows, ids=[11, 12])  # caught up again from the table
+    gauges, sums, _ = store.totals(24, NOW)
+    assert len(gauges) == 2
+    assert sorted(sums.tolist()) == [4.0, 6.0]
+
+
+def test_readings_ahead_of_the_clock_count_in_the_current_hour():
+    store = RainfallStore()
+    now = datetime(2024, 7, 1, 10, 55)
+    store.add([{**reading("Lahore", 10.0, 0), "timestamp": datetime(2024, 7, 1, 9)}])
+    # Within the clock skew ingestion allows, but already in the next hour
+    ahead = {**reading("Lahore", 5.0, 0), "timestamp": datetime(2024, 7, 1, 11, 5)}
+    store.add([ahead], now=now)
+    assert store.totals(72, now)[1].tolist() == [15.0]
+    assert store.totals(1, now)[1].tolist() == [5.0]
+    assert store.totals(2, now)[1].tolist() == [15.0]
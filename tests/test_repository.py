@@ -0,0 +1,291 @@
+"""
+Tests for the in-memory repository, without a database
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import seed_data
+from district_cache import DistrictCache
+from rainfall_store import RainfallStore
+from repository import MemoryRepository, ReplicaRepository, to_micros
+from station_store import StationStore
+from tests.conftest import END, seeded
+
+
+def test_history_is_sorted_slices_including_unmerged_readings():
+    repo, generator = seeded()
+    # Two late readings that stay in the unsorted tail
+    repo.append_readings(
+        [2, 2], [END - timedelta(minutes=5), END], [260.0, 261.0], [2, 2]
+    )
+    start, end = END - timedelta(days=2), END + timedelta(minutes=1)
+    x, y = asyncio.run(repo.level_series(2, start, end, hourly=False))
+
+    chunks = list(generator.water_levels([1, 2, 3, 4, 5, 6], 100_000))
+    ids, stamps, levels = (np.concatenate([c[i] for c in chunks]) for i in range(3))
+    mine = (ids == 2) & (stamps >= np.datetime64(start, "us"))
+    assert len(x) == mine.sum() + 2 and np.all(np.diff(x) >= 0)
+    np.testing.assert_array_equal(y[:-2], levels[mine])
+    assert y[-2:].tolist() == [260.0, 261.0]
+
+    x, y = asyncio.run(repo.level_series(2, start, end, hourly=True))
+    assert len(x) == 49 and x[0] == to_micros(start) / 1e6
+    assert y[0] == levels[mine][:4].max() and y[-1] == 261.0
+
+
+def test_station_store_loads_and_catches_up_from_memory():
+    repo, _ = seeded()
+    store = StationStore()
+    asyncio.run(store.load(repo))
+    assert len(store.all()) == 6
+    assert all(
+        station.timestamp == END - timedelta(minutes=15) for station in store.all()
+    )
+
+    station = store.get(1)
+    asyncio.run(
+        repo.insert_water_levels(
+            [
+                {
+                    "station_id": 1,
+                    "level": station.danger_level + 1,
+                    "timestamp": END,
+                    "status": "danger",
+                }
+            ]
+        )
+    )
+    changed = asyncio.run(store.catch_up(repo))
+    assert [s.id for s in changed] == [1] and store.get(1).status == "danger"
+    assert asyncio.run(store.catch_up(repo)) == []
+
+
+def test_station_store_reloads_when_stations_are_edited():
+    repo, _ = seeded()
+    store = StationStore()
+    asyncio.run(store.load(repo))
+    template = dict(repo._stations[1], name="Ghaggar at Sardulgarh")
+    repo.add_stations(
+        [
+            {**template, "id": 7},
+            dict(repo._stations[2], is_active=False),
+            dict(repo._stations[3], danger_level=0.0),
+        ]
+    )
+    changed = asyncio.run(store.refresh(repo))
+    assert store.get(7) is not None and store.get(2) is None
+    assert store.get(3).risk_level == "danger"
+    assert {s.id for s in changed} == {3, 7}
+    # Nothing moved since: a plain catch-up
+    version = store.version
+    assert asyncio.run(store.refresh(repo)) == []
+    assert store.version == version
+
+
+def test_stores_pick_up_rows_committed_out_of_id_order():
+    repo, _ = seeded()
+    store = StationStore()
+    asyncio.run(store.load(repo))
+    last_id = asyncio.run(repo.max_reading_id())
+    # The reading with the higher id is visible first
+    repo.append_readings(
+        [1], [END + timedelta(minutes=5)], [250.0], [1], ids=[last_id + 2]
+    )
+    asyncio.run(store.catch_up(repo))
+    repo.append_readings(
+        [1], [END + timedelta(minutes=10)], [251.0], [1], ids=[last_id + 1]
+    )
+    asyncio.run(store.catch_up(repo))
+    assert store.get(1).level == 251.0
+    version = store.version
+    asyncio.run(store.catch_up(repo))
+    assert store.version == version
+
+    now = datetime.utcnow()
+    rain = MemoryRepository()
+    rainfall = RainfallStore()
+    asyncio.run(rainfall.load(rain))
+
+    def gauge(mm):
+        return {
+            "district": "Lahore",
+            "longitude": 74.3,
+            "latitude": 31.5,
+            "rainfall_mm": mm,
+            "timestamp": now,
+        }
+
+    rain.append_rainfall([gauge(4.0)], ids=[2])
+    asyncio.run(rainfall.catch_up(rain))
+    rain.append_rainfall([gauge(6.0)], ids=[1])
+    for _ in range(2):
+        asyncio.run(rainfall.catch_up(rain))
+        assert rainfall.totals(1, now)[1].tolist() == [10.0]
+
+
+def test_rainfall_store_matches_the_table_totals():
+    repo, _ = seeded(days=3)
+    now = END + timedelta(minutes=30)
+    rows = asyncio.run(repo.rainfall_hourly(END - timedelta(hours=73)))
+    store = RainfallStore()
+    store.add(rows)
+    gauges, totals, _ = store.totals(24, now=now)
+
+    expected = {
+        (row["district"], row["longitude"], row["latitude"]): row["total_rainfall"]
+        for row in asyncio.run(repo.rainfall_totals(END - timedelta(hours=23)))
+    }
+    assert dict(zip(gauges, totals.tolist())) == pytest.approx(expected)
+
+
+def test_forecasts_and_districts_serialize_like_postgis():
+    repo, _ = seeded()
+    forecasts = asyncio.run(
+        repo.forecasts(END - timedelta(hours=1), END + timedelta(hours=24))
+    )
+    assert [f["risk_level"] for f in forecasts] == ["medium", "high", "high"]
+    assert json.loads(forecasts[0]["area_geojson"])["type"] == "Polygon"
+
+    # Ludhiana's forecast square is the only one in this view
+    ludhiana = asyncio.run(
+        repo.forecasts(
+            END - timedelta(hours=1),
+            END + timedelta(hours=24),
+            bbox=(75.8, 30.85, 75.9, 30.95),
+        )
+    )
+    assert [f["district"] for f in ludhiana] == ["Ludhiana"]
+
+    cache = DistrictCache()
+    payload = asyncio.run(cache.get(repo, "low"))
+    assert [d["name"] for d in payload.districts] == sorted(
+        d[0] for d in seed_data.DISTRICTS
+    )
+    assert len(payload.within((75.8, 30.85, 75.9, 30.95))) >= 1
+
+
+def test_writes_bump_versions_and_move_window_edges():
+    repo, _ = seeded()
+    before = asyncio.run(repo.table_versions()).get("rainfall_data", (0, None))
+    ids = asyncio.run(
+        repo.insert_rainfall(
+            [
+                {
+                    "district": "Ludhiana",
+                    "longitude": 75.85,
+                    "latitude": 30.9,
+                    "rainfall_mm": 4.0,
+                    "timestamp": END,
+                }
+            ]
+        )
+    )
+    assert ids == [asyncio.run(repo.max_rainfall_id())]
+    after = asyncio.run(repo.table_versions())
+    assert after["rainfall_data"][0] == before[0] + 1
+    assert asyncio.run(
+        repo.rows_crossed_boundary(
+            "rainfall_data", "timestamp", END, END + timedelta(seconds=1)
+        )
+    )
+    assert not asyncio.run(
+        repo.rows_crossed_boundary(
+            "flood_forecasts", "forecast_time", END, END + timedelta(hours=1)
+        )
+    )
+
+
+class Source:
+    """PostGIS stand-in serving one station's readings to a replica"""
+
+    def __init__(self, readings):
+        self.readings = readings
+        self.versions = {"water_levels": (1, END), "districts": (1, END)}
+
+    async def table_versions(self):
+        return dict(self.versions)
+
+    async def station_rows(self):
+        return [
+            {
+                "id": 1,
+                "name": "Sutlej at Harike",
+                "river_name": "Sutlej",
+                "district": "Tarn Taran",
+                "longitude": 74.95,
+                "latitude": 31.17,
+                "normal_level": 240.0,
+                "warning_level": 244.0,
+                "danger_level": 247.0,
+                "is_active": True,
+            }
+        ]
+
+    async def forecast_rows(self, created_since):
+        return []
+
+    async def district_rows(self):
+        return []
+
+    async def reading_batch(self, after_id, since=None, limit=None, missing=()):
+        rows = [r for r in self.readings if r[0] > after_id or r[0] in missing]
+        if since is not None:
+            rows = [r for r in rows if r[2] >= since]
+        if not rows:
+            return None
+        ids, stations, stamps, levels = zip(*rows)
+        return {
+            "id": np.array(ids),
+            "station_id": np.array(stations),
+            "timestamp": to_micros(stamps),
+            "level": np.array(levels),
+            "status": np.zeros(len(ids), dtype=np.int8),
+        }
+
+    async def rainfall_after(self, after_id, since=None, missing=()):
+        return []
+
+    async def level_series(self, station_id, start, end, hourly):
+        return "primary"
+
+
+def test_replica_hydrates_catches_up_and_defers_old_history():
+    now = datetime.utcnow().replace(microsecond=0)
+    readings = [(i, 1, now - timedelta(days=12 - i), 240.0 + i) for i in range(1, 12)]
+    source = Source(readings)
+    replica = MemoryRepository(history_days=5)
+    asyncio.run(replica.load(source))
+    # Readings older than the history window are not held
+    assert asyncio.run(replica.max_reading_id()) == 11
+    start = now - timedelta(days=4, hours=1)
+    _, levels = asyncio.run(replica.level_series(1, start, now, hourly=False))
+    assert levels.tolist() == [248.0, 249.0, 250.0, 251.0]
+
+    source.readings.append((12, 1, now, 260.0))
+    source.versions["water_levels"] = (2, END)
+    asyncio.run(replica.catch_up(source))
+    rows, last_id = asyncio.run(replica.latest_readings(11))
+    assert (rows[0]["level"], last_id) == (260.0, 12)
+    # Changes count from when the replica picked them up
+    assert asyncio.run(replica.table_versions())["water_levels"][1] > END
+
+    # Id 13 was taken before id 14 but committed after it became visible
+    source.readings.append((14, 1, now + timedelta(minutes=2), 262.0))
+    asyncio.run(replica.catch_up(source))
+    source.readings.append((13, 1, now + timedelta(minutes=1), 261.0))
+    asyncio.run(replica.catch_up(source))
+    asyncio.run(replica.catch_up(source))
+    _, levels = asyncio.run(
+        replica.level_series(1, now, now + timedelta(minutes=5), hourly=False)
+    )
+    assert levels.tolist() == [260.0, 261.0, 262.0]
+
+    reads = ReplicaRepository(replica, source)
+    old = asyncio.run(reads.level_series(1, now - timedelta(days=9), now, False))
+    assert old == "primary"
+    assert asyncio.run(reads.station_thresholds([1, 2])) == {1: (244.0, 247.0)}
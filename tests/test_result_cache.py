@@ -0,0 +1,131 @@
+"""
+Tests for the result cache and its use by the read endpoints
+"""
+
+import asyncio
+
+import pytest
+
+from conditional import PROCESS_TAG, Validator
+from result_cache import LocalBackend, ResultCache
+from tests.conftest import run
+
+
+def counting_build(payload, delay=0.0):
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return payload
+
+    return build, calls
+
+
+def test_concurrent_misses_build_once():
+    cache = ResultCache(LocalBackend())
+    build, calls = counting_build({"stations": [1, 2]}, delay=0.05)
+
+    async def requests():
+        return await asyncio.gather(
+            *(
+                cache.get("stations", "digest", ("water_levels",), build)
+                for _ in range(20)
+            )
+        )
+
+    results = run(requests())
+    assert len(calls) == 1
+    assert {body for body, _ in results} == {b'{"stations":[1,2]}'}
+    # Served from the cache until its table is invalidated
+    run(cache.get("stations", "digest", ("water_levels",), build))
+    assert len(calls) == 1
+    run(cache.invalidate("water_levels"))
+    run(cache.get("stations", "digest", ("water_levels",), build))
+    assert len(calls) == 2
+
+
+def test_failed_builds_reach_every_waiter_and_are_not_cached():
+    cache = ResultCache(LocalBackend())
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database went away")
+
+    async def requests():
+        return await asyncio.gather(
+            *(cache.get("forecast", "d", (), failing) for _ in range(5)),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in run(requests()))
+    assert len(calls) == 1
+    with pytest.raises(RuntimeError):
+        run(cache.get("forecast", "d", (), failing))
+    assert len(calls) == 2
+
+
+def test_entries_expire_and_are_evicted_least_recently_used(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("result_cache.time.monotonic", lambda: clock[0])
+    backend = LocalBackend(max_bytes=30)
+    cache = ResultCache(backend, ttl=5)
+    builds = {name: counting_build({"n": name * 5}) for name in "abc"}
+
+    for name in "ab":
+        run(cache.get(name, "d", (), builds[name][0]))
+    run(cache.get("a", "d", (), builds["a"][0]))
+    # c pushes out b, the least recently used
+    run(cache.get("c", "d", (), builds["c"][0]))
+    assert backend.size <= 30
+    run(cache.get("a", "d", (), builds["a"][0]))
+    run(cache.get("b", "d", (), builds["b"][0]))
+    assert [len(builds[name][1]) for name in "abc"] == [1, 2, 1]
+
+    clock[0] += 6
+    run(cache.get("b", "d", (), builds["b"][0]))
+    assert len(builds["b"][1]) == 3
+
+
+def test_forecast_route_reuses_the_encoded_body_until_a_new_run(client, repo):
+    calls = []
+    forecasts = repo.forecasts
+
+    async def counted(*args, **kwargs):
+        calls.append(1)
+        return await forecasts(*args, **kwargs)
+
+    repo.forecasts = counted
+    first = client.get("/api/forecast")
+    second = client.get("/api/forecast")
+    assert first.content == second.content and len(calls) == 1
+    assert first.headers["etag"] == second.headers["etag"]
+    assert client.get("/api/forecast?zoom=low").status_code == 200
+    assert len(calls) == 2
+
+    # A new forecast run moves the table version, and with it the key
+    repo.add_forecasts([])
+    client.get("/api/forecast")
+    assert len(calls) == 3
+
+
+def test_process_tagged_bodies_stay_out_of_the_shared_backend():
+    shared, local = LocalBackend(), LocalBackend()
+    cache = ResultCache(shared, local=local)
+    build, calls = counting_build({"stations": []})
+
+    stations = Validator(("stations", PROCESS_TAG, 3))
+    forecast = Validator(("forecast", "", 7))
+    assert not stations.shared and forecast.shared
+    run(cache.get("stations", stations.digest, ("water_levels",), build, False))
+    run(cache.get("forecast", forecast.digest, ("flood_forecasts",), build))
+    assert local.size == shared.size == len(b'{"stations":[]}')
+
+    # Ingestion invalidates both, and clearing drops both
+    run(cache.invalidate("water_levels"))
+    run(cache.get("stations", stations.digest, ("water_levels",), build, False))
+    assert len(calls) == 3
+    run(cache.clear())
+    assert local.size == shared.size == 0
@@ -0,0 +1,90 @@
+"""
+Tests for the synthetic data generator
+"""
+
+import struct
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import seed_data
+from seed_data import (
+    COPY_HEADER,
+    PG_EPOCH,
+    HydrographGenerator,
+    Storms,
+    binary_copy,
+    make_districts,
+    make_stations,
+    make_storms,
+)
+
+END = datetime(2024, 9, 1)
+
+
+def generator(seed=1, stations=30, days=60, storms=6):
+    rng = np.random.default_rng(seed)
+    districts = make_districts(25, rng)
+    stations = make_stations(stations, districts, rng)
+    start = END - timedelta(days=days)
+    storms = make_storms(storms, start, days * 24, rng)
+    return HydrographGenerator(
+        stations, districts, start, END, timedelta(minutes=15), storms, seed
+    )
+
+
+def levels(gen, chunk_rows):
+    chunks = list(gen.water_levels(range(1, len(gen.stations) + 1), chunk_rows))
+    return np.concatenate([chunk[2] for chunk in chunks])
+
+
+def test_real_stations_come_first_and_synthetic_ones_fill_up():
+    gen = generator()
+    assert [s[0] for s in gen.stations[:12]] == [s[0] for s in seed_data.STATIONS]
+    assert len({s[0] for s in gen.stations}) == 30
+    assert [d[0] for d in gen.districts[22:]] == [f"District {i}" for i in (23, 24, 25)]
+
+
+def test_series_are_reproducible_whatever_the_chunk_size():
+    small = levels(generator(), 20_000)
+    assert len(small) == generator().rows
+    np.testing.assert_array_equal(small, levels(generator(), 500_000))
+    assert not np.array_equal(small, levels(generator(seed=2), 500_000))
+
+
+def test_levels_rise_after_rain_on_their_district():
+    gen = generator(stations=12)
+    # One heavy storm centred on Harike (the first station) ten days in
+    _, _, latitude, longitude = seed_data.STATIONS[0][:4]
+    storm = Storms(
+        *(np.array([value]) for value in (240.0, 24.0, 20.0, longitude, latitude, 0.3))
+    )
+    gen = HydrographGenerator(
+        gen.stations, gen.districts, gen.start, END, gen.interval, storm, seed=1
+    )
+    gauge, timestamps, amounts = gen.rainfall()
+    # Tarn Taran is the district gauge nearest to Harike
+    assert gen.districts[gauge[np.argmax(amounts)]][0] == "Tarn Taran"
+    assert timestamps.min() >= np.datetime64(gen.start + timedelta(hours=240), "us")
+
+    series = levels(gen, 100_000).reshape(-1, 12)
+    before = series[: 240 * 4].max(axis=0)
+    rise = series[240 * 4 :].max(axis=0) - before
+    assert np.argmax(rise) == 0 and rise[0] > 3
+    # Stations on the Ravi and Ghaggar, far from the storm, barely move
+    assert rise[6:11].max() < 1
+
+
+def test_binary_copy_rows_decode():
+    ids = np.array([7, 8], dtype=np.int32)
+    stamps = np.array(["2024-07-01T06:00", "2024-07-01T06:15"], "datetime64[us]")
+    payload = binary_copy(ids, stamps, np.array([245.5, 251.25]), np.array([0, 2]))
+
+    assert payload.startswith(COPY_HEADER) and payload.endswith(b"\xff\xff")
+    row = payload[len(COPY_HEADER) :][:44]
+    fields, _, station_id, _, level, _, micros, size = struct.unpack(
+        ">hiiidiqi", row[:38]
+    )
+    assert (fields, station_id, level, size) == (4, 7, 245.5, 6)
+    assert PG_EPOCH + np.timedelta64(micros, "us") == stamps[0]
+    assert row[38:44] == b"normal"
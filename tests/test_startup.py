@@ -0,0 +1,35 @@
+"""
+Tests for side-effect-free startup
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+CHECK_IMPORT = """
+import sys
+import database, main
+assert database.get_engine.cache_info().currsize == 0
+assert database.get_async_engine.cache_info().currsize == 0
+assert "forecast_engine" not in sys.modules
+assert any(route.path == "/api/health" for route in main.app.routes)
+"""
+
+
+def test_importing_the_app_needs_no_database():
+    env = {k: v for k, v in os.environ.items() if "DATABASE_URL" not in k}
+    subprocess.run([sys.executable, "-c", CHECK_IMPORT], cwd=ROOT, env=env, check=True)
+
+
+def test_create_app_builds_independent_apps():
+    from fastapi.testclient import TestClient
+
+    from main import create_app
+
+    first, second = create_app(), create_app()
+    assert first is not second
+    # No lifespan: the app answers without warming anything
+    response = TestClient(first).get("/api/info")
+    assert response.status_code == 200
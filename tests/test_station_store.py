@@ -0,0 +1,71 @@
+"""
+Tests for the in-memory station latest-state store
+"""
+
+from datetime import datetime
+
+from station_store import StationState, StationStore
+
+
+def station(station_id, name, district, normal):
+    return StationState(
+        id=station_id,
+        name=name,
+        river=name.split()[0],
+        district=district,
+        longitude=75.0,
+        latitude=31.0,
+        normal_level=normal,
+        warning_level=normal + 4.0,
+        danger_level=normal + 7.0,
+    )
+
+
+def make_store():
+    store = StationStore()
+    stations = [
+        station(1, "Sutlej at Ludhiana", "Ludhiana", 242.0),
+        station(2, "Beas at Mirthal", "Kapurthala", 230.0),
+    ]
+    store._stations = {s.id: s for s in stations}
+    store._ordered = sorted(stations, key=lambda s: s.name)
+    store.warmed = True
+    return store
+
+
+def test_apply_readings_updates_latest():
+    store = make_store()
+    store.apply_readings(
+        [
+            {
+                "station_id": 1,
+                "level": 247.0,
+                "status": "warning",
+                "timestamp": datetime(2024, 7, 1, 12),
+            },
+            {
+                "station_id": 1,
+                "level": 243.0,
+                "status": "normal",
+                "timestamp": datetime(2024, 7, 1, 11),
+            },
+            {
+                "station_id": 99,
+                "level": 1.0,
+                "status": "normal",
+                "timestamp": datetime(2024, 7, 1, 12),
+            },
+        ]
+    )
+    station = store.get(1)
+    assert station.level == 247.0
+    assert station.status == "warning"
+    assert station.risk_level == "warning"
+
+
+def test_stations_without_readings_use_normal_level():
+    store = make_store()
+    payload = store.get(2).to_api()
+    assert payload["levels"]["current"] == 230.0
+    assert payload["status"] == "normal"
+    assert [s.id for s in store.all()] == [2, 1]
@@ -0,0 +1,55 @@
+"""
+Tests for the live update broadcaster
+"""
+
+import asyncio
+
+from stream import RESYNC_FRAME, Broadcaster
+
+
+async def collect(broadcaster, subscriber, count):
+    frames = []
+    async for frame in broadcaster.frames(subscriber):
+        frames.append(frame)
+        if len(frames) == count:
+            break
+    return frames
+
+
+def test_publish_reaches_every_subscriber():
+    async def scenario():
+        broadcaster = Broadcaster(buffer_size=4)
+        subscribers = [broadcaster.subscribe() for _ in range(3)]
+        broadcaster.publish("alerts", {"alerts": []})
+        results = await asyncio.gather(
+            *(collect(broadcaster, s, 2) for s in subscribers)
+        )
+        assert broadcaster.subscriber_count == 0
+        return results
+
+    for frames in asyncio.run(scenario()):
+        assert frames[1].startswith(b"event: alerts\nid: 1\n")
+
+
+def test_slow_subscriber_is_told_to_resync():
+    async def scenario():
+        broadcaster = Broadcaster(buffer_size=2)
+        subscriber = broadcaster.subscribe()
+        for i in range(5):
+            broadcaster.publish("stations", {"stations": [i]})
+        return await collect(broadcaster, subscriber, 2)
+
+    frames = asyncio.run(scenario())
+    assert frames[1] == RESYNC_FRAME
+
+
+def test_reconnect_replays_missed_events():
+    async def scenario():
+        broadcaster = Broadcaster(buffer_size=8)
+        for i in range(3):
+            broadcaster.publish("stations", {"stations": [i]})
+        subscriber = broadcaster.subscribe(last_event_id=1)
+        return await collect(broadcaster, subscriber, 3)
+
+    frames = asyncio.run(scenario())
+    assert [frame.split(b"\n")[1] for frame in frames[1:]] == [b"id: 2", b"id: 3"]
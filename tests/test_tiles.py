@@ -0,0 +1,60 @@
+"""
+Tests for tile validation and the versioned tile cache
+"""
+
+import pytest
+
+from tiles import TileCache, pixel_size, validate_tile
+
+
+def test_validate_tile_rejects_unknown_layer_and_out_of_range():
+    validate_tile("districts", 0, 0, 0)
+    validate_tile("forecasts", 10, 1023, 1023)
+    with pytest.raises(LookupError):
+        validate_tile("rivers", 0, 0, 0)
+    with pytest.raises(ValueError):
+        validate_tile("districts", 3, 8, 0)
+    with pytest.raises(ValueError):
+        validate_tile("districts", 23, 0, 0)
+
+
+def test_pixel_size_halves_per_zoom():
+    assert pixel_size(1) == pytest.approx(pixel_size(0) / 2)
+
+
+def test_new_version_invalidates_only_that_layer(tmp_path):
+    cache = TileCache(max_tiles=10, directory=str(tmp_path))
+    cache.sync_versions({"districts": (1, None), "flood_forecasts": (1, None)})
+    cache.put("districts", 5, 1, 2, b"district")
+    cache.put("forecasts", 5, 1, 2, b"forecast")
+
+    cache.sync_versions({"districts": (1, None), "flood_forecasts": (2, None)})
+
+    assert cache.get("districts", 5, 1, 2) == b"district"
+    assert cache.get("forecasts", 5, 1, 2) is None
+    assert not (tmp_path / "forecasts" / "1").exists()
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    writer = TileCache(max_tiles=10, directory=str(tmp_path))
+    writer.put("districts", 0, 0, 0, b"tile")
+
+    reader = TileCache(max_tiles=10, directory=str(tmp_path))
+    assert reader.get("districts", 0, 0, 0) == b"tile"
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TileCache(max_tiles=2, directory=None)
+    cache.put("districts", 1, 0, 0, b"a")
+    cache.put("districts", 1, 0, 1, b"b")
+    cache.get("districts", 1, 0, 0)
+    cache.put("districts", 1, 1, 0, b"c")
+
+    assert cache.get("districts", 1, 0, 1) is None
+    assert cache.get("districts", 1, 0, 0) == b"a"
+
+
+def test_memory_backend_answers_tiles_with_not_implemented(client):
+    response = client.get("/api/tiles/districts/3/5/3.mvt")
+    assert response.status_code == 501
+    assert "PostGIS" in response.json()["detail"]
@@ -0,0 +1,108 @@
+"""
+Tests for the streaming rate-of-rise tracker
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from station_store import StationState
+from trends import TrendTracker, epoch_seconds, hours_to_danger
+
+
+def rising(hours, rate, interval=900.0, start=100.0):
+    times = np.arange(0, hours * 3600 + 1, interval)
+    return times, start + times / 3600 * rate
+
+
+def test_rates_over_each_window():
+    tracker = TrendTracker()
+    times, levels = rising(8, 0.5)
+    # Flat for the first two hours, then 0.5 m/h
+    levels = np.where(times < 2 * 3600, 101.0, levels)
+    tracker.update(np.full(len(times), 7), times, levels)
+
+    stats = tracker.stats([7, 8])
+    assert stats["level"][0] == 104.0
+    np.testing.assert_allclose(
+        [stats["rates"][hours][0] for hours in (1, 3, 6)], [0.5, 0.5, 0.5]
+    )
+    assert np.isnan(stats["level"][1])
+    assert np.isnan(stats["rates"][1][1])
+    # The EWMA lags a rising level
+    assert 103.0 < stats["ewma"][0] < 104.0
+
+
+def test_batches_match_one_reading_at_a_time():
+    rng = np.random.default_rng(2)
+    ids = rng.integers(0, 20, 2000)
+    times = np.sort(rng.uniform(0, 48 * 3600, 2000))
+    levels = rng.normal(100, 2, 2000)
+
+    batched = TrendTracker(capacity=16, stations=4)
+    for start in range(0, 2000, 250):
+        batch = slice(start, start + 250)
+        batched.update(ids[batch], times[batch], levels[batch])
+    single = TrendTracker(capacity=16, stations=4)
+    for i in range(2000):
+        single.update(ids[i : i + 1], times[i : i + 1], levels[i : i + 1])
+
+    expected, actual = single.stats(range(20)), batched.stats(range(20))
+    np.testing.assert_allclose(actual["ewma"], expected["ewma"])
+    for hours in (1, 3, 6):
+        np.testing.assert_allclose(actual["rates"][hours], expected["rates"][hours])
+
+
+def test_rates_use_the_reading_a_window_back():
+    tracker = TrendTracker(capacity=8)
+    # Readings every 15 minutes: the 1 h rate compares against 4 readings back
+    times, levels = rising(3, 1.0)
+    levels[-1] += 1.0  # a last-minute jump
+    tracker.update(np.zeros(len(times), dtype=int), times, levels)
+    stats = tracker.stats([0])
+    np.testing.assert_allclose(stats["rates"][1], [2.0])
+    # Only 8 readings are kept, so the 3 h rate falls back to the oldest one
+    np.testing.assert_allclose(stats["rates"][3], [(4.0 - 1.25) / 1.75])
+
+
+def test_out_of_order_readings_are_ignored():
+    tracker = TrendTracker()
+    tracker.update([1, 1], [3600.0, 7200.0], [100.0, 101.0])
+    tracker.update([1], [5400.0], [150.0])
+    assert tracker.stats([1])["level"][0] == 101.0
+
+
+def test_hours_to_danger_and_api_summary():
+    np.testing.assert_allclose(
+        hours_to_danger(
+            np.array([100.0, 100.0, 108.0]),
+            np.array([0.5, -1.0, 0.5]),
+            np.array([103.0, 103.0, 107.0]),
+        ),
+        [6.0, np.inf, 0.0],
+    )
+
+    station = StationState(
+        id=3,
+        name="Ravi at Lahore",
+        river="Ravi",
+        district="Lahore",
+        longitude=74.3,
+        latitude=31.5,
+        normal_level=98.0,
+        warning_level=102.0,
+        danger_level=105.0,
+        level=103.0,
+        timestamp=datetime(2024, 7, 1, 6),
+    )
+    tracker = TrendTracker()
+    tracker.observe([station])
+    assert tracker.trends([station])[0]["riseRate1h"] is None
+
+    station.level, station.timestamp = 104.0, datetime(2024, 7, 1, 8)
+    tracker.observe([station])
+    trend = tracker.trends([station])[0]
+    assert trend["riseRate1h"] == 0.5
+    assert trend["hoursToDanger"] == 2.0
+    assert tracker.stats([3])["level"][0] == 104.0
+    assert epoch_seconds([datetime(1970, 1, 1, 1)])[0] == 3600.0
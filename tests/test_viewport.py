@@ -0,0 +1,38 @@
+"""
+Tests for bbox parsing and viewport filtering of in-memory layers
+"""
+
+import pytest
+
+from district_cache import DistrictPayload, resolve_detail
+from queries import parse_bbox
+
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox("74.5,30.5,76,31.5") == (74.5, 30.5, 76.0, 31.5)
+    with pytest.raises(ValueError):
+        parse_bbox("74.5,30.5,76")
+    with pytest.raises(ValueError):
+        parse_bbox("76,30.5,74.5,31.5")
+    with pytest.raises(ValueError):
+        parse_bbox("a,b,c,d")
+
+
+def test_resolve_detail_accepts_names_and_map_zoom():
+    assert resolve_detail("mid") == "mid"
+    assert resolve_detail("6") == "low"
+    assert resolve_detail("9") == "mid"
+    assert resolve_detail("14") == "high"
+    with pytest.raises(ValueError):
+        resolve_detail("street")
+
+
+def test_district_payload_within_bbox():
+    payload = DistrictPayload(
+        [{"name": "Amritsar"}, {"name": "Ludhiana"}],
+        [(74.5, 31.4, 75.2, 32.0), (75.5, 30.6, 76.3, 31.1)],
+    )
+    names = [d["name"] for d in payload.within((75.0, 31.5, 75.3, 31.8))]
+    assert names == ["Amritsar"]
+    assert len(payload.within((70.0, 28.0, 80.0, 34.0))) == 2
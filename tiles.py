@@ -0,0 +1,215 @@
+"""
+Mapbox Vector Tiles for the district and forecast map layers.
+
+Tiles are rendered by PostGIS: geometries are picked through the GiST index,
+transformed to Web Mercator, clipped to the (buffered) tile, simplified to the
+tile's pixel size and quantized by ST_AsMVTGeom. Rendered tiles are kept in an
+in-memory LRU and optionally on disk, keyed by the layer's table version, so a
+new forecast run or boundary edit invalidates the layer's tiles at once.
+"""
+
+import os
+import shutil
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import queries
+from repository import Repository
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+# Half the Web Mercator world width, in metres
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+
+# Tiles kept in memory across all layers
+TILE_CACHE_MAX_TILES = int(os.environ.get("TILE_CACHE_MAX_TILES", "5000"))
+
+# Optional directory for a disk tier shared between workers
+TILE_CACHE_DIR = os.environ.get("TILE_CACHE_DIR")
+
+# How long a table version read is trusted before tile requests re-check it
+TILE_VERSION_CHECK_SECONDS = float(os.environ.get("TILE_VERSION_CHECK_SECONDS", "2"))
+
+# Layer name -> table, geometry column, attributes, filter and cache lifetime.
+# Forecast tiles also expire with time because the forecast window slides.
+TILE_LAYERS = {
+    "districts": {
+        "table": "districts",
+        "geometry": "boundary",
+        "attributes": "name, population, area_sq_km AS area",
+        "where": "TRUE",
+        "ttl": None,
+    },
+    "forecasts": {
+        "table": "flood_forecasts",
+        "geometry": "forecast_area",
+        "attributes": (
+            'district, risk_level AS "riskLevel", confidence, '
+            'affected_population AS "affectedPopulation", '
+            'to_char(forecast_time, \'YYYY-MM-DD"T"HH24:MI:SS\') AS "forecastTime"'
+        ),
+        "where": (
+            "forecast_time <= NOW() + INTERVAL '24 hours' "
+            "AND created_at >= NOW() - INTERVAL '24 hours'"
+        ),
+        "ttl": 300,
+    },
+}
+
+
+def validate_tile(layer: str, z: int, x: int, y: int):
+    if layer not in TILE_LAYERS:
+        raise LookupError(f"Unknown tile layer '{layer}'")
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+        raise ValueError(f"Tile {z}/{x}/{y} is out of range")
+
+
+def pixel_size(z: int) -> float:
+    """Width of one tile unit in Web Mercator metres at zoom z"""
+    return 2 * WEB_MERCATOR_HALF_WORLD / (2**z) / TILE_EXTENT
+
+
+async def render_tile(db: AsyncSession, layer: str, z: int, x: int, y: int) -> bytes:
+    """Render one layer tile with PostGIS"""
+    spec = TILE_LAYERS[layer]
+    query = text(
+        f"""
+        WITH bounds AS (
+            SELECT
+                ST_TileEnvelope(:z, :x, :y) AS tile,
+                ST_Expand(ST_TileEnvelope(:z, :x, :y), :margin) AS clip
+        ),
+        features AS (
+            SELECT
+                ST_AsMVTGeom(
+                    ST_SimplifyPreserveTopology(
+                        ST_ClipByBox2D(ST_Transform(t.{spec["geometry"]}, 3857), bounds.clip),
+                        :tolerance
+                    ),
+                    bounds.tile, {TILE_EXTENT}, {TILE_BUFFER}, true
+                ) AS geom,
+                {spec["attributes"]}
+            FROM {spec["table"]} t, bounds
+            WHERE t.{spec["geometry"]} && ST_Transform(bounds.clip, 4326)
+            AND {spec["where"]}
+        )
+        SELECT ST_AsMVT(features.*, :layer, {TILE_EXTENT}, 'geom')
+        FROM features
+        WHERE geom IS NOT NULL
+    """
+    )
+    size = pixel_size(z)
+    result = await db.execute(
+        query,
+        {
+            "z": z,
+            "x": x,
+            "y": y,
+            "margin": size * TILE_BUFFER,
+            "tolerance": size,
+            "layer": layer,
+        },
+    )
+    tile = result.scalar()
+    return bytes(tile) if tile else b""
+
+
+class TileCache:
+    """In-memory LRU of rendered tiles with an optional disk tier"""
+
+    def __init__(self, max_tiles=TILE_CACHE_MAX_TILES, directory=TILE_CACHE_DIR):
+        self.max_tiles = max_tiles
+        self.directory = directory
+        self._tiles = OrderedDict()
+        self._versions = {layer: 0 for layer in TILE_LAYERS}
+        self._checked_at = None
+
+    def _path(self, key):
+        layer, version, z, x, y = key
+        return os.path.join(
+            self.directory, layer, str(version), str(z), str(x), f"{y}.mvt"
+        )
+
+    def _fresh(self, layer, created):
+        ttl = TILE_LAYERS[layer]["ttl"]
+        return ttl is None or time.time() - created < ttl
+
+    def get(self, layer, z, x, y):
+        key = (layer, self._versions[layer], z, x, y)
+        entry = self._tiles.get(key)
+        if entry is not None and self._fresh(layer, entry[1]):
+            self._tiles.move_to_end(key)
+            return entry[0]
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                if self._fresh(layer, os.path.getmtime(path)):
+                    with open(path, "rb") as f:
+                        tile = f.read()
+                    self._remember(key, tile, os.path.getmtime(path))
+                    return tile
+            except OSError:
+                pass
+        return None
+
+    def put(self, layer, z, x, y, tile: bytes):
+        key = (layer, self._versions[layer], z, x, y)
+        self._remember(key, tile, time.time())
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so other workers never read a partial tile
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(tile)
+            os.replace(partial, path)
+
+    def _remember(self, key, tile, created):
+        self._tiles[key] = (tile, created)
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+
+    def version(self, layer):
+        """Data version the layer's tiles are currently cached under"""
+        return self._versions[layer]
+
+    def set_version(self, layer, version):
+        """Point a layer at a new data version, dropping its old tiles"""
+        version = version or 0
+        if self._versions[layer] == version:
+            return
+        self._versions[layer] = version
+        for key in [key for key in self._tiles if key[0] == layer]:
+            del self._tiles[key]
+        if self.directory:
+            layer_dir = os.path.join(self.directory, layer)
+            if os.path.isdir(layer_dir):
+                for name in os.listdir(layer_dir):
+                    if name != str(version):
+                        shutil.rmtree(os.path.join(layer_dir, name), ignore_errors=True)
+
+    def sync_versions(self, table_versions: dict):
+        """Invalidate layers whose table changed, from queries.get_table_versions"""
+        for layer, spec in TILE_LAYERS.items():
+            version = table_versions.get(spec["table"], (0, None))[0]
+            self.set_version(layer, version)
+        self._checked_at = time.monotonic()
+
+    async def refresh_versions(self, repo: Repository):
+        """Re-read table versions unless they were checked very recently"""
+        if (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= TILE_VERSION_CHECK_SECONDS
+        ):
+            self.sync_versions(await queries.get_table_versions(repo))
+
+
+# Process-wide tile cache used by the API routes
+tile_cache = TileCache()
@@ -0,0 +1,229 @@
+"""
+Streaming rate-of-rise statistics per station.
+
+Threshold status only changes once a river is already high. The tracker keeps
+the recent readings of every station in fixed-size NumPy ring buffers (one row
+per station) and updates, per reading and in constant time:
+
+- the rate of rise over 1, 3 and 6 hours, measured against the newest reading
+  at least that old; the anchor index of each window only moves forward,
+- a time-weighted EWMA of the level,
+- the hours until the danger level at the 1-hour rate.
+
+Updates are applied to whole ingestion batches at once. Readings of the same
+station within a batch are applied in rounds, in timestamp order, so the
+per-reading work stays a handful of vectorized array operations.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from repository import Repository
+
+# Readings kept per station; should cover the longest window at the usual
+# reporting interval (64 x 15 min = 16 h)
+TREND_BUFFER_SIZE = int(os.environ.get("TREND_BUFFER_SIZE", "64"))
+
+# Time constant of the level EWMA
+TREND_EWMA_HOURS = float(os.environ.get("TREND_EWMA_HOURS", "1"))
+
+RISE_WINDOWS_HOURS = (1, 3, 6)
+
+
+def epoch_seconds(timestamps) -> np.ndarray:
+    """UTC epoch seconds of naive UTC datetimes"""
+    stamps = np.asarray(timestamps, dtype="datetime64[us]")
+    return stamps.astype(np.int64) / 1e6
+
+
+def hours_to_danger(levels, rates, danger_levels) -> np.ndarray:
+    """Hours until the danger level at the current rate; inf when not rising"""
+    levels = np.asarray(levels, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hours = np.where(rates > 0, (danger_levels - levels) / rates, np.inf)
+    hours = np.where(np.isnan(hours), np.inf, hours)
+    return np.where(levels >= danger_levels, 0.0, hours)
+
+
+class TrendTracker:
+    """Ring buffers of recent readings and rolling statistics per station"""
+
+    def __init__(self, capacity: int = TREND_BUFFER_SIZE, stations: int = 256):
+        self.capacity = capacity
+        self.windows = np.array(RISE_WINDOWS_HOURS, dtype=np.float64) * 3600
+        self.tau = TREND_EWMA_HOURS * 3600
+        self._reset(stations)
+
+    def _reset(self, stations):
+        self._index = np.full(0, -1, dtype=np.intp)
+        self._size = 0
+        self.times = np.zeros((stations, self.capacity))
+        self.levels = np.zeros((stations, self.capacity))
+        self.count = np.zeros(stations, dtype=np.int64)
+        self.last_time = np.full(stations, -np.inf)
+        self.ewma = np.full(stations, np.nan)
+        self.anchor = np.zeros((len(self.windows), stations), dtype=np.int64)
+
+    def _grow(self, stations):
+        def grow(array, fill):
+            grown = np.full((stations,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[: len(array)] = array
+            return grown
+
+        self.times = grow(self.times, 0.0)
+        self.levels = grow(self.levels, 0.0)
+        self.count = grow(self.count, 0)
+        self.last_time = grow(self.last_time, -np.inf)
+        self.ewma = grow(self.ewma, np.nan)
+        anchor = np.zeros((len(self.windows), stations), dtype=np.int64)
+        anchor[:, : self.anchor.shape[1]] = self.anchor
+        self.anchor = anchor
+
+    def rows(self, station_ids, create=False) -> np.ndarray:
+        """Buffer row of each station id; -1 for unknown ids unless created"""
+        ids = np.asarray(station_ids, dtype=np.intp)
+        if create and len(ids):
+            top = int(ids.max()) + 1
+            if top > len(self._index):
+                index = np.full(max(top, 2 * len(self._index)), -1, dtype=np.intp)
+                index[: len(self._index)] = self._index
+                self._index = index
+            new = np.unique(ids[self._index[ids] < 0])
+            if len(new):
+                self._index[new] = np.arange(self._size, self._size + len(new))
+                self._size += len(new)
+                if self._size > len(self.count):
+                    self._grow(max(self._size, 2 * len(self.count)))
+        known = (ids >= 0) & (ids < len(self._index))
+        rows = np.full(len(ids), -1, dtype=np.intp)
+        rows[known] = self._index[ids[known]]
+        return rows
+
+    def update(self, station_ids, times, levels):
+        """Apply a batch of readings (epoch seconds); older ones are ignored"""
+        rows = self.rows(station_ids, create=True)
+        times = np.asarray(times, dtype=np.float64)
+        levels = np.asarray(levels, dtype=np.float64)
+        if len(rows) == 0:
+            return
+
+        order = np.lexsort((times, rows))
+        rows, times, levels = rows[order], times[order], levels[order]
+        # Position of each reading among its station's readings in the batch
+        first = np.r_[True, rows[1:] != rows[:-1]]
+        rank = np.arange(len(rows)) - np.maximum.accumulate(
+            np.where(first, np.arange(len(rows)), 0)
+        )
+        for round_ in range(int(rank.max()) + 1):
+            selected = rank == round_
+            self._apply(rows[selected], times[selected], levels[selected])
+
+    def _apply(self, rows, times, levels):
+        fresh = times > self.last_time[rows]
+        if not fresh.all():
+            rows, times, levels = rows[fresh], times[fresh], levels[fresh]
+
+        seq = self.count[rows]
+        position = seq % self.capacity
+        self.times[rows, position] = times
+        self.levels[rows, position] = levels
+
+        alpha = 1 - np.exp(-(times - self.last_time[rows]) / self.tau)
+        ewma = self.ewma[rows]
+        self.ewma[rows] = np.where(seq == 0, levels, ewma + alpha * (levels - ewma))
+        self.count[rows] = seq + 1
+        self.last_time[rows] = times
+
+        # Each window's anchor is the newest reading at least a window old,
+        # or the oldest one still buffered
+        oldest = np.maximum(seq + 1 - self.capacity, 0)
+        for w, window in enumerate(self.windows):
+            anchor = np.maximum(self.anchor[w, rows], oldest)
+            cutoff = times - window
+            while True:
+                step = anchor + 1
+                advance = (step < seq) & (
+                    self.times[rows, step % self.capacity] <= cutoff
+                )
+                if not advance.any():
+                    break
+                anchor += advance
+            self.anchor[w, rows] = anchor
+
+    def stats(self, station_ids) -> dict:
+        """Latest level, rates of rise (m/h) and EWMA of stations, as arrays"""
+        rows = self.rows(station_ids)
+        known = rows >= 0
+        rows = np.where(known, rows, 0)
+        count = np.where(known, self.count[rows], 0)
+        newest = (count - 1) % self.capacity
+        level = np.where(count > 0, self.levels[rows, newest], np.nan)
+        time = self.times[rows, newest]
+
+        rates = {}
+        for w, hours in enumerate(RISE_WINDOWS_HOURS):
+            anchor = self.anchor[w, rows] % self.capacity
+            span = time - self.times[rows, anchor]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rate = (level - self.levels[rows, anchor]) / span * 3600
+            rates[hours] = np.where((count > 1) & (span > 0), rate, np.nan)
+        return {
+            "level": level,
+            "rates": rates,
+            "ewma": np.where(count > 0, self.ewma[rows], np.nan),
+        }
+
+    def _hours_to_danger(self, stats, stations):
+        danger = np.array([s.danger_level for s in stations], dtype=np.float64)
+        rate = np.nan_to_num(stats["rates"][RISE_WINDOWS_HOURS[0]])
+        hours = hours_to_danger(stats["level"], rate, danger)
+        return np.where(np.isnan(stats["level"]), np.inf, hours)
+
+    def hours_to_danger(self, stations) -> np.ndarray:
+        """Hours until each station reaches danger at its 1-hour rate of rise"""
+        return self._hours_to_danger(self.stats([s.id for s in stations]), stations)
+
+    def trends(self, stations) -> list:
+        """API trend summary of each station, from one vectorized lookup"""
+        stats = self.stats([s.id for s in stations])
+
+        def values(array, digits):
+            return [
+                round(value, digits) if np.isfinite(value) else None
+                for value in array.tolist()
+            ]
+
+        columns = {
+            f"riseRate{hours}h": values(stats["rates"][hours], 3)
+            for hours in RISE_WINDOWS_HOURS
+        }
+        columns["ewmaLevel"] = values(stats["ewma"], 2)
+        columns["hoursToDanger"] = values(self._hours_to_danger(stats, stations), 1)
+        return [
+            {key: column[i] for key, column in columns.items()}
+            for i in range(len(stations))
+        ]
+
+    def observe(self, stations):
+        """Feed the latest reading of each station, skipping ones already seen"""
+        stations = [s for s in stations if s.timestamp and s.level is not None]
+        if stations:
+            self.update(
+                [s.id for s in stations],
+                epoch_seconds([s.timestamp for s in stations]),
+                [s.level for s in stations],
+            )
+
+    async def load(self, repo: Repository):
+        """Fill the buffers with the readings of the longest window"""
+        since = datetime.utcnow() - timedelta(hours=max(RISE_WINDOWS_HOURS) + 1)
+        ids, stamps, levels = await repo.recent_readings(since)
+        self._reset(len(self.count))
+        if len(ids):
+            self.update(ids, epoch_seconds(stamps), levels)
+
+
+# Process-wide tracker fed by ingestion and the store catch-up
+trend_tracker = TrendTracker()